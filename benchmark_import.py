@@ -0,0 +1,63 @@
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+
+parser = argparse.ArgumentParser(description='Import time of doglib measured with "python -X importtime", every run '
+                                             'in a fresh process. Exits with status 1 if the median import time '
+                                             'exceeds the budget or a lazily imported module is loaded.')
+parser.add_argument('--runs',
+                    type=int,
+                    default=10,
+                    help="Number of processes started, the median is reported")
+parser.add_argument('--budget',
+                    type=float,
+                    default=None,
+                    help="Maximum median import time of doglib in ms, not checked if omitted")
+parser.add_argument('--top',
+                    type=int,
+                    default=10,
+                    help="Number of modules of largest self time reported")
+args = parser.parse_args()
+
+
+# modules imported on first use only: parsers, config schema validation and the DTR client
+LAZY_MODULES: List[str] = ["doglib.parsers", "doglib.schemas", "doglib.dtr", "lxml", "jsonpath_rw", "jsonschema",
+                           "xmlschema"]
+
+
+def import_times() -> Dict[str, Tuple[int, int]]:
+    """
+    :return: Dict[str, Tuple[int, int]], self and cumulative import time in us of every module imported by
+        "import doglib" in a fresh interpreter
+    """
+    stderr: str = subprocess.run([sys.executable, "-X", "importtime", "-c", "import doglib"], check=True,
+                                 capture_output=True, text=True).stderr
+    times: Dict[str, Tuple[int, int]] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+if __name__ == "__main__":
+    runs: List[Dict[str, Tuple[int, int]]] = [import_times() for _ in range(args.runs)]
+    total_ms: float = statistics.median(run["doglib"][1] for run in runs) / 1000
+    print(f"import doglib {total_ms:>8.1f} ms (median of {args.runs})")
+    self_ms: Dict[str, float] = {module: statistics.median(run.get(module, (0, 0))[0] for run in runs) / 1000
+                                 for module in runs[0]}
+    for module, module_ms in sorted(self_ms.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {module:<40} {module_ms:>8.1f} ms")
+    failed: bool = False
+    loaded: List[str] = [module for module in LAZY_MODULES if any(module in run for run in runs)]
+    if loaded:
+        print(f"FAIL lazily imported modules loaded: {', '.join(loaded)}")
+        failed = True
+    if args.budget is not None and total_ms > args.budget:
+        print(f"FAIL import time exceeds budget of {args.budget:.1f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,55 @@
+import argparse
+import os
+import time
+from typing import List, Tuple
+import warnings
+
+from doglib import DOG, STATIC_TEST_FILES_DIR
+from doglib.repos import RegRepo
+
+
+parser = argparse.ArgumentParser(description='Throughput of XML, CMDI and HTML parsers on the static test responses '
+                                             'of registered repositories.')
+parser.add_argument('--rounds',
+                    type=int,
+                    default=50,
+                    help="Number of times every static response is parsed")
+args = parser.parse_args()
+
+
+def static_responses(reg_repos: List[RegRepo]) -> List[Tuple[RegRepo, str, str]]:
+    """
+    :return: List[Tuple[RegRepo, str, str]], repository, file name and static response of repositories parsing XML,
+        CMDI or HTML responses
+    """
+    responses: List[Tuple[RegRepo, str, str]] = []
+    for reg_repo in reg_repos:
+        static_dir: str = os.path.join(STATIC_TEST_FILES_DIR, reg_repo.id)
+        if reg_repo.get_parser_type() not in ("xml", "cmdi", "html") or not os.path.isdir(static_dir):
+            continue
+        for static_file in sorted(os.listdir(static_dir)):
+            with open(os.path.join(static_dir, static_file)) as static_response:
+                responses.append((reg_repo, static_file, static_response.read()))
+    return responses
+
+
+if __name__ == "__main__":
+    warnings.simplefilter("ignore")
+    responses: List[Tuple[RegRepo, str, str]] = static_responses(DOG().reg_repos)
+    parsed: List[Tuple[RegRepo, str, str]] = []
+    for reg_repo, static_file, response in responses:
+        try:
+            reg_repo.get_parser().fetch(response)
+            reg_repo.get_parser().identify(response)
+            parsed.append((reg_repo, static_file, response))
+        except Exception as error:
+            print(f"skipped {reg_repo.id}/{static_file}: {error!r}")
+
+    started_at: float = time.perf_counter()
+    for _ in range(args.rounds):
+        for reg_repo, _, response in parsed:
+            reg_repo.get_parser().fetch(response)
+            reg_repo.get_parser().identify(response)
+    elapsed: float = time.perf_counter() - started_at
+    print(f"{len(parsed)} static responses of {len({reg_repo.id for reg_repo, _, _ in parsed})} repositories")
+    print(f"fetch() + identify() {len(parsed) * args.rounds / elapsed:>10,.0f} responses/s")
@@ -0,0 +1,84 @@
+import argparse
+from re import compile, match
+import time
+import tracemalloc
+from typing import Callable, Iterable, List, Optional, Pattern
+
+from doglib import DOG
+from doglib.pid import classify_many, pid_factory, DOI, HDL, PID, URL
+
+
+parser = argparse.ArgumentParser(description='Microbenchmark of PID classification throughput.')
+parser.add_argument('--count',
+                    type=int,
+                    default=200000,
+                    help="Number of PID strings classified per run")
+parser.add_argument('--repeat',
+                    type=int,
+                    default=3,
+                    help="Number of runs, the best one is reported")
+args = parser.parse_args()
+
+
+def legacy_pid_factory(pid_string: str) -> Optional[PID]:
+    """
+    Classification as done before the precompiled classifier: pattern compiled on every check and once more in the
+    constructor
+    """
+    doi_regex: Pattern = compile(r"(?:https://doi.org/)?.*(?:10\.)(?P<repo_id>[\w\W]+)/(?P<record_id>[\w\W.]+)$")
+    hdl_regex: Pattern = compile(
+        r"(?:http://|https://)?(?:hdl.handle.net/)?(?:hdl:)?(?P<repo_id>[\w.]+)/(?P<record_id>[\w\-.]+)(?:@format=cmdi+)?(?:@view+)?(?:\?index=[\d])?$")
+    if match(doi_regex, pid_string):
+        return DOI(pid_string)
+    elif match(hdl_regex, pid_string):
+        return HDL(pid_string)
+    elif URL.is_url(pid_string):
+        return URL(pid_string)
+    return None
+
+
+def load_pid_strings(count: int) -> List[str]:
+    """
+    Test examples of registered repositories and a few non-PIDs, repeated up to count
+    """
+    examples: List[str] = [test_pid for repo in DOG.load_repos() for test_pid in repo.get_test_examples().values()
+                           if test_pid]
+    examples.extend(["not a pid", "10.", "", "mailto:someone"])
+    return [examples[idx % len(examples)] for idx in range(count)]
+
+
+def measure(name: str, classify: Callable[[List[str]], Iterable], pid_strings: List[str], repeat: int) -> float:
+    best: float = float("inf")
+    for _ in range(repeat):
+        started_at: float = time.perf_counter()
+        # PIDs are kept, as by a batch job deduplicating them
+        pids: list = list(classify(pid_strings))
+        best = min(best, time.perf_counter() - started_at)
+        del pids
+    throughput: float = len(pid_strings) / best
+    print(f"{name:<24} {throughput:>12,.0f} PIDs/s")
+    return throughput
+
+
+def measure_memory(name: str, classify: Callable[[List[str]], Iterable], pid_strings: List[str]) -> None:
+    """
+    Memory held by the classified PIDs of all strings
+    """
+    tracemalloc.start()
+    pids: list = list(classify(pid_strings))
+    held: int = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{name:<24} {held / len(pids):>12,.0f} B/PID")
+
+
+if __name__ == "__main__":
+    pid_strings: List[str] = load_pid_strings(args.count)
+    before: float = measure("legacy pid_factory", lambda strings: map(legacy_pid_factory, strings), pid_strings,
+                            args.repeat)
+    measure("pid_factory", lambda strings: map(pid_factory, strings), pid_strings, args.repeat)
+    after: float = measure("classify_many", classify_many, pid_strings, args.repeat)
+    interned: float = measure("classify_many interned", lambda strings: classify_many(strings, interned=True),
+                              pid_strings, args.repeat)
+    print(f"speedup {after / before:.1f}x, interned {interned / before:.1f}x")
+    measure_memory("classify_many", classify_many, pid_strings)
+    measure_memory("classify_many interned", lambda strings: classify_many(strings, interned=True), pid_strings)
@@ -0,0 +1,76 @@
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from doglib.pid import pid_factory, PID
+from doglib.repoindex import RepoIndex
+from doglib.repos import RegRepo
+
+
+parser = argparse.ArgumentParser(description='Microbenchmark of repository sniffing on a synthetic registry.')
+parser.add_argument('--repos',
+                    type=int,
+                    default=5000,
+                    help="Number of synthetic repository configs")
+parser.add_argument('--lookups',
+                    type=int,
+                    default=2000,
+                    help="Number of PIDs sniffed per run")
+args = parser.parse_args()
+
+
+def synthetic_registry(size: int) -> List[RegRepo]:
+    """
+    Repositories with distinct hosts, HDL and DOI prefixes, every tenth sharing the HDL prefix of its predecessor
+    """
+    reg_repos: List[RegRepo] = []
+    for idx in range(size):
+        hdl_prefix: str = f"{20000 + idx - (idx % 10 == 0 and idx > 0)}"
+        reg_repos.append(RegRepo({
+            "id": f"REPO{idx}",
+            "host_netloc": f"https://repo{idx}.example.org",
+            "hdl": {"id": hdl_prefix, "format": "redirect"},
+            "doi": {"id": f"10.{50000 + idx}", "format": "redirect"},
+            "parser": {"type": "json"},
+        }))
+    return reg_repos
+
+
+def synthetic_pids(size: int, count: int) -> List[PID]:
+    pids: List[PID] = []
+    for _ in range(count):
+        idx: int = random.randrange(size)
+        pids.append(pid_factory(random.choice([f"hdl:{20000 + idx}/record-{idx}",
+                                               f"doi:10.{50000 + idx}/record.{idx}",
+                                               f"https://repo{idx}.example.org/records/{idx}",
+                                               f"https://unregistered.example.com/records/{idx}"])))
+    return pids
+
+
+def measure(name: str, sniff: Callable[[PID], List[RegRepo]], pids: List[PID]) -> float:
+    started_at: float = time.perf_counter()
+    for pid in pids:
+        sniff(pid)
+    throughput: float = len(pids) / (time.perf_counter() - started_at)
+    print(f"{name:<16} {throughput:>12,.0f} lookups/s")
+    return throughput
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    reg_repos: List[RegRepo] = synthetic_registry(args.repos)
+    pids: List[PID] = synthetic_pids(args.repos, args.lookups)
+
+    started_at: float = time.perf_counter()
+    repo_index: RepoIndex = RepoIndex(reg_repos)
+    print(f"index of {args.repos} repositories built in {time.perf_counter() - started_at:.3f} s")
+
+    def linear_scan(pid: PID) -> List[RegRepo]:
+        return [reg_repo for reg_repo in reg_repos if reg_repo.match_pid(pid)]
+
+    mismatches: int = sum(linear_scan(pid) != repo_index.match(pid) for pid in pids)
+    print(f"mismatches against linear scan: {mismatches}")
+    before: float = measure("linear scan", linear_scan, pids)
+    after: float = measure("RepoIndex", repo_index.match, pids)
+    print(f"speedup {after / before:.0f}x")
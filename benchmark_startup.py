@@ -0,0 +1,63 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import List, Tuple
+
+from doglib.registry import RegistrySnapshot
+
+
+parser = argparse.ArgumentParser(description='Cold-start time of DOG loading repository configs and a compiled '
+                                             'registry snapshot, every run in a fresh process.')
+parser.add_argument('--runs',
+                    type=int,
+                    default=10,
+                    help="Number of processes started per variant, the median is reported")
+args = parser.parse_args()
+
+
+# run in a fresh interpreter, prints seconds spent importing doglib and constructing DOG
+COLD_START: str = """
+import time, warnings
+warnings.simplefilter("ignore")
+started_at = time.perf_counter()
+from doglib import DOG
+from doglib.registry import RegistrySnapshot
+imported_at = time.perf_counter()
+DOG({registry})
+print(imported_at - started_at, time.perf_counter() - imported_at)
+"""
+
+
+def cold_start(registry: str, runs: int) -> Tuple[float, float]:
+    imports: List[float] = []
+    inits: List[float] = []
+    for _ in range(runs):
+        output: str = subprocess.run([sys.executable, "-c", COLD_START.format(registry=registry)], check=True,
+                                     capture_output=True, text=True).stdout
+        import_time, init_time = map(float, output.split())
+        imports.append(import_time)
+        inits.append(init_time)
+    return statistics.median(imports), statistics.median(inits)
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        snapshot_path: str = os.path.join(tmp_dir, "registry.pickle")
+        RegistrySnapshot.open(snapshot_path)
+        print(f"snapshot of {len(RegistrySnapshot.load(snapshot_path).reg_repos)} repositories, "
+              f"{os.path.getsize(snapshot_path)} B")
+        variants: List[Tuple[str, str]] = [
+            ("configs", ""),
+            ("registry path", f"registry={snapshot_path!r}"),
+            ("snapshot load", f"registry=RegistrySnapshot.load({snapshot_path!r})"),
+        ]
+        results: dict = {}
+        for name, registry in variants:
+            import_time, init_time = cold_start(registry, args.runs)
+            results[name] = init_time
+            print(f"{name:<16} import {import_time * 1000:>8.1f} ms   DOG() {init_time * 1000:>8.2f} ms")
+        print(f"DOG() speedup {results['configs'] / results['registry path']:.1f}x with registry path, "
+              f"{results['configs'] / results['snapshot load']:.1f}x with snapshot load")
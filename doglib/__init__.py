@@ -1,4 +1,18 @@
+from importlib import import_module
+
+from .deadline import DeadlineExceeded
 from .doglib import DOG, REPO_CONFIG_DIR, SCHEMA_DIR, STATIC_TEST_FILES_DIR
-from .parsers import FetchResult, IdentifyResult, ReferencedResource, ReferencedResources
-from .doglib import expand_datatype
+from .dogdataclasses import BatchStats, FetchResult, IdentifyResult, ReferencedResource, ReferencedResources
 from .pid import pid_factory
+
+
+# names imported from their module on first access, keeps the DTR client out of "import doglib"
+_LAZY_NAMES: dict = {"AsyncDOG": ".asyncdog", "expand_datatype": ".dtr"}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_NAMES:
+        value = getattr(import_module(_LAZY_NAMES[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,321 @@
+import asyncio
+import copy
+import json
+import pycurl
+from typing import Any, Awaitable, List, Optional, Tuple, Union
+
+from . import curl
+from .deadline import deadline, phase
+from .doglib import DOG, _dataclass_to_dict, logger
+from .pid import pid_factory, PID
+from .repos import FetchResult, IdentifyResult, RegRepo
+from .resolver import get_default_resolver, PIDResolver
+from .singleflight import AsyncSingleFlight
+
+
+class AsyncDOG:
+    """
+    asyncio client of the Digital Object Gate. Shares registered repositories, secrets and parsers with a DOG
+    instance, while all HTTP requests go through non-blocking curl.AsyncTransport, so awaiting fetch() never blocks
+    the event loop. Every public coroutine accepts an optional timeout in seconds, the total budget of all its
+    requests as in DOG, and may be cancelled
+    """
+    def __init__(self, dog: Optional[DOG] = None, secrets: Optional[dict] = None,
+                 pool: Optional[curl.CurlPool] = curl.DEFAULT_POOL):
+        """
+        :param dog: Optional[DOG], DOG instance whose repository registry is reused, new DOG(secrets) if not provided
+        :param secrets: Optional[dict], secrets for a newly constructed DOG, see DOG
+        :param pool: Optional[curl.CurlPool], pool the easy handles are taken from
+        """
+        self.dog: DOG = dog if dog is not None else DOG(secrets)
+        self.pool: Optional[curl.CurlPool] = pool
+        self._transport: Optional[curl.AsyncTransport] = None
+        # concurrent fetch()/identify() calls of equivalent PIDs share a single run of the pipeline
+        self.flights: AsyncSingleFlight = AsyncSingleFlight(share=copy.deepcopy)
+
+    @property
+    def secrets(self) -> dict:
+        return self.dog.secrets
+
+    @property
+    def reg_repos(self) -> Tuple[RegRepo, ...]:
+        return self.dog.reg_repos
+
+    @property
+    def transport(self) -> curl.AsyncTransport:
+        """
+        Transport bound to the running event loop, created on first use in every loop
+        """
+        if self._transport is None or self._transport.loop is not asyncio.get_running_loop():
+            self._transport = curl.AsyncTransport(pool=self.pool)
+        return self._transport
+
+    @staticmethod
+    async def _with_deadline(awaitable: Awaitable, timeout: Optional[float]) -> Any:
+        """
+        Await within a total time budget, raises deadline.DeadlineExceeded naming the phase the time ran out in
+        """
+        with deadline(timeout) as call_deadline:
+            try:
+                return await asyncio.wait_for(awaitable, timeout)
+            except asyncio.TimeoutError as error:
+                if isinstance(error, curl.DeadlineExceeded) or call_deadline is None:
+                    raise
+                raise call_deadline.exceeded() from None
+
+    async def _get_request_url(self, matching_repo: RegRepo, pid: PID) -> str:
+        """
+        Awaitable RegRepo.get_request_url(), follows redirects of "redirect" format repositories without blocking
+        """
+        while matching_repo.requires_redirect(pid):
+            effective_url: str = await get_default_resolver().resolve_async(pid, self.transport,
+                                                                            matching_repo.get_headers(pid))
+            pid = pid_factory(effective_url)
+        return matching_repo.get_request_url(pid, self.secrets)
+
+    async def _match_sniffed(self, sniffed_repos: List[RegRepo], pid: PID) -> Optional[RegRepo]:
+        """
+        Awaitable DOG._match_sniffed(), candidate repositories are probed concurrently, the first candidate to
+        match wins and the remaining probes are cancelled
+        """
+        if len(sniffed_repos) <= 1:
+            return sniffed_repos[0] if sniffed_repos else None
+        cached_repo: Optional[RegRepo] = self.dog._match_cached(sniffed_repos, pid)
+        if cached_repo is not None:
+            return cached_repo
+        resolved_repo: Optional[RegRepo] = None
+        resolver: PIDResolver = get_default_resolver()
+        if resolver.api_url(pid) is not None:
+            try:
+                resolved_repo = DOG._match_target(sniffed_repos, await resolver.resolve_async(pid, self.transport))
+            except (curl.RequestError, pycurl.error):
+                resolved_repo = None
+        if resolved_repo is None:
+            resolved_repo = await self._match_probed(sniffed_repos, pid)
+        if resolved_repo is not None:
+            self.dog.conflicts.set(pid, resolved_repo.id)
+        return resolved_repo
+
+    async def _match_probed(self, sniffed_repos: List[RegRepo], pid: PID) -> Optional[RegRepo]:
+        """
+        Awaitable DOG._match_probed()
+        """
+        async def probe(candidate_repo: RegRepo) -> Optional[RegRepo]:
+            with self.dog._circuit(candidate_repo):
+                request_url: str = await self._get_request_url(candidate_repo, pid)
+                effective_url: str = await self.transport.resolve(request_url, candidate_repo.get_headers(pid))
+            return DOG._match_target([candidate_repo], effective_url)
+
+        pending: set = {asyncio.ensure_future(probe(sniffed_repo)) for sniffed_repo in sniffed_repos}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error: Optional[BaseException] = task.exception()
+                    if isinstance(error, (curl.RequestError, curl.CircuitOpenError, pycurl.error)):
+                        continue
+                    if error is not None:
+                        raise error
+                    if task.result() is not None:
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+        return None
+
+    async def _sniff(self, pid: PID, resolve_identifier_conflicts: bool = True) -> \
+            Union[Optional[RegRepo], List[RegRepo]]:
+        sniffed_repos: List[RegRepo] = self.dog._sniff(pid, resolve_identifier_conflicts=False)
+        if resolve_identifier_conflicts:
+            with phase("sniff"):
+                return await self._match_sniffed(sniffed_repos, pid)
+        return sniffed_repos
+
+    async def _get_signpost_url(self, request_url: str) -> str:
+        _, response_headers = await self.transport.head(request_url)
+        return DOG._parse_signpost_link(response_headers)
+
+    async def _get_signposted(self, matching_repo: RegRepo, request_url: str) -> str:
+        """
+        Awaitable DOG._get_signposted()
+        """
+        if not self.dog._should_signpost(matching_repo):
+            return ""
+        try:
+            signpost_url: str = await self._get_signpost_url(request_url)
+        except (curl.CurlError, pycurl.error) as error:
+            logger.warning(f"Signposting HEAD request to {request_url} failed: {error!r}")
+            return ""
+        if not signpost_url:
+            self.dog._record_signposting(matching_repo, False)
+            return ""
+        try:
+            _, response, _ = await self.transport.get(signpost_url, follow_redirects=True)
+        except (curl.CurlError, pycurl.error) as error:
+            logger.warning(f"Signposted request to {signpost_url} failed: {error!r}")
+            return ""
+        return response
+
+    async def _get_configured(self, matching_repo: RegRepo, request_url: str) -> str:
+        """
+        Retrieve response of request URL according to repository configuration
+        """
+        request_headers: dict = matching_repo.get_headers(pid_factory(request_url))
+        _, response, _ = await self.transport.get(request_url, request_headers, follow_redirects=True,
+                                                  compressed=matching_repo.compression)
+        return response
+
+    async def _fetch(self, pid: PID) -> dict:
+        matching_repo: RegRepo = await self._sniff(pid)
+        if not matching_repo:
+            return {}
+        with self.dog._circuit(matching_repo):
+            return await self._fetch_from(matching_repo, pid)
+
+    async def _fetch_from(self, matching_repo: RegRepo, pid: PID) -> dict:
+        with phase("request_url"):
+            request_url: str = await self._get_request_url(matching_repo, pid)
+        with phase("signposting"):
+            response: str = await self._get_signposted(matching_repo, request_url)
+        if response:
+            try:
+                fetch_dict: dict = _dataclass_to_dict(matching_repo.get_parser("signpost").fetch(response))
+            except Exception as error:
+                logger.warning(f"Signposted response of {request_url} failed to parse: {error!r}")
+                fetch_dict = {}
+            self.dog._record_signposting(matching_repo, bool(fetch_dict))
+            if fetch_dict:
+                return fetch_dict
+        with phase("fetch"):
+            response = await self._get_configured(matching_repo, request_url)
+            fetch_result: FetchResult = matching_repo.get_parser().fetch(response)
+        return _dataclass_to_dict(fetch_result)
+
+    async def fetch(self, pid_string: Union[str, PID], format: str = 'dict', dtr: bool = False,
+                    timeout: Optional[float] = None) -> Union[dict, str]:
+        """
+        Awaitable DOG.fetch()
+
+        :param timeout: Optional[float], total time budget in seconds, the call is cancelled and DeadlineExceeded
+            (a TimeoutError) raised when it runs out
+        """
+        accepted_formats: set = {'dict', 'jsons'}
+        if format not in accepted_formats:
+            raise ValueError(f"Format {format} not supported, use one of {accepted_formats}")
+
+        pid: PID = pid_factory(pid_string)
+        if not pid:
+            return {} if format == 'dict' else ""
+        fetch_result: dict = await self._with_deadline(
+            self.flights.do(("fetch",) + DOG._batch_key(pid), lambda: self._fetch(pid)), timeout)
+        if format == 'dict':
+            return fetch_result
+        return json.dumps(fetch_result)
+
+    async def _identify(self, pid: PID) -> Union[dict, IdentifyResult]:
+        matching_repo: RegRepo = await self._sniff(pid)
+        if not matching_repo:
+            return {}
+        with self.dog._circuit(matching_repo):
+            return await self._identify_from(matching_repo, pid)
+
+    async def _identify_from(self, matching_repo: RegRepo, pid: PID) -> Union[dict, IdentifyResult]:
+        with phase("request_url"):
+            request_url: str = await self._get_request_url(matching_repo, pid)
+        with phase("signposting"):
+            response: str = await self._get_signposted(matching_repo, request_url)
+        if response:
+            try:
+                identify_response = matching_repo.get_parser("signpost").identify(response)
+            except Exception as error:
+                logger.warning(f"Signposted response of {request_url} failed to parse: {error!r}")
+                identify_response = None
+            self.dog._record_signposting(matching_repo, bool(identify_response))
+            if identify_response:
+                return identify_response
+        with phase("identify"):
+            response = await self._get_configured(matching_repo, request_url)
+            return matching_repo.get_parser().identify(response)
+
+    async def identify(self, pid_string: Union[str, PID], timeout: Optional[float] = None) -> dict:
+        """
+        Awaitable DOG.identify()
+
+        :param timeout: Optional[float], total time budget in seconds, the call is cancelled and DeadlineExceeded
+            (a TimeoutError) raised when it runs out
+        """
+        pid: PID = pid_factory(pid_string)
+        if not pid:
+            return {}
+        return await self._with_deadline(
+            self.flights.do(("identify",) + DOG._batch_key(pid), lambda: self._identify(pid)), timeout)
+
+    async def sniff(self, pid_string: Union[str, PID], format='dict', resolve_identifier_conflicts: bool = True,
+                    timeout: Optional[float] = None, offline: bool = False) -> Union[dict, str, List[str]]:
+        """
+        Awaitable DOG.sniff(), offline sniffing is answered by the DOG instance right away
+
+        :param timeout: Optional[float], total time budget in seconds, the call is cancelled and DeadlineExceeded
+            (a TimeoutError) raised when it runs out
+        """
+        accepted_formats: set = {'dict', 'jsons', 'str'}
+        if format not in accepted_formats:
+            raise ValueError(f"Format {format} not supported, use one of {accepted_formats}")
+
+        pid: PID = pid_factory(pid_string)
+        if not pid:
+            return {} if format == 'dict' else ""
+        if offline:
+            return self.dog.sniff(pid, format, offline=True)
+        sniff_result = await self._with_deadline(self._sniff(pid, resolve_identifier_conflicts), timeout)
+        return DOG._format_sniff_result(sniff_result, format)
+
+    async def _is_downloadable(self, pid: PID, matching_repo: Optional[RegRepo] = None) -> bool:
+        if not matching_repo:
+            matching_repo = await self._sniff(pid)
+        request_headers: dict = matching_repo.get_headers(pid)
+        with self.dog._circuit(matching_repo), phase("is_downloadable"):
+            _, response_headers = await self.transport.head(pid.get_resolvable(), headers=request_headers,
+                                                            follow_redirects=True)
+        return DOG._is_attachment(response_headers)
+
+    async def is_downloadable(self, pid_string: Union[str, PID], matching_repo: Optional[RegRepo] = None,
+                              timeout: Optional[float] = None) -> bool:
+        """
+        Awaitable DOG.is_downloadable()
+
+        :param timeout: Optional[float], total time budget in seconds, the call is cancelled and DeadlineExceeded
+            (a TimeoutError) raised when it runs out
+        """
+        pid: PID = pid_factory(pid_string)
+        return await self._with_deadline(self._is_downloadable(pid, matching_repo), timeout)
+
+    async def _is_collection(self, pid: PID) -> bool:
+        matching_repo: Optional[RegRepo] = await self._sniff(pid)
+        if not matching_repo:
+            return False
+        if await self._is_downloadable(pid, matching_repo):
+            return False
+        return bool(await self._fetch(pid))
+
+    async def is_collection(self, pid_string: Union[str, PID], timeout: Optional[float] = None) -> bool:
+        """
+        Awaitable DOG.is_collection()
+
+        :param timeout: Optional[float], total time budget in seconds, the call is cancelled and DeadlineExceeded
+            (a TimeoutError) raised when it runs out
+        """
+        pid: PID = pid_factory(pid_string)
+        if not pid:
+            return False
+        return await self._with_deadline(self._is_collection(pid), timeout)
+
+    def close(self) -> None:
+        """
+        Close the transport of the last used event loop
+        """
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
@@ -0,0 +1,139 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .pid import canonical_key, PID
+
+
+def conflict_keys(pid: PID) -> List[str]:
+    """
+    Keys of a PID in ConflictCache, most specific first: the canonical PID, e.g. "hdl:11022/1007-0000-0000-8dee-6",
+    and, for identifiers whose suffix has at least three dash separated segments, the suffix pattern of its first two
+    segments, e.g. "hdl:11022/1007-0000-*". Repositories sharing an HDL prefix (e.g. CLARIN-D centres) may tell their
+    records apart by the leading suffix segments, see ConflictCache
+
+    :param pid: PID, class instance of PID protocol
+    :return: List[str], keys of the PID and of its suffix pattern
+    """
+    pid_type, value = canonical_key(pid)
+    keys: List[str] = [f"{pid_type}:{value}"]
+    prefix, _, suffix = value.partition("/")
+    segments: List[str] = suffix.split("-")
+    if pid_type in ("hdl", "doi") and len(segments) > 2:
+        keys.append(f"{pid_type}:{prefix}/{'-'.join(segments[:2])}-*")
+    return keys
+
+
+class ConflictCache:
+    """
+    Resolved identifier conflicts: the registered repository a PID of a prefix shared by several repositories
+    belongs to. Resolutions learned by probing expire after ttl; seeded ones (test examples of repository configs) do
+    not expire and are not exported, they are derived from the configs again. Seeds cover their exact PID only.
+
+    A suffix pattern (see conflict_keys()) is learned only once pattern_votes PIDs of the pattern in a row were
+    probed to the same repository, it expires after ttl as well and is forgotten as soon as a probe of the pattern
+    disagrees. State can be exported and loaded, so worker processes start warm
+    """
+    def __init__(self, ttl: float = 7 * 24 * 60 * 60, state: Optional[dict] = None, pattern_votes: int = 3):
+        """
+        :param ttl: float, seconds after which a learned resolution is forgotten and probed again
+        :param state: Optional[dict], state previously returned by export()
+        :param pattern_votes: int, number of agreeing probes of distinct PIDs needed to learn their suffix pattern
+        """
+        self.ttl: float = ttl
+        self.pattern_votes: int = pattern_votes
+        self._lock: threading.Lock = threading.Lock()
+        self._resolved: Dict[str, Tuple[str, float]] = {}
+        self._seeded: Dict[str, str] = {}
+        # agreeing probes of suffix patterns not learned yet {pattern: (repo_id, votes)}
+        self._votes: Dict[str, Tuple[str, int]] = {}
+        if state:
+            self.load(state)
+
+    def __len__(self) -> int:
+        return len(self._resolved) + len(self._seeded)
+
+    def get(self, pid: PID) -> Optional[str]:
+        """
+        :param pid: PID, class instance of PID protocol
+        :return: Optional[str], id of the repository the PID, or its learned suffix pattern, resolved to, None if
+            unknown or expired
+        """
+        now: float = time.time()
+        keys: List[str] = conflict_keys(pid)
+        with self._lock:
+            for position, key in enumerate(keys):
+                record: Optional[Tuple[str, float]] = self._resolved.get(key)
+                if record is not None and now - record[1] <= self.ttl:
+                    return record[0]
+                if position == 0 and key in self._seeded:
+                    return self._seeded[key]
+        return None
+
+    def set(self, pid: PID, repo_id: str) -> None:
+        """
+        Record a resolution learned by probing for the PID, and count it as vote for its suffix pattern
+        """
+        keys: List[str] = conflict_keys(pid)
+        now: float = time.time()
+        with self._lock:
+            previous: Optional[Tuple[str, float]] = self._resolved.get(keys[0])
+            self._resolved[keys[0]] = (repo_id, now)
+            if len(keys) < 2 or (previous is not None and previous[0] == repo_id):
+                # probing the same PID again is no new evidence for the pattern
+                return
+            pattern: str = keys[1]
+            learned: Optional[Tuple[str, float]] = self._resolved.get(pattern)
+            if learned is not None:
+                if learned[0] != repo_id:
+                    del self._resolved[pattern]
+                    self._votes[pattern] = (repo_id, 1)
+                return
+            voted_id, votes = self._votes.get(pattern, (repo_id, 0))
+            votes = votes + 1 if voted_id == repo_id else 1
+            if votes >= self.pattern_votes:
+                self._votes.pop(pattern, None)
+                self._resolved[pattern] = (repo_id, now)
+            else:
+                self._votes[pattern] = (repo_id, votes)
+
+    def seed(self, pid: PID, repo_id: str) -> None:
+        """
+        Record a known resolution of the PID, e.g. a test example of the repository config
+        """
+        with self._lock:
+            self._seeded[conflict_keys(pid)[0]] = repo_id
+
+    def replace_seeds(self, seeds: Iterable[Tuple[PID, str]]) -> None:
+        """
+        Replace all seeded resolutions at once, e.g. once repository configs were reloaded, see seed()
+        """
+        seeded: Dict[str, str] = {conflict_keys(pid)[0]: repo_id for pid, repo_id in seeds}
+        with self._lock:
+            self._seeded = seeded
+
+    def export(self) -> dict:
+        """
+        :return: dict, JSON serialisable state {key: {"repo_id": str, "checked_at": float}} of learned resolutions
+        """
+        with self._lock:
+            return {key: {"repo_id": repo_id, "checked_at": checked_at}
+                    for key, (repo_id, checked_at) in self._resolved.items()}
+
+    def load(self, state: dict) -> None:
+        """
+        Merge state exported by export(), records newer than the loaded ones are kept
+        """
+        with self._lock:
+            for key, record in state.items():
+                current: Optional[Tuple[str, float]] = self._resolved.get(key)
+                if current is None or current[1] < record["checked_at"]:
+                    self._resolved[key] = (str(record["repo_id"]), float(record["checked_at"]))
+
+    def clear(self) -> None:
+        """
+        Forget learned resolutions and votes, seeded ones are kept
+        """
+        with self._lock:
+            self._resolved.clear()
+            self._votes.clear()
@@ -1,28 +1,485 @@
-import certifi
+import asyncio
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
 from io import BytesIO
 import pycurl
 import re
-from typing import Any, Optional, Tuple, Union
+import threading
+import time
+from typing import Any, Awaitable, Callable, Deque, Dict, Generator, Hashable, Iterable, List, Optional, Set, Tuple, Union
+from urllib.parse import urlsplit
 
+from .deadline import current_deadline, Deadline, DeadlineExceeded
+from .httpcache import CacheEntry, HTTPCache, parse_response_headers
 from .pid import PID
+from .ratelimit import HostLimit, HostScheduler
+from .resilience import RetryPolicy
+from .resolution import ResolutionCache
+from .singleflight import AsyncSingleFlight, FlightStats, SingleFlight
 
 
 CUSTOM_USER_AGENT = "CLARIN-DOG: https://www.clarin.eu/dog"
 
 
+def _supported_encodings() -> str:
+    """
+    Content codings libcurl was built to decode, advertised in Accept-Encoding of compressed requests
+    """
+    features: int = pycurl.version_info()[4]
+    encodings: List[str] = []
+    if features & pycurl.VERSION_LIBZ:
+        encodings.extend(["gzip", "deflate"])
+    if features & pycurl.VERSION_BROTLI:
+        encodings.append("br")
+    return ", ".join(encodings)
+
+
+ACCEPT_ENCODING: str = _supported_encodings()
+
+
 class CurlError(Exception):
     pass
 
 
 class RequestError(CurlError):
+    def __init__(self, message: str, status: int = 0):
+        """
+        :param message: str, error message
+        :param status: int, HTTP response code of the failed request
+        """
+        super().__init__(message)
+        self.status: int = status
+
+
+class CircuitOpenError(CurlError):
+    """
+    Request was not sent, as the circuit breaker of the target repository is open
+    """
     pass
 
 
+@dataclass
+class PoolStats:
+    """
+    Counters of CurlPool handle and connection reuse
+    """
+    handles_created: int = 0
+    handles_reused: int = 0
+    handles_evicted: int = 0
+    connections_created: int = 0
+    connections_reused: int = 0
+    # transfers released without a response, e.g. DNS failure, refused connection or error before the request
+    transfers_failed: int = 0
+
+
+class CurlPool:
+    """
+    Pool of reusable pycurl.Curl handles. Handles are kept per thread (pycurl.Curl is not thread-safe), while DNS,
+    TLS session and connection caches are shared between all handles of the pool via pycurl.CurlShare, so
+    subsequent requests to the same host skip name lookup, TCP handshake and TLS negotiation
+    """
+    def __init__(self, max_size: int = 8, idle_timeout: float = 60.0):
+        """
+        :param max_size: int, maximum number of idle handles kept per thread, surplus handles are closed on release
+        :param idle_timeout: float, seconds after which an idle handle is evicted from the pool
+        """
+        self.max_size: int = max_size
+        self.idle_timeout: float = idle_timeout
+        self.stats: PoolStats = PoolStats()
+        self._stats_lock: threading.Lock = threading.Lock()
+        self._local: threading.local = threading.local()
+        self._share: pycurl.CurlShare = pycurl.CurlShare()
+        self._share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+        self._share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+        self._share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_CONNECT)
+
+    def _idle_handles(self) -> List[Tuple[pycurl.Curl, float]]:
+        if not hasattr(self._local, "idle"):
+            self._local.idle = []
+        return self._local.idle
+
+    def _count(self, counter: str, value: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self.stats, counter, getattr(self.stats, counter) + value)
+
+    def acquire(self) -> pycurl.Curl:
+        """
+        Get a handle from the calling thread's pool, or create a new one if none is idle
+
+        :return: pycurl.Curl, handle with all options reset
+        """
+        idle: List[Tuple[pycurl.Curl, float]] = self._idle_handles()
+        now: float = time.monotonic()
+        while idle:
+            c, released_at = idle.pop()
+            if now - released_at > self.idle_timeout:
+                c.close()
+                self._count("handles_evicted")
+                continue
+            # pycurl re-attaches the share handle on reset()
+            c.reset()
+            self._count("handles_reused")
+            return c
+        c: pycurl.Curl = pycurl.Curl()
+        c.setopt(pycurl.SHARE, self._share)
+        self._count("handles_created")
+        return c
+
+    def release(self, c: pycurl.Curl) -> None:
+        """
+        Return handle to the calling thread's pool, closes the handle if the pool is full
+
+        :param c: pycurl.Curl, handle acquired with CurlPool.acquire()
+        """
+        try:
+            response_code: int = c.getinfo(pycurl.RESPONSE_CODE)
+            num_connects: int = c.getinfo(pycurl.NUM_CONNECTS)
+        except pycurl.error:
+            response_code, num_connects = 0, 0
+        if num_connects:
+            self._count("connections_created", num_connects)
+        elif response_code:
+            # completed without connecting, a connection of the shared cache was reused
+            self._count("connections_reused")
+        if not response_code:
+            self._count("transfers_failed")
+
+        idle: List[Tuple[pycurl.Curl, float]] = self._idle_handles()
+        if len(idle) >= self.max_size:
+            c.close()
+            self._count("handles_evicted")
+        else:
+            idle.append((c, time.monotonic()))
+
+    def close(self) -> None:
+        """
+        Close all idle handles of the calling thread
+        """
+        idle: List[Tuple[pycurl.Curl, float]] = self._idle_handles()
+        while idle:
+            c, _ = idle.pop()
+            c.close()
+
+
+DEFAULT_POOL: CurlPool = CurlPool()
+
+
+@dataclass
+class TransferStats:
+    """
+    Counters of GET response body bytes received on the wire and after content decoding
+    """
+    requests: int = 0
+    wire_bytes: int = 0
+    decoded_bytes: int = 0
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.decoded_bytes - self.wire_bytes
+
+
+_transfer_stats: Dict[str, TransferStats] = defaultdict(TransferStats)
+_transfer_stats_lock: threading.Lock = threading.Lock()
+
+
+def _record_transfer(c: pycurl.Curl, decoded_bytes: int) -> Tuple[int, int]:
+    """
+    Account body bytes of a finished GET transfer to the host of its effective url
+
+    :return: Tuple[int, int], wire bytes and decoded bytes of the transfer
+    """
+    host: str = urlsplit(c.getinfo(pycurl.EFFECTIVE_URL)).hostname or ""
+    wire_bytes: int = c.getinfo(pycurl.SIZE_DOWNLOAD_T)
+    with _transfer_stats_lock:
+        stats: TransferStats = _transfer_stats[host]
+        stats.requests += 1
+        stats.wire_bytes += wire_bytes
+        stats.decoded_bytes += decoded_bytes
+    return wire_bytes, decoded_bytes
+
+
+def get_transfer_stats() -> Dict[str, TransferStats]:
+    """
+    Return wire and decoded byte counters of GET requests keyed by host, e.g. {"lindat.mff.cuni.cz": TransferStats}
+    """
+    with _transfer_stats_lock:
+        return {host: TransferStats(stats.requests, stats.wire_bytes, stats.decoded_bytes)
+                for host, stats in _transfer_stats.items()}
+
+
+def reset_transfer_stats() -> None:
+    with _transfer_stats_lock:
+        _transfer_stats.clear()
+
+
+_default_cache: Optional[HTTPCache] = None
+
+
+def set_default_cache(cache: Optional[HTTPCache]) -> None:
+    """
+    Set HTTP response cache used by get() when no cache is passed explicitly, None disables caching (default)
+
+    :param cache: Optional[HTTPCache], e.g. HTTPCache("~/.cache/doglib")
+    """
+    global _default_cache
+    _default_cache = cache
+
+
+def get_default_cache() -> Optional[HTTPCache]:
+    return _default_cache
+
+
+def _cache_lookup(cache: Optional[HTTPCache], url: Union[str, PID], headers: dict) \
+        -> Tuple[Optional[CacheEntry], dict]:
+    """
+    :return: Tuple[Optional[CacheEntry], dict], cached entry and request headers extended with conditional headers,
+        fresh entry is returned with None headers meaning no request is needed
+    """
+    if cache is None:
+        return None, headers
+    cache_entry, conditional_headers = cache.get(str(url), headers)
+    if cache_entry is not None and not conditional_headers:
+        return cache_entry, None
+    return cache_entry, {**headers, **conditional_headers}
+
+
+_default_scheduler: Optional[HostScheduler] = HostScheduler()
+
+
+def set_default_scheduler(scheduler: Optional[HostScheduler]) -> None:
+    """
+    Set per-host rate limiter and connection cap used by requests when no scheduler is passed explicitly, None
+    disables scheduling. The initial default scheduler has no limits until configured, e.g. by DOG from repo configs
+
+    :param scheduler: Optional[HostScheduler], e.g. HostScheduler(default_limit=HostLimit(rate=10, burst=10))
+    """
+    global _default_scheduler
+    _default_scheduler = scheduler
+
+
+def get_default_scheduler() -> Optional[HostScheduler]:
+    return _default_scheduler
+
+
+def _schedule(scheduler: Optional[HostScheduler], url: Union[str, PID]) -> str:
+    """
+    Block until the scheduler admits a request to the host of url
+
+    :return: str, scheduled hostname, to be passed to _unschedule() when the request finishes
+    """
+    host: str = urlsplit(str(url)).hostname or ""
+    if scheduler is not None:
+        deadline: Optional[Deadline] = current_deadline()
+        if not scheduler.acquire(host, None if deadline is None else max(deadline.remaining(), 0)):
+            raise deadline.exceeded()
+    return host
+
+
+def _unschedule(scheduler: Optional[HostScheduler], host: str, response_code: int = 0,
+                response_headers: Optional[dict] = None) -> None:
+    """
+    Free the connection slot of the host and honour Retry-After of 429/503 responses
+    """
+    if scheduler is None:
+        return
+    scheduler.release(host)
+    if response_code in (429, 503) and response_headers and "retry-after" in response_headers:
+        scheduler.retry_after(host, response_headers["retry-after"])
+
+
+_default_retry: Optional[RetryPolicy] = RetryPolicy()
+
+
+def set_default_retry_policy(retry: Optional[RetryPolicy]) -> None:
+    """
+    Set retry policy of transient failures used by requests when no policy is passed explicitly, None disables
+    retries
+
+    :param retry: Optional[RetryPolicy], e.g. RetryPolicy(max_attempts=5)
+    """
+    global _default_retry
+    _default_retry = retry
+
+
+def get_default_retry_policy() -> Optional[RetryPolicy]:
+    return _default_retry
+
+
+def _backoff(retry: Optional[RetryPolicy], attempt: int, status: int = 0, curl_errno: int = 0) -> Optional[float]:
+    """
+    :return: Optional[float], seconds to wait before retrying the failed attempt, None if it is not to be retried
+    """
+    if retry is None or not retry.should_retry(attempt, status, curl_errno):
+        return None
+    delay: float = retry.delay(attempt)
+    deadline: Optional[Deadline] = current_deadline()
+    if deadline is not None and delay >= deadline.remaining():
+        return None
+    return delay
+
+
+def _retrying(retry: Optional[RetryPolicy], perform: Callable[[], tuple]) -> tuple:
+    """
+    Call perform until it succeeds or fails for good, its result starts with the response code
+
+    :param retry: Optional[RetryPolicy], policy of transient failures, no retries if None
+    :param perform: Callable[[], tuple], single request attempt
+    :return: tuple, result of the final attempt
+    """
+    attempt: int = 0
+    while True:
+        attempt += 1
+        try:
+            result: tuple = perform()
+            delay: Optional[float] = _backoff(retry, attempt, status=result[0])
+        except pycurl.error as error:
+            _check_deadline(error)
+            delay = _backoff(retry, attempt, curl_errno=error.args[0])
+            if delay is None:
+                raise
+        if delay is None:
+            return result
+        time.sleep(delay)
+
+
+# identical requests in flight (same method, url, headers and options) are performed once, see SingleFlight
+_flights: SingleFlight = SingleFlight()
+
+
+def _flight_key(method: str, url: Union[str, PID], headers: dict, *options: Any) -> Hashable:
+    return (method, HTTPCache.key(str(url), headers)) + options
+
+
+def get_flight_stats() -> FlightStats:
+    """
+    :return: FlightStats, number of get()/head()/resolve() calls and of those served by an identical request in flight
+    """
+    return _flights.stats
+
+
+def _check_deadline(error: pycurl.error) -> None:
+    """
+    Translate curl error of a request cut short by the deadline of the current DOG call into DeadlineExceeded
+    """
+    deadline: Optional[Deadline] = current_deadline()
+    if deadline is None:
+        return
+    # curl timers may fire a few milliseconds before the budget is spent
+    if deadline.expired() or (error.args[0] == pycurl.E_OPERATION_TIMEDOUT and deadline.remaining() < 0.05):
+        raise deadline.exceeded() from error
+
+
+def get_pool_stats(pool: CurlPool = DEFAULT_POOL) -> PoolStats:
+    """
+    Return handle and connection reuse counters of the pool, default pool if not specified
+    """
+    return pool.stats
+
+
+def _acquire(pool: Optional[CurlPool]) -> pycurl.Curl:
+    if pool is None:
+        return pycurl.Curl()
+    return pool.acquire()
+
+
+def _release(pool: Optional[CurlPool], c: pycurl.Curl) -> None:
+    if pool is None:
+        c.close()
+    else:
+        pool.release(c)
+
+
+_ca_path: Optional[str] = None
+
+
+def _ca_bundle() -> str:
+    """
+    :return: str, path of certifi CA bundle, certifi (and importlib.resources) imported on the first request rather
+        than on "import doglib"
+    """
+    global _ca_path
+    if _ca_path is None:
+        import certifi
+        _ca_path = certifi.where()
+    return _ca_path
+
+
+def _setopt_request(c: pycurl.Curl, url: Union[str, PID], headers: dict, follow_redirects: bool, verbose: int,
+                    connect_timeout: int) -> None:
+    """
+    Set options shared by GET and HEAD requests on a (pooled) handle. Within a deadline (see deadline.deadline())
+    the remaining time bounds connect timeout, total transfer time and stalled transfers, raises DeadlineExceeded
+    if no time remains
+    """
+    c.setopt(c.URL, url)
+    if headers:
+        c.setopt(c.HTTPHEADER, [k + ': ' + v for k, v in list(headers.items())])
+    c.setopt(c.FOLLOWLOCATION, follow_redirects)
+    deadline: Optional[Deadline] = current_deadline()
+    if deadline is None:
+        c.setopt(pycurl.CONNECTTIMEOUT, connect_timeout)
+    else:
+        remaining_ms: int = int(deadline.remaining() * 1000)
+        if remaining_ms <= 0:
+            raise deadline.exceeded()
+        c.setopt(pycurl.CONNECTTIMEOUT_MS, min(connect_timeout * 1000, remaining_ms))
+        c.setopt(pycurl.TIMEOUT_MS, remaining_ms)
+        # abort transfers stalled below 1 byte/s for the rest of the budget, rounded up, so a stall shorter than
+        # the budget does not abort the transfer
+        c.setopt(pycurl.LOW_SPEED_LIMIT, 1)
+        c.setopt(pycurl.LOW_SPEED_TIME, max(-(-remaining_ms // 1000), 1))
+    c.setopt(c.CAINFO, _ca_bundle())
+    c.setopt(c.USERAGENT, CUSTOM_USER_AGENT)
+    c.setopt(pycurl.VERBOSE, verbose)
+
+
+def _setopt_get(c: pycurl.Curl, url: Union[str, PID], headers: dict, follow_redirects: bool, verbose: int,
+                ssl_validation: bool, compressed: bool = True) -> Tuple[BytesIO, BytesIO]:
+    """
+    Prepare handle for GET request, compressed requests advertise ACCEPT_ENCODING and are decoded by libcurl
+
+    :return: Tuple[BytesIO, BytesIO], response body and response headers buffers
+    """
+    response_body: BytesIO = BytesIO()
+    response_headers: BytesIO = BytesIO()
+    _setopt_request(c, url, headers, follow_redirects, verbose, connect_timeout=600)
+    if ssl_validation:
+        c.setopt(pycurl.SSL_VERIFYPEER, 1)
+        c.setopt(pycurl.SSL_VERIFYHOST, 2)
+    else:
+        c.setopt(pycurl.SSL_VERIFYPEER, 0)
+        c.setopt(pycurl.SSL_VERIFYHOST, 0)
+    if compressed and ACCEPT_ENCODING:
+        c.setopt(pycurl.ACCEPT_ENCODING, ACCEPT_ENCODING)
+    c.setopt(c.WRITEFUNCTION, response_body.write)
+    c.setopt(c.HEADERFUNCTION, response_headers.write)
+    return response_body, response_headers
+
+
+def _setopt_head(c: pycurl.Curl, url: Union[str, PID], headers: dict, follow_redirects: bool,
+                 verbose: int) -> "HeaderProcessor":
+    """
+    Prepare handle for HEAD request
+
+    :return: HeaderProcessor, collector of response headers
+    """
+    _setopt_request(c, url, headers, follow_redirects, verbose, connect_timeout=60)
+    c.setopt(c.NOBODY, True)
+    header_processor = HeaderProcessor()
+    c.setopt(pycurl.HEADERFUNCTION, header_processor.process_header_line)
+    return header_processor
+
+
 def get(url: Union[str, PID],
         headers: dict = None,
         follow_redirects: bool = False,
         verbose: int = 0,
-        ssl_validation: bool = True) -> Tuple[str, str, str]:
+        ssl_validation: bool = True,
+        pool: Optional[CurlPool] = DEFAULT_POOL,
+        cache: Optional[HTTPCache] = None,
+        compressed: bool = True,
+        scheduler: Optional[HostScheduler] = None,
+        retry: Optional[RetryPolicy] = None) -> Tuple[str, str, str]:
     """
     Performs http GET request using PyCurl
     :param url: Union[str, PID], request url
@@ -32,6 +489,14 @@ def get(url: Union[str, PID],
         0: no std output other than exceptions
         1: PyCurl verbose
     :param ssl_validation: bool
+    :param pool: Optional[CurlPool], pool of reusable handles, DEFAULT_POOL by default, None for a one-off handle
+    :param cache: Optional[HTTPCache], response cache, default cache (see set_default_cache()) if not provided
+    :param compressed: bool, whether to request gzip/deflate/br compressed response, see ACCEPT_ENCODING. Wire and
+        decoded sizes of the body are accounted in get_transfer_stats()
+    :param scheduler: Optional[HostScheduler], per-host rate limiter the request waits for, default scheduler (see
+        set_default_scheduler()) if not provided. Limits apply to the host of the request url, not redirect targets
+    :param retry: Optional[RetryPolicy], retries of transient failures (connection reset, 429, 502, 503, 504),
+        default policy (see set_default_retry_policy()) if not provided
     :return: Tuple[str, str, str],
         0: effective url request (final redirection landing url)
         1: response body
@@ -40,38 +505,75 @@ def get(url: Union[str, PID],
 
     if headers is None:
         headers = {}
-    response_body: BytesIO = BytesIO()
-    response_headers: BytesIO = BytesIO()
-    c: pycurl.Curl = pycurl.Curl()
-    c.setopt(c.URL, url)
-    if headers:
-        c.setopt(c.HTTPHEADER, [k + ': ' + v for k, v in list(headers.items())])
-    if ssl_validation:
-        c.setopt(pycurl.SSL_VERIFYPEER, 1)
-        c.setopt(pycurl.SSL_VERIFYHOST, 2)
-    else:
-        c.setopt(pycurl.SSL_VERIFYPEER, 0)
-        c.setopt(pycurl.SSL_VERIFYHOST, 0)
-    c.setopt(c.WRITEFUNCTION, response_body.write)
-    c.setopt(c.HEADERFUNCTION, response_headers.write)
-    c.setopt(c.FOLLOWLOCATION, follow_redirects)
-    c.setopt(pycurl.CONNECTTIMEOUT, 600)
-    c.setopt(c.CAINFO, certifi.where())
-    c.setopt(c.USERAGENT, CUSTOM_USER_AGENT)
-    c.setopt(pycurl.VERBOSE, verbose)
-    c.perform()
+    if cache is None:
+        cache = _default_cache
+    cache_entry, request_headers = _cache_lookup(cache, url, headers)
+    if request_headers is None:
+        return cache_entry.effective_url, cache_entry.body, cache_entry.headers
+    if scheduler is None:
+        scheduler = _default_scheduler
+    if retry is None:
+        retry = _default_retry
 
-    response_code = c.getinfo(c.RESPONSE_CODE)
-    if response_code != 200:
-        raise RequestError(f"Response code from {url}: {response_code}") #TODO
+    def perform() -> Tuple[str, str, str]:
+        response_code, effective_url, response_body, response_headers = _retrying(
+            retry, lambda: _perform_get(url, request_headers, follow_redirects, verbose, ssl_validation, pool,
+                                        compressed, scheduler))
+        return _get_response(url, headers, cache, cache_entry, response_code, effective_url, response_body,
+                             response_headers)
+
+    return _flights.do(_flight_key("GET", url, request_headers, follow_redirects, ssl_validation, compressed), perform)
 
+
+def _perform_get(url: Union[str, PID], headers: dict, follow_redirects: bool, verbose: int, ssl_validation: bool,
+                 pool: Optional[CurlPool], compressed: bool,
+                 scheduler: Optional[HostScheduler]) -> Tuple[int, str, BytesIO, BytesIO]:
+    """
+    Perform single GET attempt
+
+    :return: Tuple[int, str, BytesIO, BytesIO], response code, effective url, response body and headers buffers
+    """
+    host: str = _schedule(scheduler, url)
+    response_code: int = 0
+    c: pycurl.Curl = _acquire(pool)
+    try:
+        response_body, response_headers = _setopt_get(c, url, headers, follow_redirects, verbose,
+                                                      ssl_validation, compressed)
+        c.perform()
+
+        response_code = c.getinfo(c.RESPONSE_CODE)
+        effective_url: str = c.getinfo(c.EFFECTIVE_URL)
+        _record_transfer(c, response_body.getbuffer().nbytes)
+    finally:
+        _release(pool, c)
+        _unschedule(scheduler, host, response_code,
+                    parse_response_headers(response_headers.getvalue().decode("iso-8859-1"))
+                    if response_code in (429, 503) else None)
+    return response_code, effective_url, response_body, response_headers
+
+
+def _get_response(url: Union[str, PID], headers: dict, cache: Optional[HTTPCache], cache_entry: Optional[CacheEntry],
+                  response_code: int, effective_url: str, response_body: BytesIO,
+                  response_headers: BytesIO) -> Tuple[str, str, str]:
+    """
+    Decode GET response, serves revalidated cache entry on 304 and stores 200 response in the cache
+    """
     decoded_response_headers: str = response_headers.getvalue().decode("iso-8859-1")
+    if response_code == 304 and cache_entry is not None:
+        cache_entry = cache.revalidated(str(url), headers, cache_entry, decoded_response_headers)
+        return cache_entry.effective_url, cache_entry.body, cache_entry.headers
+    if response_code != 200:
+        raise RequestError(f"Response code from {url}: {response_code}", response_code)
+
     decoded_response_body: str = response_body.getvalue().decode("utf-8")
-    return c.getinfo(c.EFFECTIVE_URL), decoded_response_body, decoded_response_headers
+    if cache is not None:
+        cache.store(str(url), headers, effective_url, decoded_response_body, decoded_response_headers)
+    return effective_url, decoded_response_body, decoded_response_headers
 
 
-def head(url: Union[str, PID], headers: dict = None, follow_redirects: bool = False, verbose: int = 0) -> \
-        Tuple[str, dict]:
+def head(url: Union[str, PID], headers: dict = None, follow_redirects: bool = False, verbose: int = 0,
+         pool: Optional[CurlPool] = DEFAULT_POOL, scheduler: Optional[HostScheduler] = None,
+         retry: Optional[RetryPolicy] = None) -> Tuple[str, dict]:
     """
     Performs http HEAD request using PyCurl
     :param url: request url
@@ -84,6 +586,12 @@ def head(url: Union[str, PID], headers: dict = None, follow_redirects: bool = Fa
         0: no std output other than exceptions
         1: PyCurl verbose
     :type verbose: int
+    :param pool: pool of reusable handles, DEFAULT_POOL by default, None for a one-off handle
+    :type pool: Optional[CurlPool]
+    :param scheduler: per-host rate limiter, default scheduler if not provided, see get()
+    :type scheduler: Optional[HostScheduler]
+    :param retry: retries of transient failures, default policy if not provided, see get()
+    :type retry: Optional[RetryPolicy]
     :returns: ,
         0: effective url request (final redirection landing url)
         1: response headers
@@ -91,29 +599,821 @@ def head(url: Union[str, PID], headers: dict = None, follow_redirects: bool = Fa
     """
     if headers is None:
         headers = {}
+    if scheduler is None:
+        scheduler = _default_scheduler
+    if retry is None:
+        retry = _default_retry
+
+    def perform() -> Tuple[str, dict]:
+        response_code, effective_url, response_headers = _retrying(
+            retry, lambda: _perform_head(url, headers, follow_redirects, verbose, pool, scheduler))
+        if response_code != 200:
+            raise RequestError(f"Response code from {url}: {response_code}", response_code)
+        # TODO safer cURL header response parsing
+        return effective_url, response_headers
+
+    effective_url, response_headers = _flights.do(_flight_key("HEAD", url, headers, follow_redirects), perform)
+    return effective_url, dict(response_headers)
+
+
+def _perform_head(url: Union[str, PID], headers: dict, follow_redirects: bool, verbose: int,
+                  pool: Optional[CurlPool], scheduler: Optional[HostScheduler]) -> Tuple[int, str, dict]:
+    """
+    Perform single HEAD attempt
+
+    :return: Tuple[int, str, dict], response code, effective url and response headers
+    """
+    host: str = _schedule(scheduler, url)
+    response_code: int = 0
+    c: pycurl.Curl = _acquire(pool)
+    try:
+        header_processor: HeaderProcessor = _setopt_head(c, url, headers, follow_redirects, verbose)
+        c.perform()
+
+        response_code = c.getinfo(c.RESPONSE_CODE)
+        effective_url: str = c.getinfo(c.EFFECTIVE_URL)
+    finally:
+        _release(pool, c)
+        _unschedule(scheduler, host, response_code, header_processor.headers if response_code else None)
+    return response_code, effective_url, header_processor.headers
+
+
+_default_resolution_cache: Optional[ResolutionCache] = ResolutionCache()
+
+
+def set_default_resolution_cache(cache: Optional[ResolutionCache]) -> None:
+    """
+    Set redirect resolution cache used by resolve() when no cache is passed explicitly, None disables caching.
+    Initially an in-memory ResolutionCache()
+
+    :param cache: Optional[ResolutionCache], e.g. ResolutionCache(path="resolutions.json")
+    """
+    global _default_resolution_cache
+    _default_resolution_cache = cache
+
+
+def get_default_resolution_cache() -> Optional[ResolutionCache]:
+    return _default_resolution_cache
+
+
+def _abort_body(chunk: bytes) -> int:
+    """
+    WRITEFUNCTION aborting the transfer on the first body chunk of the final response
+    """
+    return 0
+
+
+def _setopt_resolve(c: pycurl.Curl, url: Union[str, PID], headers: dict, verbose: int) -> BytesIO:
+    """
+    Prepare handle for redirect resolution: GET following redirects, aborted as soon as the final response body
+    starts, so only headers of every hop are transferred. Unlike HEAD it is answered like the GET it stands for
+
+    :return: BytesIO, response headers buffer
+    """
+    _, response_headers = _setopt_get(c, url, headers, True, verbose, True, compressed=False)
+    c.setopt(c.WRITEFUNCTION, _abort_body)
+    return response_headers
+
+
+def _resolved(c: pycurl.Curl, error: Optional[pycurl.error]) -> Tuple[int, str]:
+    """
+    :return: Tuple[int, str], response code and effective url of a resolution transfer, the write error of the
+        aborted body is not a failure
+    """
+    if error is not None and error.args[0] != pycurl.E_WRITE_ERROR:
+        raise error
+    _record_transfer(c, 0)
+    return c.getinfo(c.RESPONSE_CODE), c.getinfo(c.EFFECTIVE_URL)
+
+
+def _retry_after_headers(response_code: int, response_headers: BytesIO) -> Optional[dict]:
+    """
+    :return: Optional[dict], parsed headers of a response the scheduler has to honour Retry-After of
+    """
+    if response_code not in (429, 503):
+        return None
+    return parse_response_headers(response_headers.getvalue().decode("iso-8859-1"))
+
+
+def resolve(url: Union[str, PID],
+            headers: dict = None,
+            verbose: int = 0,
+            pool: Optional[CurlPool] = DEFAULT_POOL,
+            cache: Optional[ResolutionCache] = None,
+            scheduler: Optional[HostScheduler] = None,
+            retry: Optional[RetryPolicy] = None) -> str:
+    """
+    Resolve url to the effective url its redirects land on, without downloading the landing page. Results are kept
+    in the resolution cache
+
+    :param url: Union[str, PID], url to resolve, e.g. resolvable form of HDL or DOI
+    :param headers: dict, request headers, redirects may depend on them (content negotiation)
+    :param verbose: int, PyCurl verbosity, see get()
+    :param pool: Optional[CurlPool], pool of reusable handles, DEFAULT_POOL by default, None for a one-off handle
+    :param cache: Optional[ResolutionCache], resolution cache, default (see set_default_resolution_cache()) if not
+        provided
+    :param scheduler: Optional[HostScheduler], per-host rate limiter, default scheduler if not provided, see get()
+    :param retry: Optional[RetryPolicy], retries of transient failures, default policy if not provided, see get()
+    :return: str, effective url, raises RequestError if the final response code is not 200
+    """
+    if headers is None:
+        headers = {}
+    if cache is None:
+        cache = _default_resolution_cache
+    if cache is not None:
+        effective_url: Optional[str] = cache.get(str(url), headers)
+        if effective_url is not None:
+            return effective_url
+    if scheduler is None:
+        scheduler = _default_scheduler
+    if retry is None:
+        retry = _default_retry
+
+    def perform() -> str:
+        response_code, effective_url = _retrying(retry, lambda: _perform_resolve(url, headers, verbose, pool,
+                                                                                 scheduler))
+        if response_code != 200:
+            raise RequestError(f"Response code from {url}: {response_code}", response_code)
+        if cache is not None:
+            cache.set(str(url), headers, effective_url)
+        return effective_url
+
+    return _flights.do(_flight_key("RESOLVE", url, headers), perform)
+
+
+def _perform_resolve(url: Union[str, PID], headers: dict, verbose: int, pool: Optional[CurlPool],
+                     scheduler: Optional[HostScheduler]) -> Tuple[int, str]:
+    """
+    Perform single resolution attempt
+
+    :return: Tuple[int, str], response code and effective url
+    """
+    host: str = _schedule(scheduler, url)
+    response_code: int = 0
+    c: pycurl.Curl = _acquire(pool)
     response_headers: BytesIO = BytesIO()
-    c: pycurl.Curl = pycurl.Curl()
-    c.setopt(c.URL, url)
-    if headers:
-        c.setopt(c.HTTPHEADER, [k + ': ' + v for k, v in list(headers.items())])
-    c.setopt(c.NOBODY, True)
-    c.setopt(c.HEADERFUNCTION, response_headers.write)
-    c.setopt(c.FOLLOWLOCATION, follow_redirects)
-    c.setopt(pycurl.CONNECTTIMEOUT, 60)
-    c.setopt(c.CAINFO, certifi.where())
-    c.setopt(c.USERAGENT, CUSTOM_USER_AGENT)
-    header_processor = HeaderProcessor()
-    c.setopt(pycurl.HEADERFUNCTION, header_processor.process_header_line)
-    c.setopt(pycurl.VERBOSE, verbose)
-    c.perform()
+    try:
+        response_headers = _setopt_resolve(c, url, headers, verbose)
+        try:
+            c.perform()
+            error: Optional[pycurl.error] = None
+        except pycurl.error as perform_error:
+            error = perform_error
+        response_code, effective_url = _resolved(c, error)
+    finally:
+        _release(pool, c)
+        _unschedule(scheduler, host, response_code, _retry_after_headers(response_code, response_headers))
+    return response_code, effective_url
 
-    response_code = c.getinfo(c.RESPONSE_CODE)
-    if response_code != 200:
-        raise RequestError(f"Response code from {url}: {response_code}")  # TODO
-    # decoded_response_headers: str = response_headers.getvalue().decode("iso-8859-1")
-    # TODO safer cURL header response parsing
 
-    return c.getinfo(c.EFFECTIVE_URL), header_processor.headers
+def iter_get(url: Union[str, PID],
+             headers: dict = None,
+             follow_redirects: bool = False,
+             verbose: int = 0,
+             ssl_validation: bool = True,
+             pool: Optional[CurlPool] = DEFAULT_POOL,
+             compressed: bool = True,
+             scheduler: Optional[HostScheduler] = None) -> Generator[bytes, None, None]:
+    """
+    Performs http GET request yielding raw response body chunks as they arrive, for incremental (streaming)
+    parsing of large responses. The transfer is driven by a pycurl.CurlMulti, so control returns to the consumer
+    between network reads and the body is never held in memory as a whole. Closing the generator aborts the transfer
+
+    :param url: Union[str, PID], request url
+    :param headers: dict, request headers
+    :param follow_redirects: bool, whether to follow redirects, False by default
+    :param verbose: int, PyCurl verbosity, see get()
+    :param ssl_validation: bool
+    :param pool: Optional[CurlPool], pool of reusable handles, DEFAULT_POOL by default, None for a one-off handle
+    :param compressed: bool, whether to request compressed response, see get(), chunks are always decoded
+    :param scheduler: Optional[HostScheduler], per-host rate limiter, default scheduler if not provided, see get()
+    :return: Generator[bytes], response body chunks, raises RequestError if response code is not 200
+    """
+    if headers is None:
+        headers = {}
+    if scheduler is None:
+        scheduler = _default_scheduler
+    chunks: List[bytes] = []
+    decoded_bytes: int = 0
+    host: str = _schedule(scheduler, url)
+    c: pycurl.Curl = _acquire(pool)
+    multi: pycurl.CurlMulti = pycurl.CurlMulti()
+    added: bool = False
+    try:
+        _setopt_get(c, url, headers, follow_redirects, verbose, ssl_validation, compressed)
+        c.setopt(c.WRITEFUNCTION, chunks.append)
+        multi.add_handle(c)
+        added = True
+        running: int = 1
+        while running:
+            while True:
+                ret, running = multi.perform()
+                if ret != pycurl.E_CALL_MULTI_PERFORM:
+                    break
+            _, _, err_list = multi.info_read()
+            for _, errno, errmsg in err_list:
+                error: pycurl.error = pycurl.error(errno, errmsg)
+                _check_deadline(error)
+                raise error
+            if chunks:
+                response_code: int = c.getinfo(c.RESPONSE_CODE)
+                if response_code != 200:
+                    raise RequestError(f"Response code from {url}: {response_code}", response_code)
+                received: List[bytes] = chunks[:]
+                chunks.clear()
+                decoded_bytes += sum(len(chunk) for chunk in received)
+                yield from received
+            if running:
+                multi.select(1.0)
+        response_code = c.getinfo(c.RESPONSE_CODE)
+        if response_code != 200:
+            raise RequestError(f"Response code from {url}: {response_code}", response_code)
+        _record_transfer(c, decoded_bytes)
+    finally:
+        # setopt may fail (e.g. DeadlineExceeded) before the handle is added, cleanup must not mask the error
+        try:
+            if added:
+                multi.remove_handle(c)
+            multi.close()
+        finally:
+            try:
+                _release(pool, c)
+            finally:
+                _unschedule(scheduler, host)
+
+
+@dataclass
+class RequestTiming:
+    """
+    Per-request timing retrieved from pycurl getinfo, seconds since the start of the transfer
+    """
+    namelookup: float = 0.0
+    connect: float = 0.0
+    appconnect: float = 0.0
+    starttransfer: float = 0.0
+    total: float = 0.0
+
+
+@dataclass
+class MultiResult:
+    """
+    Result of a single request performed by MultiTransport. Failed requests carry the exception in `error` instead
+    of raising it, so one failure does not abort the batch
+    """
+    url: str
+    effective_url: str = ""
+    body: str = ""
+    headers: Union[str, dict] = ""
+    status: int = 0
+    error: Optional[Exception] = None
+    timing: RequestTiming = field(default_factory=RequestTiming)
+    wire_bytes: int = 0
+    decoded_bytes: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class _Transfer:
+    """
+    Bookkeeping of a single request queued or in flight in MultiTransport
+    """
+    def __init__(self, key: Hashable, url: str, headers: dict, follow_redirects: bool, nobody: bool,
+                 compressed: bool = True, header_only: bool = False):
+        self.key: Hashable = key
+        self.url: str = url
+        self.headers: dict = headers
+        self.follow_redirects: bool = follow_redirects
+        self.nobody: bool = nobody
+        self.compressed: bool = compressed
+        self.header_only: bool = header_only
+        self.host: str = urlsplit(url).hostname or ""
+        self.handle: Optional[pycurl.Curl] = None
+        self.response_body: Optional[BytesIO] = None
+        self.response_headers: Optional[BytesIO] = None
+        self.header_processor: Optional[HeaderProcessor] = None
+        self.attempt: int = 0
+        # time.monotonic() before which a retried transfer must not start
+        self.not_before: float = 0.0
+
+
+class MultiTransport:
+    """
+    Concurrent transport running many GET/HEAD requests at once on a single thread with pycurl.CurlMulti.
+
+    Requests are queued with submit() and performed by iterating over perform(), which yields (key, MultiResult)
+    pairs as transfers complete. Requests may be submitted while iterating. At most max_in_flight transfers run
+    at once, and at most max_per_host of them to the same host. Requests to hosts delayed by the scheduler stay
+    queued, while requests to other hosts keep starting. Transient failures are requeued according to the retry
+    policy and only the final attempt is yielded
+    """
+    def __init__(self, max_in_flight: int = 100, max_per_host: int = 6, verbose: int = 0,
+                 ssl_validation: bool = True, pool: Optional[CurlPool] = DEFAULT_POOL,
+                 scheduler: Optional[HostScheduler] = None, retry: Optional[RetryPolicy] = None):
+        """
+        :param max_in_flight: int, global cap on concurrently running transfers
+        :param max_per_host: int, cap on concurrently running transfers to a single host
+        :param verbose: int, PyCurl verbosity, see get()
+        :param ssl_validation: bool, whether to verify peer certificates of GET requests
+        :param pool: Optional[CurlPool], pool the easy handles are taken from, None for one-off handles
+        :param scheduler: Optional[HostScheduler], per-host rate limiter, default scheduler if not provided
+        :param retry: Optional[RetryPolicy], retries of transient failures, default policy if not provided
+        """
+        self.max_in_flight: int = max_in_flight
+        self.max_per_host: int = max_per_host
+        self.verbose: int = verbose
+        self.ssl_validation: bool = ssl_validation
+        self.pool: Optional[CurlPool] = pool
+        self.scheduler: Optional[HostScheduler] = scheduler if scheduler is not None else _default_scheduler
+        self.retry: Optional[RetryPolicy] = retry if retry is not None else _default_retry
+        self._multi: pycurl.CurlMulti = pycurl.CurlMulti()
+        self._multi.setopt(pycurl.M_MAX_HOST_CONNECTIONS, max_per_host)
+        # seconds until the earliest request delayed by the scheduler or backoff may start
+        self._scheduled_delay: float = 1.0
+        self._pending: Dict[str, Deque[_Transfer]] = {}
+        self._in_flight: Dict[pycurl.Curl, _Transfer] = {}
+        self._host_in_flight: Dict[str, int] = defaultdict(int)
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._pending.values()) + len(self._in_flight)
+
+    def submit(self, key: Hashable, url: Union[str, PID], headers: dict = None, follow_redirects: bool = False,
+               nobody: bool = False, compressed: bool = True, header_only: bool = False) -> None:
+        """
+        Queue request
+
+        :param key: Hashable, key identifying the request in perform() output
+        :param url: Union[str, PID], request url
+        :param headers: dict, request headers, as in get()
+        :param follow_redirects: bool, whether to follow redirects, False by default
+        :param nobody: bool, perform HEAD instead of GET
+        :param compressed: bool, whether to request compressed response, see get()
+        :param header_only: bool, resolve redirects as resolve() does: GET following redirects aborted as soon as
+            the final response body starts, MultiResult carries effective url and headers with empty body
+        """
+        transfer: _Transfer = _Transfer(key, str(url), headers or {}, follow_redirects, nobody, compressed,
+                                        header_only)
+        self._pending.setdefault(transfer.host, deque()).append(transfer)
+
+    def _start(self, transfer: _Transfer) -> None:
+        transfer.attempt += 1
+        c: pycurl.Curl = _acquire(self.pool)
+        try:
+            if transfer.nobody:
+                transfer.header_processor = _setopt_head(c, transfer.url, transfer.headers,
+                                                         transfer.follow_redirects, self.verbose)
+            elif transfer.header_only:
+                transfer.response_body = BytesIO()
+                transfer.response_headers = _setopt_resolve(c, transfer.url, transfer.headers, self.verbose)
+            else:
+                transfer.response_body, transfer.response_headers = _setopt_get(
+                    c, transfer.url, transfer.headers, transfer.follow_redirects, self.verbose, self.ssl_validation,
+                    transfer.compressed)
+        except DeadlineExceeded:
+            _release(self.pool, c)
+            if self.scheduler is not None:
+                self.scheduler.release(transfer.host)
+            raise
+        transfer.handle = c
+        self._in_flight[c] = transfer
+        self._host_in_flight[transfer.host] += 1
+        self._multi.add_handle(c)
+
+    def _fill(self) -> None:
+        """
+        Move queued requests in flight while respecting global and per-host caps and the scheduler, hosts are
+        served round-robin
+        """
+        self._scheduled_delay = 1.0
+        while self._pending and len(self._in_flight) < self.max_in_flight:
+            started: bool = False
+            for host in list(self._pending.keys()):
+                if len(self._in_flight) >= self.max_in_flight:
+                    break
+                if self._host_in_flight[host] >= self.max_per_host:
+                    continue
+                backoff: float = self._pending[host][0].not_before - time.monotonic()
+                if backoff > 0:
+                    self._scheduled_delay = min(self._scheduled_delay, backoff)
+                    continue
+                if self.scheduler is not None:
+                    delay: float = self.scheduler.try_acquire(host)
+                    if delay > 0:
+                        self._scheduled_delay = min(self._scheduled_delay, delay)
+                        continue
+                queue: Deque[_Transfer] = self._pending[host]
+                self._start(queue.popleft())
+                started = True
+                if not queue:
+                    del self._pending[host]
+            if not started:
+                break
+
+    def _finish(self, c: pycurl.Curl, error: Optional[Exception]) -> Optional[Tuple[Hashable, MultiResult]]:
+        """
+        Collect result of a completed transfer, None if the transfer was requeued for retry
+        """
+        self._multi.remove_handle(c)
+        transfer: _Transfer = self._in_flight.pop(c)
+        self._host_in_flight[transfer.host] -= 1
+        result: MultiResult = MultiResult(url=transfer.url)
+        response_headers: Optional[dict] = None
+        if transfer.header_only and isinstance(error, pycurl.error) and error.args[0] == pycurl.E_WRITE_ERROR:
+            # body aborted on purpose
+            error = None
+        try:
+            result.status = c.getinfo(pycurl.RESPONSE_CODE)
+            result.effective_url = c.getinfo(pycurl.EFFECTIVE_URL)
+            result.timing = RequestTiming(namelookup=c.getinfo(pycurl.NAMELOOKUP_TIME),
+                                          connect=c.getinfo(pycurl.CONNECT_TIME),
+                                          appconnect=c.getinfo(pycurl.APPCONNECT_TIME),
+                                          starttransfer=c.getinfo(pycurl.STARTTRANSFER_TIME),
+                                          total=c.getinfo(pycurl.TOTAL_TIME))
+            if error is None and result.status != 200:
+                error = RequestError(f"Response code from {transfer.url}: {result.status}", result.status)
+            if transfer.nobody:
+                result.headers = response_headers = transfer.header_processor.headers
+            else:
+                result.headers = transfer.response_headers.getvalue().decode("iso-8859-1")
+                if error is None:
+                    result.wire_bytes, result.decoded_bytes = _record_transfer(
+                        c, transfer.response_body.getbuffer().nbytes)
+                    result.body = transfer.response_body.getvalue().decode("utf-8")
+        except (pycurl.error, UnicodeDecodeError) as decode_error:
+            error = error or decode_error
+        finally:
+            _release(self.pool, c)
+        if self.scheduler is not None:
+            if not transfer.nobody and result.status in (429, 503):
+                response_headers = parse_response_headers(result.headers)
+            _unschedule(self.scheduler, transfer.host, result.status, response_headers)
+        if error is not None:
+            delay: Optional[float] = _backoff(self.retry, transfer.attempt, status=result.status,
+                                              curl_errno=error.args[0] if isinstance(error, pycurl.error) else 0)
+            if delay is not None:
+                transfer.not_before = time.monotonic() + delay
+                self._pending.setdefault(transfer.host, deque()).appendleft(transfer)
+                return None
+        result.error = error
+        return transfer.key, result
+
+    def perform(self) -> Generator[Tuple[Hashable, MultiResult], None, None]:
+        """
+        Perform queued requests, yields (key, MultiResult) pairs in order of completion until no request is left
+        """
+        while self._pending or self._in_flight:
+            self._fill()
+            while True:
+                ret, _ = self._multi.perform()
+                if ret != pycurl.E_CALL_MULTI_PERFORM:
+                    break
+            while True:
+                num_queued, ok_list, err_list = self._multi.info_read()
+                finished: List[Optional[Tuple[Hashable, MultiResult]]] = [self._finish(c, None) for c in ok_list]
+                finished.extend(self._finish(c, pycurl.error(errno, errmsg)) for c, errno, errmsg in err_list)
+                yield from (key_result for key_result in finished if key_result is not None)
+                if num_queued == 0:
+                    break
+            if self._in_flight:
+                timeout_ms: int = self._multi.timeout()
+                timeout: float = timeout_ms / 1000 if timeout_ms >= 0 else 1.0
+                if self._pending:
+                    timeout = min(timeout, self._scheduled_delay)
+                self._multi.select(timeout)
+            elif self._pending:
+                time.sleep(self._scheduled_delay)
+
+    def close(self) -> None:
+        for c, transfer in list(self._in_flight.items()):
+            self._multi.remove_handle(c)
+            _release(self.pool, c)
+            _unschedule(self.scheduler, transfer.host)
+        self._in_flight.clear()
+        self._pending.clear()
+        self._multi.close()
+
+
+def _request_key(request: Union[str, Tuple[str, dict]]) -> Hashable:
+    """
+    :return: Hashable, result key of a request listed without key: the url of a plain url, the url and frozen
+        headers of a (url, headers) tuple, so requests of the same url with different headers are told apart
+    """
+    if isinstance(request, tuple):
+        url, headers = request
+        return str(url), frozenset((headers or {}).items())
+    return request
+
+
+def _multi_perform(requests: Iterable[Union[str, Tuple[str, dict]]], nobody: bool, follow_redirects: bool,
+                   max_in_flight: int, max_per_host: int, verbose: int) -> Dict[Hashable, MultiResult]:
+    transport: MultiTransport = MultiTransport(max_in_flight=max_in_flight, max_per_host=max_per_host,
+                                               verbose=verbose)
+    if isinstance(requests, dict):
+        items = requests.items()
+    else:
+        items = ((_request_key(request), request) for request in requests)
+    submitted: Set[Hashable] = set()
+    for key, request in items:
+        if key in submitted:
+            # identical request listed twice, performed once
+            continue
+        submitted.add(key)
+        if isinstance(request, tuple):
+            url, headers = request
+        else:
+            url, headers = request, None
+        transport.submit(key, url, headers, follow_redirects=follow_redirects, nobody=nobody)
+    try:
+        return dict(transport.perform())
+    finally:
+        transport.close()
+
+
+def multi_get(requests: Union[Iterable[Union[str, Tuple[str, dict]]], Dict[Hashable, Union[str, Tuple[str, dict]]]],
+              follow_redirects: bool = False, max_in_flight: int = 100, max_per_host: int = 6,
+              verbose: int = 0) -> Dict[Hashable, MultiResult]:
+    """
+    Performs many http GET requests concurrently using pycurl.CurlMulti
+
+    :param requests: request urls, keyed by url, or (url, headers) tuples, keyed by (url, frozenset of header
+        items); or a dict mapping arbitrary keys to urls or (url, headers) tuples. Identical requests are performed
+        once
+    :param follow_redirects: bool, whether to follow redirects, False by default
+    :param max_in_flight: int, global cap on concurrently running requests
+    :param max_per_host: int, cap on concurrently running requests to a single host
+    :param verbose: int, PyCurl verbosity, see get()
+    :return: Dict[Hashable, MultiResult], results keyed by request, failures are reported in MultiResult.error
+    """
+    return _multi_perform(requests, False, follow_redirects, max_in_flight, max_per_host, verbose)
+
+
+def multi_head(requests: Union[Iterable[Union[str, Tuple[str, dict]]], Dict[Hashable, Union[str, Tuple[str, dict]]]],
+               follow_redirects: bool = False, max_in_flight: int = 100, max_per_host: int = 6,
+               verbose: int = 0) -> Dict[Hashable, MultiResult]:
+    """
+    Performs many http HEAD requests concurrently using pycurl.CurlMulti, see multi_get()
+
+    :return: Dict[Hashable, MultiResult], results keyed by request, MultiResult.headers is a dict as in head()
+    """
+    return _multi_perform(requests, True, follow_redirects, max_in_flight, max_per_host, verbose)
+
+
+class AsyncTransport:
+    """
+    Non-blocking GET/HEAD transport for asyncio. Transfers run on a pycurl.CurlMulti driven by libcurl's socket and
+    timer callbacks, which are registered as readers/writers and timers of the running event loop, so no thread is
+    blocked while waiting for the network. Cancelling an awaiting task removes its transfer from the multi handle.
+    Identical requests in flight are performed once, see AsyncSingleFlight.
+
+    A transport is bound to the event loop it was created in. Requests delayed by the scheduler sleep without
+    blocking the loop
+    """
+    def __init__(self, pool: Optional[CurlPool] = DEFAULT_POOL, max_per_host: int = 6,
+                 scheduler: Optional[HostScheduler] = None, retry: Optional[RetryPolicy] = None):
+        """
+        :param pool: Optional[CurlPool], pool the easy handles are taken from, None for one-off handles
+        :param max_per_host: int, cap on concurrently open connections to a single host
+        :param scheduler: Optional[HostScheduler], per-host rate limiter, default scheduler if not provided
+        :param retry: Optional[RetryPolicy], retries of transient failures, default policy if not provided
+        """
+        self.pool: Optional[CurlPool] = pool
+        self.scheduler: Optional[HostScheduler] = scheduler if scheduler is not None else _default_scheduler
+        self.retry: Optional[RetryPolicy] = retry if retry is not None else _default_retry
+        self.flights: AsyncSingleFlight = AsyncSingleFlight()
+        self.loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        self._futures: Dict[pycurl.Curl, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._multi: pycurl.CurlMulti = pycurl.CurlMulti()
+        self._multi.setopt(pycurl.M_MAX_HOST_CONNECTIONS, max_per_host)
+        self._multi.setopt(pycurl.M_SOCKETFUNCTION, self._socket_callback)
+        self._multi.setopt(pycurl.M_TIMERFUNCTION, self._timer_callback)
+
+    def _socket_callback(self, what: int, fd: int, multi: pycurl.CurlMulti, socketp: Any) -> None:
+        if what in (pycurl.POLL_IN, pycurl.POLL_INOUT):
+            self.loop.add_reader(fd, self._socket_action, fd, pycurl.CSELECT_IN)
+        else:
+            self.loop.remove_reader(fd)
+        if what in (pycurl.POLL_OUT, pycurl.POLL_INOUT):
+            self.loop.add_writer(fd, self._socket_action, fd, pycurl.CSELECT_OUT)
+        else:
+            self.loop.remove_writer(fd)
+
+    def _timer_callback(self, timeout_ms: int) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if timeout_ms >= 0:
+            self._timer = self.loop.call_later(timeout_ms / 1000, self._socket_action, pycurl.SOCKET_TIMEOUT, 0)
+
+    def _socket_action(self, fd: int, event: int) -> None:
+        while True:
+            ret, _ = self._multi.socket_action(fd, event)
+            if ret != pycurl.E_CALL_MULTI_PERFORM:
+                break
+        while True:
+            num_queued, ok_list, err_list = self._multi.info_read()
+            for c in ok_list:
+                self._done(c, None)
+            for c, errno, errmsg in err_list:
+                self._done(c, pycurl.error(errno, errmsg))
+            if num_queued == 0:
+                break
+
+    def _done(self, c: pycurl.Curl, error: Optional[Exception]) -> None:
+        self._multi.remove_handle(c)
+        future: Optional[asyncio.Future] = self._futures.pop(c, None)
+        if future is not None and not future.done():
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+    async def _perform(self, c: pycurl.Curl) -> None:
+        future: asyncio.Future = self.loop.create_future()
+        self._futures[c] = future
+        self._multi.add_handle(c)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if self._futures.pop(c, None) is not None:
+                self._multi.remove_handle(c)
+            raise
+
+    async def _schedule(self, url: Union[str, PID]) -> str:
+        """
+        Awaitable _schedule()
+        """
+        host: str = urlsplit(str(url)).hostname or ""
+        if self.scheduler is not None:
+            deadline: Optional[Deadline] = current_deadline()
+            while True:
+                delay: float = self.scheduler.try_acquire(host)
+                if delay == 0:
+                    break
+                if deadline is not None and delay >= deadline.remaining():
+                    raise deadline.exceeded()
+                await asyncio.sleep(delay)
+        return host
+
+    async def _retrying(self, perform: Callable[[], Awaitable[tuple]]) -> tuple:
+        """
+        Awaitable _retrying() with the transport's retry policy
+        """
+        attempt: int = 0
+        while True:
+            attempt += 1
+            try:
+                result: tuple = await perform()
+                delay: Optional[float] = _backoff(self.retry, attempt, status=result[0])
+            except pycurl.error as error:
+                _check_deadline(error)
+                delay = _backoff(self.retry, attempt, curl_errno=error.args[0])
+                if delay is None:
+                    raise
+            if delay is None:
+                return result
+            await asyncio.sleep(delay)
+
+    async def get(self, url: Union[str, PID], headers: dict = None, follow_redirects: bool = False,
+                  verbose: int = 0, ssl_validation: bool = True, cache: Optional[HTTPCache] = None,
+                  compressed: bool = True) -> Tuple[str, str, str]:
+        """
+        Awaitable counterpart of get()
+        """
+        if headers is None:
+            headers = {}
+        if cache is None:
+            cache = _default_cache
+        cache_entry, request_headers = _cache_lookup(cache, url, headers)
+        if request_headers is None:
+            return cache_entry.effective_url, cache_entry.body, cache_entry.headers
+
+        async def perform() -> Tuple[str, str, str]:
+            response_code, effective_url, response_body, response_headers = await self._retrying(
+                lambda: self._perform_get(url, request_headers, follow_redirects, verbose, ssl_validation, compressed))
+            return _get_response(url, headers, cache, cache_entry, response_code, effective_url, response_body,
+                                 response_headers)
+
+        return await self.flights.do(
+            _flight_key("GET", url, request_headers, follow_redirects, ssl_validation, compressed), perform)
+
+    async def _perform_get(self, url: Union[str, PID], headers: dict, follow_redirects: bool, verbose: int,
+                           ssl_validation: bool, compressed: bool) -> Tuple[int, str, BytesIO, BytesIO]:
+        """
+        Awaitable _perform_get()
+        """
+        host: str = await self._schedule(url)
+        response_code: int = 0
+        c: pycurl.Curl = _acquire(self.pool)
+        try:
+            response_body, response_headers = _setopt_get(c, url, headers, follow_redirects, verbose,
+                                                          ssl_validation, compressed)
+            await self._perform(c)
+
+            response_code = c.getinfo(c.RESPONSE_CODE)
+            effective_url: str = c.getinfo(c.EFFECTIVE_URL)
+            _record_transfer(c, response_body.getbuffer().nbytes)
+        finally:
+            _release(self.pool, c)
+            _unschedule(self.scheduler, host, response_code,
+                        parse_response_headers(response_headers.getvalue().decode("iso-8859-1"))
+                        if response_code in (429, 503) else None)
+        return response_code, effective_url, response_body, response_headers
+
+    async def resolve(self, url: Union[str, PID], headers: dict = None, verbose: int = 0,
+                      cache: Optional[ResolutionCache] = None) -> str:
+        """
+        Awaitable counterpart of resolve()
+        """
+        if headers is None:
+            headers = {}
+        if cache is None:
+            cache = _default_resolution_cache
+        if cache is not None:
+            effective_url: Optional[str] = cache.get(str(url), headers)
+            if effective_url is not None:
+                return effective_url
+
+        async def perform() -> str:
+            response_code, effective_url = await self._retrying(lambda: self._perform_resolve(url, headers, verbose))
+            if response_code != 200:
+                raise RequestError(f"Response code from {url}: {response_code}", response_code)
+            if cache is not None:
+                cache.set(str(url), headers, effective_url)
+            return effective_url
+
+        return await self.flights.do(_flight_key("RESOLVE", url, headers), perform)
+
+    async def _perform_resolve(self, url: Union[str, PID], headers: dict, verbose: int) -> Tuple[int, str]:
+        """
+        Awaitable _perform_resolve()
+        """
+        host: str = await self._schedule(url)
+        response_code: int = 0
+        c: pycurl.Curl = _acquire(self.pool)
+        response_headers: BytesIO = BytesIO()
+        try:
+            response_headers = _setopt_resolve(c, url, headers, verbose)
+            try:
+                await self._perform(c)
+                error: Optional[pycurl.error] = None
+            except pycurl.error as perform_error:
+                error = perform_error
+            response_code, effective_url = _resolved(c, error)
+        finally:
+            _release(self.pool, c)
+            _unschedule(self.scheduler, host, response_code, _retry_after_headers(response_code, response_headers))
+        return response_code, effective_url
+
+    async def head(self, url: Union[str, PID], headers: dict = None, follow_redirects: bool = False,
+                   verbose: int = 0) -> Tuple[str, dict]:
+        """
+        Awaitable counterpart of head()
+        """
+        if headers is None:
+            headers = {}
+
+        async def perform() -> Tuple[str, dict]:
+            response_code, effective_url, response_headers = await self._retrying(
+                lambda: self._perform_head(url, headers, follow_redirects, verbose))
+            if response_code != 200:
+                raise RequestError(f"Response code from {url}: {response_code}", response_code)
+            return effective_url, response_headers
+
+        effective_url, response_headers = await self.flights.do(_flight_key("HEAD", url, headers, follow_redirects),
+                                                                perform)
+        return effective_url, dict(response_headers)
+
+    async def _perform_head(self, url: Union[str, PID], headers: dict, follow_redirects: bool,
+                            verbose: int) -> Tuple[int, str, dict]:
+        """
+        Awaitable _perform_head()
+        """
+        host: str = await self._schedule(url)
+        response_code: int = 0
+        c: pycurl.Curl = _acquire(self.pool)
+        try:
+            header_processor: HeaderProcessor = _setopt_head(c, url, headers, follow_redirects, verbose)
+            await self._perform(c)
+
+            response_code = c.getinfo(c.RESPONSE_CODE)
+            effective_url: str = c.getinfo(c.EFFECTIVE_URL)
+        finally:
+            _release(self.pool, c)
+            _unschedule(self.scheduler, host, response_code, header_processor.headers if response_code else None)
+        return response_code, effective_url, header_processor.headers
+
+    def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for c, future in list(self._futures.items()):
+            self._multi.remove_handle(c)
+            future.cancel()
+        self._futures.clear()
+        self._multi.close()
+
 
 class HeaderProcessor:
     def __init__(self):
@@ -0,0 +1,107 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+from typing import Dict, Generator, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Total time budget of a DOG call ran out, phase names the step the time ran out in
+    """
+    def __init__(self, timeout: float, phase: str, phases: Dict[str, float]):
+        """
+        :param timeout: float, total budget in seconds
+        :param phase: str, phase in progress when the budget ran out, e.g. "redirect"
+        :param phases: Dict[str, float], seconds spent in every phase
+        """
+        spent: str = ", ".join(f"{name} {elapsed:.2f} s" for name, elapsed in phases.items())
+        super().__init__(f"Deadline of {timeout:g} s exceeded in phase {phase!r} ({spent})")
+        self.timeout: float = timeout
+        self.phase: str = phase
+        self.phases: Dict[str, float] = phases
+
+
+class Deadline:
+    """
+    Time budget shared by all requests of a single DOG call, with time spent per phase
+    """
+    def __init__(self, timeout: float):
+        """
+        :param timeout: float, total budget in seconds
+        """
+        self.timeout: float = timeout
+        self.expires_at: float = time.monotonic() + timeout
+        self.phase: str = ""
+        self.phases: Dict[str, float] = {}
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def exceeded(self) -> DeadlineExceeded:
+        """
+        :return: DeadlineExceeded, exception describing the phase the budget ran out in
+        """
+        phases: Dict[str, float] = dict(self.phases)
+        return DeadlineExceeded(self.timeout, self.phase or "start", phases)
+
+    def check(self) -> None:
+        """
+        Raise DeadlineExceeded if the budget ran out
+        """
+        if self.expired():
+            raise self.exceeded()
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("doglib_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """
+    :return: Optional[Deadline], deadline of the call in progress in the current thread or asyncio task
+    """
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline(timeout: Optional[float]) -> Generator[Optional[Deadline], None, None]:
+    """
+    Bound total time of all requests made in the block, requests get the remaining time as their curl timeout and
+    fail with DeadlineExceeded once it is spent. Nested deadlines never extend an outer one
+
+    :param timeout: Optional[float], budget in seconds, None keeps the current deadline (if any)
+    :return: Optional[Deadline], deadline in effect within the block
+    """
+    outer: Optional[Deadline] = _current_deadline.get()
+    if timeout is None or (outer is not None and outer.remaining() <= timeout):
+        yield outer
+        return
+    token = _current_deadline.set(Deadline(timeout))
+    try:
+        yield _current_deadline.get()
+    finally:
+        _current_deadline.reset(token)
+
+
+@contextmanager
+def phase(name: str) -> Generator[None, None, None]:
+    """
+    Account time spent in the block to the named phase of the current deadline, raises DeadlineExceeded on entry if
+    the budget is already spent. No-op without deadline
+    """
+    current: Optional[Deadline] = _current_deadline.get()
+    if current is None:
+        yield
+        return
+    previous_phase: str = current.phase
+    current.phase = name
+    current.check()
+    started_at: float = time.monotonic()
+    try:
+        yield
+    finally:
+        current.phases[name] = current.phases.get(name, 0.0) + time.monotonic() - started_at
+        if not current.expired():
+            current.phase = previous_phase
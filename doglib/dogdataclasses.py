@@ -49,3 +49,16 @@ class IdentifyResult(dict):
     description: Union[str, List[str]]
     title: str
     reverse_pid: str
+
+
+@dataclass
+class BatchStats:
+    """
+    Statistics of a single DOG.fetch_many/identify_many/sniff_many batch
+    """
+    submitted: int = 0
+    unique: int = 0
+    duplicates: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
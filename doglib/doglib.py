@@ -1,21 +1,41 @@
+from collections import deque, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
 import csv
 import json
 import logging
+from contextlib import contextmanager
+import copy
 import os
+import pycurl
 import re
-from typing import List, Union, Optional
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Generator, Hashable, Iterable, List, Sequence, Tuple, TYPE_CHECKING, Union, Optional
 
 from . import curl
-from .dtr import expand_datatype, DataTypeNotFoundException
-from .pid import pid_factory, PID, PID_TYPE_KEYS
-from .repos import FetchResult, HTMLParser, JSONParser, Parser, SignpostParser, XMLParser
-from .repos import RegRepo, warn_europeana
+from .conflicts import ConflictCache
+from .deadline import deadline, DeadlineExceeded, phase
+from .dogdataclasses import BatchStats, ReferencedResource
+from .pid import canonical_key, pid_factory, DOI, HDL, PID, PID_TYPE_KEYS, URL
+from .ratelimit import HostLimit, HostScheduler
+from .registry import config_files, conflict_examples, CONFIG_SCHEMA_PATH, RegistryDiff, RegistrySnapshot, REPO_CONFIG_DIR
+from .repos import FetchResult
+from .repos import RegRepo, RequestPlan, warn_europeana
+from .repoindex import RepoIndex
+from .resilience import BreakerRegistry, BreakerState, CircuitBreaker, OPEN
+from .resolver import get_default_resolver, PIDResolver
+from .signposting import SignpostingCache
+from .singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from .parsers import Parser
 
 
-REPO_CONFIG_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static/repo_configs")
 SCHEMA_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static/schemas")
 STATIC_TEST_FILES_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static/testing")
 
+logger: logging.Logger = logging.getLogger(__name__)
+
 class NoSignpostException(Exception):
     pass
 
@@ -36,9 +56,189 @@ def _dataclass_to_dict(obj: object) -> dict:
 
 
 class DOG:
-    def __init__(self, secrets: Optional[dict] = None):
+    def __init__(self, secrets: Optional[dict] = None, signposting_state: Optional[dict] = None,
+                 signposting_ttl: float = 24 * 60 * 60, breakers: Optional[BreakerRegistry] = None,
+                 conflict_state: Optional[dict] = None, conflict_ttl: float = 7 * 24 * 60 * 60,
+                 registry: Optional[Union[str, os.PathLike, RegistrySnapshot]] = None,
+                 config_dir: str = REPO_CONFIG_DIR, watch_interval: Optional[float] = None):
+        """
+        :param secrets: Optional[dict], explicit secrets overwriting environment variables, e.g. EUROPEANA_WSKEY
+        :param signposting_state: Optional[dict], learned signposting support from DOG.export_signposting_state()
+        :param signposting_ttl: float, seconds after which learned signposting support is probed again
+        :param breakers: Optional[BreakerRegistry], circuit breakers of repositories, e.g. shared between DOG
+            instances, new BreakerRegistry() if not provided
+        :param conflict_state: Optional[dict], resolved identifier conflicts from DOG.export_conflict_state()
+        :param conflict_ttl: float, seconds after which a resolved identifier conflict is probed again
+        :param registry: Optional[Union[str, os.PathLike, RegistrySnapshot]], compiled registry snapshot to load
+            registered repositories from instead of their configs, a path is opened with RegistrySnapshot.open(), so
+            the snapshot is (re)built there if missing or stale
+        :param config_dir: str, directory with repository configs, see reload()
+        :param watch_interval: Optional[float], if provided config_dir is polled for changed configs every
+            watch_interval seconds, see watch()
+        """
         self.secrets: dict = self._load_secrets(secrets)
-        self.reg_repos: List[RegRepo] = self.load_repos()
+        self.conflicts: ConflictCache = ConflictCache(ttl=conflict_ttl, state=conflict_state)
+        self.config_dir: str = config_dir
+        if registry is None:
+            self._registry: RegistrySnapshot = RegistrySnapshot.build(config_dir, schema_path=None)
+        elif isinstance(registry, RegistrySnapshot):
+            self._registry = registry
+        else:
+            self._registry = RegistrySnapshot.open(registry, config_dir=config_dir)
+        self.seed_conflicts(self._registry.conflict_seeds)
+        self._reload_lock: threading.Lock = threading.Lock()
+        self._watcher: Optional[Tuple[threading.Event, threading.Thread]] = None
+        self.signposting: SignpostingCache = SignpostingCache(ttl=signposting_ttl, state=signposting_state)
+        self.breakers: BreakerRegistry = breakers if breakers is not None else BreakerRegistry()
+        # concurrent fetch()/identify() calls of equivalent PIDs share a single run of the pipeline
+        self.flights: SingleFlight = SingleFlight(share=copy.deepcopy)
+        self.configure_rate_limits(curl.get_default_scheduler())
+        if watch_interval is not None:
+            self.watch(watch_interval)
+
+    @property
+    def reg_repos(self) -> Tuple[RegRepo, ...]:
+        """
+        :return: Tuple[RegRepo, ...], registered repositories of the current registry, immutable: the registry is
+            replaced as a whole, by reload() or by assigning reg_repos, so its RepoIndex is never stale
+        """
+        return self._registry.reg_repos
+
+    @reg_repos.setter
+    def reg_repos(self, reg_repos: Sequence[RegRepo]) -> None:
+        repo_index: RepoIndex = RepoIndex(reg_repos)
+        self._registry = RegistrySnapshot("", repo_index.reg_repos, repo_index, [])
+
+    def reload(self, schema_path: Optional[str] = CONFIG_SCHEMA_PATH) -> RegistryDiff:
+        """
+        Reload repository configs of config_dir changed since they were loaded, see RegistrySnapshot.update(). The
+        new registry is swapped in at once: calls in flight keep the repositories they sniffed, later calls see the
+        new ones. Seeded identifier conflicts are derived from the new configs, resolutions learned by probing are
+        kept. Rate limits of hosts of changed and removed repositories are reset to the scheduler default before
+        the limits of the new configs are applied
+
+        :param schema_path: Optional[str], JSON schema changed configs are validated against, no validation if None
+        :return: RegistryDiff, ids of repositories added, changed and removed, raises RegistryError and keeps the
+            current registry if a changed config does not load or validate
+        """
+        with self._reload_lock:
+            previous: RegistrySnapshot = self._registry
+            registry, diff = previous.update(self.config_dir, schema_path)
+            if registry is previous:
+                return diff
+            self._registry = registry
+            if diff:
+                self.conflicts.replace_seeds(registry.conflict_seeds)
+                scheduler: Optional[HostScheduler] = curl.get_default_scheduler()
+                if scheduler is not None:
+                    stale_ids: set = set(diff.changed) | set(diff.removed)
+                    for reg_repo in previous.reg_repos:
+                        if reg_repo.id in stale_ids and reg_repo.rate_limit and reg_repo.get_hostname():
+                            scheduler.clear_limit(reg_repo.get_hostname())
+                self.configure_rate_limits(scheduler)
+                logger.info(f"Reloaded repository configs, added: {diff.added}, changed: {diff.changed}, "
+                            f"removed: {diff.removed}")
+        return diff
+
+    def watch(self, interval: float = 5.0) -> None:
+        """
+        Poll config_dir in a daemon thread every interval seconds and reload() changed configs, a config failing to
+        load is logged and retried on the next poll. Polling stats config files only, files are read if their size
+        or modification time changed. Replaces a running watch, stop it with unwatch()
+
+        :param interval: float, seconds between polls
+        """
+        self.unwatch()
+        stop: threading.Event = threading.Event()
+        thread: threading.Thread = threading.Thread(target=self._watch, args=(interval, stop), daemon=True,
+                                                    name="doglib-config-watch")
+        self._watcher = (stop, thread)
+        thread.start()
+
+    def unwatch(self) -> None:
+        """
+        Stop polling config_dir started by watch(), waits for a reload in progress
+        """
+        watcher: Optional[Tuple[threading.Event, threading.Thread]] = self._watcher
+        self._watcher = None
+        if watcher is not None:
+            watcher[0].set()
+            watcher[1].join()
+
+    def _watch(self, interval: float, stop: threading.Event) -> None:
+        while not stop.wait(interval):
+            try:
+                self.reload()
+            except Exception as error:
+                logger.warning(f"Reloading repository configs of {self.config_dir} failed: {error}")
+
+    def configure_rate_limits(self, scheduler: Optional[HostScheduler]) -> None:
+        """
+        Apply "rate_limit" of repository configs to the scheduler, hosts of other repositories keep the scheduler's
+        default_limit. Called on init with curl's default scheduler, call again after curl.set_default_scheduler()
+
+        :param scheduler: Optional[HostScheduler], scheduler to configure, nothing happens if None
+        """
+        if scheduler is None:
+            return
+        for reg_repo in self.reg_repos:
+            if reg_repo.rate_limit and reg_repo.get_hostname():
+                scheduler.set_limit(reg_repo.get_hostname(), HostLimit(**reg_repo.rate_limit))
+
+    @contextmanager
+    def _circuit(self, matching_repo: RegRepo) -> Generator[None, None, None]:
+        """
+        Guard requests to the repository by its circuit breaker: raises curl.CircuitOpenError without sending any
+        request while the circuit is open. Connection failures, 429 and 5xx responses count as failures, other
+        outcomes (e.g. 404 or unparsable response) show the repository is responsive
+        """
+        breaker: CircuitBreaker = self.breakers.get(matching_repo.id)
+        if not breaker.allow():
+            raise curl.CircuitOpenError(f"Circuit breaker of repository {matching_repo.id} is open")
+        try:
+            yield
+        except (curl.RequestError, pycurl.error) as error:
+            self._record_outcome(breaker, error)
+            raise
+        except DeadlineExceeded:
+            # budget of the call ran out, tells nothing about the repository
+            breaker.release()
+            raise
+        except Exception:
+            breaker.record_success()
+            raise
+        except BaseException:
+            # cancelled or abandoned, outcome unknown
+            breaker.release()
+            raise
+        breaker.record_success()
+
+    @staticmethod
+    def _record_outcome(breaker: CircuitBreaker, error: Optional[Exception]) -> None:
+        """
+        Record outcome of a request allowed by the breaker, see _circuit()
+        """
+        if isinstance(error, pycurl.error) or (isinstance(error, curl.RequestError) and
+                                               (error.status == 429 or error.status >= 500)):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    def get_breaker_states(self) -> Dict[str, BreakerState]:
+        """
+        Report circuit breaker state of every registered repository without sending any request
+
+        :return: Dict[str, BreakerState], breaker snapshots keyed by repository id, state is one of "closed", "open"
+            or "half_open"
+        """
+        return {reg_repo.id: self.breakers.get(reg_repo.id).snapshot() for reg_repo in self.reg_repos}
+
+    def get_degraded_repositories(self) -> List[str]:
+        """
+        :return: List[str], ids of repositories whose circuit breaker is open
+        """
+        return [repo_id for repo_id, breaker_state in self.get_breaker_states().items()
+                if breaker_state.state == OPEN]
 
     def _fetch(self, pid: PID) -> dict:
         """
@@ -58,84 +258,36 @@ class DOG:
         matching_repo: RegRepo = self._sniff(pid)
         if not matching_repo:
             return {}
-        elif matching_repo:
-            request_url: str = matching_repo.get_request_url(pid, self.secrets)
-            try:
-                signpost_url = self._get_signpost_url(request_url)
-                if signpost_url:
-                    print("using signpost")
-                    _request_url = signpost_url
-                    final_url, response, response_headers = curl.get(_request_url, follow_redirects=True)
-                    parser = matching_repo.get_parser("signpost")
-
-                    fetch_result: FetchResult = parser.fetch(response)
-                    fetch_dict = _dataclass_to_dict(fetch_result)
-                    if not fetch_dict:
-                        raise NoSignpostException("No signpost")
+        with self._circuit(matching_repo):
+            with phase("request_url"):
+                request_url: str = matching_repo.get_request_url(pid, self.secrets)
+            with phase("signposting"):
+                response: str = self._get_signposted(matching_repo, request_url)
+            if response:
+                try:
+                    fetch_dict: dict = _dataclass_to_dict(matching_repo.get_parser("signpost").fetch(response))
+                except Exception as error:
+                    logger.warning(f"Signposted response of {request_url} failed to parse: {error!r}")
+                    fetch_dict = {}
+                self._record_signposting(matching_repo, bool(fetch_dict))
+                if fetch_dict:
+                    logger.debug(f"{matching_repo.id}: using signpost")
                     return fetch_dict
-                else:
-                    raise NoSignpostException("No signpost")
-                    # # TODO code repetition, how to handle if/else with nested try/except
-                    # request_headers: dict = matching_repo.get_headers(pid_factory(request_url))
-                    # final_url, response, response_headers = curl.get(request_url, request_headers,
-                    #                                                  follow_redirects=True)
-                    # parser: Parser = matching_repo.get_parser()
-                    # print("Using configuration")
-                    # fetch_result: FetchResult = parser.fetch(response)
-                    # fetch_dict = _dataclass_to_dict(fetch_result)
-                    # return fetch_dict
-
-            except: # TODO investigate possible erroneous scenarios, matched HEAD response <link> does not imply signpost
-                print("using configuration")
-                request_headers: dict = matching_repo.get_headers(pid_factory(request_url))
-                final_url, response, response_headers = curl.get(request_url, request_headers, follow_redirects=True)
 
-                parser: Parser = matching_repo.get_parser()
-                fetch_result: FetchResult = parser.fetch(response)
-                fetch_dict = _dataclass_to_dict(fetch_result)
-                return fetch_dict
-
-
-            # # try signposting
-            # response, response_headers = curl.head(request_url)
-            # # dictable_headers_regex = "[^\r\n](?:\\r\\n)(?P<after>[\s\S]+)"
-            # dictable_headers_regex = "^[^\n]+\n(?P<headers>[\\s\\S]+)$"
-            # print("RESPONSE HEADERS")
-            # print(response_headers)
-            #
-            # dictable_response_match = re.match(dictable_headers_regex, response_headers)
-            # print("MATCH")
-            # print(dictable_response_match)
-            # print("GROUPS")
-            # print(dictable_response_match.groups())
-            #
-            #
-            # # CHECK IF FAIR SIGNPOSTING AVAILABLE
-            # headers_dict: dict = {}
-            # if dictable_response_match is not None:
-            #
-            #     headers_string = dictable_response_match.group("headers")
-            #     if "\r\n" in headers_string:
-            #         headers_strings = headers_string.split("\r\n")
-            #         print("BEFORE SPLIT")
-            #         print(headers_strings)
-            #         for header_string in headers_strings:
-            #             if header_string:
-            #                 header_split = header_string.split(': ')
-            #                 headers_dict[header_split[0]] = header_split[1]
-            # else:
-            #     headers_dict = {}
-            #
-            # # get parser instance, if FAIR signpost available default to SignpostParser
-            # if headers_dict:
-            #     signpost_url = self._get_signpost_url(headers_dict)
-            #     if signpost_url:
-            #         request_url = signpost_url
-            #         parser = matching_repo.get_parser("signpost")
-            #     else:
+            logger.debug(f"{matching_repo.id}: using configuration")
+            request_headers: dict = matching_repo.get_headers(pid_factory(request_url))
+            with phase("fetch"):
+                final_url, response, response_headers = curl.get(request_url, request_headers,
+                                                                 follow_redirects=True,
+                                                                 compressed=matching_repo.compression)
+
+            parser: Parser = matching_repo.get_parser()
+            fetch_result: FetchResult = parser.fetch(response)
+            fetch_dict = _dataclass_to_dict(fetch_result)
+            return fetch_dict
 
     def fetch(self, pid_string: Union[str, PID], format: str = 'dict',
-              dtr: bool = False) -> Union[dict, str]:
+              dtr: bool = False, timeout: Optional[float] = None) -> Union[dict, str]:
         """
         Method for fetch call, tries to match pid with registered repositories and returns dict with collection's
             license and description, and links to referenced resources within the collection, if pid does not match
@@ -146,6 +298,8 @@ class DOG:
         :param format: str={'dict', 'jsons'}, format of output, 'dict' by default
         :param dtr: bool, whether to expand MIME types in fetch response by their Data Type Registry
         taxonomy
+        :param timeout: Optional[float], total time budget in seconds shared by all requests of the call, raises
+            DeadlineExceeded naming the phase ("sniff", "request_url", "signposting", "fetch") the time ran out in
         :return: dict, return fetch result in a format:
                 {
                     "ref_files": [{"filename": str, "pid": str}],
@@ -166,17 +320,56 @@ class DOG:
                 return {}
             elif format == 'jsons' or format == 'str':
                 return ""
-        fetch_result: dict = self._fetch(pid)
+        with deadline(timeout):
+            fetch_result: dict = self.flights.do(("fetch",) + self._batch_key(pid), lambda: self._fetch(pid))
         if format == 'dict':
             return fetch_result
         elif format == 'jsons' or format == 'str':
             return json.dumps(fetch_result)
 
-    def identify(self, pid_string: Union[str, PID]) -> dict:
+    def iter_resources(self, pid_string: Union[str, PID]) -> Generator[Tuple[str, ReferencedResource], None, None]:
+        """
+        Streaming variant of fetch() for collections with very many referenced resources. For repositories serving
+        CMDI the response is parsed incrementally while it downloads and resources are yielded as they are parsed,
+        with memory use independent of collection size. Other repositories are fetched and parsed as a whole
+
+        :param pid_string: str, persistent identifier of collection, may be in a format of URL, DOI or HDL
+        :return: Generator yielding (resource_type, ReferencedResource) pairs, nothing if PID is not matched
+        """
+        pid: PID = pid_factory(pid_string)
+        if not pid:
+            return
+        matching_repo: RegRepo = self._sniff(pid)
+        if not matching_repo:
+            return
+        parser: Parser = matching_repo.get_parser()
+        # get_parser() imported parsers already
+        from .parsers import CMDIParser
+        with self._circuit(matching_repo):
+            request_url: str = matching_repo.get_request_url(pid, self.secrets)
+            request_headers: dict = matching_repo.get_headers(pid_factory(request_url))
+            if isinstance(parser, CMDIParser):
+                yield from parser.iter_resources(curl.iter_get(request_url, request_headers, follow_redirects=True,
+                                                               compressed=matching_repo.compression))
+                return
+
+            final_url, response, response_headers = curl.get(request_url, request_headers, follow_redirects=True,
+                                                             compressed=matching_repo.compression)
+        for referenced_resources in parser.fetch(response).ref_files:
+            # XMLParser reports resources as dicts {"resource_type": str, "pid": [str]}
+            if isinstance(referenced_resources, dict):
+                for resource_pid in referenced_resources["pid"]:
+                    yield referenced_resources["resource_type"], ReferencedResource(pid=resource_pid, data_type="")
+            else:
+                for referenced_resource in referenced_resources.ref_resources:
+                    yield referenced_resources.resource_type, referenced_resource
+
+    def identify(self, pid_string: Union[str, PID], timeout: Optional[float] = None) -> dict:
         """
         Identifies collection with its title and description, functionality requested for Virtual Content Registry
 
         :param pid_string: str, persistent identifier of collection, may be in a format of URL, DOI or HDL
+        :param timeout: Optional[float], total time budget in seconds, see fetch()
         :return: dict, return identification result in a format:
                 {
                     "item_title": str,
@@ -187,47 +380,58 @@ class DOG:
         pid: PID = pid_factory(pid_string)
         if not pid:
             return {}
-        else:
-            matching_repo: RegRepo = self._sniff(pid)
-            if not matching_repo:
-                return {}
-            elif matching_repo is not None:
+        with deadline(timeout):
+            return self.flights.do(("identify",) + self._batch_key(pid), lambda: self._identify(pid))
+
+    def _identify(self, pid: PID) -> dict:
+        """
+        Method that takes care of parser construction and identify call
+        """
+        matching_repo: RegRepo = self._sniff(pid)
+        if not matching_repo:
+            return {}
+        with self._circuit(matching_repo):
+            with phase("request_url"):
                 request_url: str = matching_repo.get_request_url(pid, self.secrets)
+            with phase("signposting"):
+                response: str = self._get_signposted(matching_repo, request_url)
+            if response:
                 try:
-                    signpost_url = self._get_signpost_url(request_url)
-                    if signpost_url:
-                        request_url = signpost_url
-                        final_url, response, response_headers = curl.get(request_url, follow_redirects=True)
-                        parser = matching_repo.get_parser("signpost")
-                        identify_response = parser.identify(response)
-                        if not identify_response:
-                            raise NoSignpostException("No signpost")
-                        return identify_response
-                    else:
-                        raise NoSignpostException("No signpost")
-                except:
-                    request_headers: dict = matching_repo.get_headers(pid_factory(request_url))
-                    final_url, response, response_headers = curl.get(request_url, request_headers,
-                                                                     follow_redirects=True)
-                    parser: Parser = matching_repo.get_parser()
-                    return parser.identify(response)
+                    identify_response = matching_repo.get_parser("signpost").identify(response)
+                except Exception as error:
+                    logger.warning(f"Signposted response of {request_url} failed to parse: {error!r}")
+                    identify_response = None
+                self._record_signposting(matching_repo, bool(identify_response))
+                if identify_response:
+                    return identify_response
 
-    def is_collection(self, pid_string: Union[str, PID]) -> bool:
+            request_headers: dict = matching_repo.get_headers(pid_factory(request_url))
+            with phase("identify"):
+                final_url, response, response_headers = curl.get(request_url, request_headers,
+                                                                 follow_redirects=True,
+                                                                 compressed=matching_repo.compression)
+                parser: Parser = matching_repo.get_parser()
+                return parser.identify(response)
+
+    def is_collection(self, pid_string: Union[str, PID], timeout: Optional[float] = None) -> bool:
         """
         Method wrap over _sniff() for recognition whether provided PID is a collection hosted by registered repository
         :param pid_string: str, persistent identifier in a format of URL, DOI or HDL
+        :param timeout: Optional[float], total time budget in seconds, see fetch(), with additional phase
+            "is_downloadable"
         :return: bool, True if PID belongs to registered repository, False otherwise
         """
         ret: bool
         pid: PID = pid_factory(pid_string)
-        matching_repo = self._is_host_registered(pid)
-        if matching_repo:
-            if not self.is_downloadable(str(pid)):
-                ret = bool(self._fetch(pid))
+        with deadline(timeout):
+            matching_repo = self._is_host_registered(pid)
+            if matching_repo:
+                if not self.is_downloadable(str(pid)):
+                    ret = bool(self._fetch(pid))
+                else:
+                    ret = False
             else:
                 ret = False
-        else:
-            ret = False
         return ret
 
     def is_downloadable(self, pid_string: Union[str, PID], matching_repo: RegRepo = None) -> bool:
@@ -242,8 +446,16 @@ class DOG:
         if not matching_repo:
             matching_repo = self._sniff(pid)
         request_headers: dict = matching_repo.get_headers(pid)
-        _, response_headers = curl.head(pid_string, headers=request_headers, follow_redirects=True)
-        return "Content-Disposition: attachment" in response_headers
+        with self._circuit(matching_repo), phase("is_downloadable"):
+            _, response_headers = curl.head(pid_string, headers=request_headers, follow_redirects=True)
+        return self._is_attachment(response_headers)
+
+    @staticmethod
+    def _is_attachment(response_headers: dict) -> bool:
+        """
+        Check whether Content-Disposition of response headers, as returned by curl.head(), marks an attachment
+        """
+        return response_headers.get("content-disposition", "").lower().startswith("attachment")
 
     def _is_host_registered(self, pid: PID) -> Union[RegRepo, None]:
         """
@@ -255,14 +467,18 @@ class DOG:
         matching_repo = self._sniff(pid)
         return matching_repo
 
-    def is_host_registered(self, pid_string: Union[str, PID]) -> bool:
+    def is_host_registered(self, pid_string: Union[str, PID], offline: bool = False) -> bool:
         """
         Method for recognition whether provided PID reference is hosted by registered repository
 
         :param pid_string: str, persistent identifier in a format of URL, DOI or HDL
+        :param offline: bool, if True never send any request, PIDs matching several repositories count as registered
+            without resolving the identifier conflict, see sniff()
         :return: bool, True if PID belongs to registered repository, False otherwise
         """
         pid: PID = pid_factory(pid_string)
+        if offline:
+            return bool(pid) and bool(self.get_repo_index().match(pid))
         return bool(self._is_host_registered(pid))
 
     @classmethod
@@ -274,7 +490,7 @@ class DOG:
         config_path = f"{config_dir}/{repo_id}"
         if not os.path.exists(config_path):
             raise FileNotFoundError(f"Config file {config_dir} does not exists")
-        with open(f"{REPO_CONFIG_DIR}/{repo_id}") as  cfile:
+        with open(config_path) as  cfile:
             try:
                 repo_config: dict = json.load(cfile)["repository"]
             except json.decoder.JSONDecodeError as error:
@@ -290,16 +506,9 @@ class DOG:
         :param config_dir: path to directory with repository configs, defaults to path './repo_configs' relative
             to doglib.py location
         :type config_dir: str
-        :return: List[RegRepo], list of RegRepo objects
+        :return: List[RegRepo], list of RegRepo objects, sorted by config file name
         """
-        reg_repos: List[RegRepo] = []
-        if not os.path.exists(config_dir):
-            raise FileNotFoundError(f"Config dir {config_dir} does not exist")
-
-        for config_file in os.listdir(config_dir):
-            if config_file.endswith(".json"):
-                reg_repos.append(cls.load_repo(repo_id=config_file, config_dir=config_dir))
-        return reg_repos
+        return [cls.load_repo(repo_id=config_file, config_dir=config_dir) for config_file in config_files(config_dir)]
 
     def _load_secrets(self, secrets: Optional[dict] = None):
         """
@@ -326,24 +535,172 @@ class DOG:
         :param pid: PID, class instance of PID protocol
         :return: Optional[RegRepo, None], returns matching RegRepo if found, None otherwise
         """
+        if len(sniffed_repos) <= 1:
+            return sniffed_repos[0] if sniffed_repos else None
+        cached_repo: Optional[RegRepo] = self._match_cached(sniffed_repos, pid)
+        if cached_repo is not None:
+            return cached_repo
+        resolved_repo: Optional[RegRepo] = self._match_resolved(sniffed_repos, pid)
+        if resolved_repo is None:
+            resolved_repo = self._match_probed(sniffed_repos, pid)
+        if resolved_repo is not None:
+            self.conflicts.set(pid, resolved_repo.id)
+        return resolved_repo
+
+    def _match_cached(self, sniffed_repos: list, pid: PID) -> Optional[RegRepo]:
+        """
+        Candidate the identifier conflict of the PID was resolved to before, None if not cached or no longer a
+        candidate
+        """
+        repo_id: Optional[str] = self.conflicts.get(pid)
         for matching_repo in sniffed_repos:
-            if len(sniffed_repos) > 1:
-                try:
-                    candidate = curl.get(matching_repo.get_request_url(pid, self.secrets), matching_repo.get_headers(pid), True)[0]
-                    url: PID = pid_factory(candidate)
-                    if url:
-                        if matching_repo.match_pid(url):
-                            return matching_repo
-                except curl.RequestError:
-                    continue
-            else:
+            if matching_repo.id == repo_id:
                 return matching_repo
         return None
 
+    def _match_probed(self, sniffed_repos: list, pid: PID) -> Optional[RegRepo]:
+        """
+        Probe all candidates concurrently with header-only requests following redirects of their request URLs, the
+        first candidate whose target matches the repository wins and the probes still in flight are cancelled.
+        Candidates with open circuit breaker are not probed
+
+        :param sniffed_repos: list, registered repositories possibly hosting referenced PID metadata
+        :param pid: PID, class instance of PID protocol
+        :return: Optional[RegRepo], matching candidate
+        """
+        transport: curl.MultiTransport = curl.MultiTransport()
+        probed: Dict[int, Tuple[RegRepo, CircuitBreaker]] = {}
+        try:
+            for position, matching_repo in enumerate(sniffed_repos):
+                breaker: CircuitBreaker = self.breakers.get(matching_repo.id)
+                if not breaker.allow():
+                    continue
+                try:
+                    request_url: str = matching_repo.get_request_url(pid, self.secrets)
+                except BaseException as error:
+                    if isinstance(error, (curl.RequestError, pycurl.error)):
+                        self._record_outcome(breaker, error)
+                        continue
+                    breaker.release()
+                    raise
+                probed[position] = (matching_repo, breaker)
+                transport.submit(position, request_url, matching_repo.get_headers(pid), header_only=True)
+            for position, result in transport.perform():
+                matching_repo, breaker = probed.pop(position)
+                self._record_outcome(breaker, result.error)
+                if result.ok and self._match_target([matching_repo], result.effective_url):
+                    return matching_repo
+        finally:
+            transport.close()
+            # cancelled probes tell nothing about their repositories
+            for _, breaker in probed.values():
+                breaker.release()
+        return None
+
+    @staticmethod
+    def _match_target(sniffed_repos: list, target_url: str) -> Optional[RegRepo]:
+        target: PID = pid_factory(target_url)
+        if target:
+            for matching_repo in sniffed_repos:
+                if matching_repo.match_pid(target):
+                    return matching_repo
+        return None
+
+    def _match_resolved(self, sniffed_repos: list, pid: PID) -> Optional[RegRepo]:
+        """
+        Match HDL or DOI with the repository its handle record points to, a single Handle REST API request instead of
+        probing every candidate. None if the PID has no handle record or its target matches no candidate
+
+        :param sniffed_repos: list, registered repositories possibly hosting referenced PID metadata
+        :param pid: PID, class instance of PID protocol
+        :return: Optional[RegRepo], matching candidate
+        """
+        resolver: PIDResolver = get_default_resolver()
+        if resolver.api_url(pid) is None:
+            return None
+        try:
+            return self._match_target(sniffed_repos, resolver.resolve(pid))
+        except (curl.RequestError, pycurl.error):
+            return None
+
+    def seed_conflicts(self, seeds: Optional[List[Tuple[PID, str]]] = None) -> None:
+        """
+        Seed resolved identifier conflicts with test examples of repository configs: every example PID matching
+        several registered repositories resolves to the repository it is an example of
+
+        :param seeds: Optional[List[Tuple[PID, str]]], precomputed examples and repository ids, e.g. of a
+            RegistrySnapshot, registry.conflict_examples() of reg_repos if not provided
+        """
+        if seeds is None:
+            seeds = conflict_examples(self.reg_repos, self.get_repo_index())
+        for pid, repo_id in seeds:
+            self.conflicts.seed(pid, repo_id)
+
+    def export_conflict_state(self) -> dict:
+        """
+        Export identifier conflicts resolved by probing, pass it to DOG(conflict_state=...) of another process
+
+        :return: dict, JSON serialisable state
+        """
+        return self.conflicts.export()
+
     def _get_signpost_url(self, request_url: str) -> str:
         final_url, response_headers = curl.head(request_url)
-        print(type(response_headers))
-        print(response_headers)
+        return self._parse_signpost_link(response_headers)
+
+    def _should_signpost(self, matching_repo: RegRepo) -> bool:
+        """
+        Whether to probe repository for FAIR signposting, explicit "signposting" flag of the repository config takes
+        precedence over learned support, repositories with unknown support are probed
+        """
+        if matching_repo.signposting is not None:
+            return matching_repo.signposting
+        return self.signposting.get(matching_repo.id) is not False
+
+    def _record_signposting(self, matching_repo: RegRepo, supported: bool) -> None:
+        if matching_repo.signposting is None:
+            self.signposting.set(matching_repo.id, supported)
+
+    def _get_signposted(self, matching_repo: RegRepo, request_url: str) -> str:
+        """
+        Retrieve response of the FAIR signposting target of request URL, learns repository's signposting support
+
+        :param matching_repo: RegRepo, repository hosting the PID
+        :param request_url: str, URL resolving the PID
+        :return: str, signposted response, '' if the repository does not signpost or signposting failed
+        """
+        if not self._should_signpost(matching_repo):
+            return ""
+        try:
+            signpost_url: str = self._get_signpost_url(request_url)
+        except (curl.CurlError, pycurl.error) as error:
+            # failed HEAD tells nothing about signposting support, do not record it
+            logger.warning(f"Signposting HEAD request to {request_url} failed: {error!r}")
+            return ""
+        if not signpost_url:
+            self._record_signposting(matching_repo, False)
+            return ""
+        try:
+            _, response, _ = curl.get(signpost_url, follow_redirects=True)
+        except (curl.CurlError, pycurl.error) as error:
+            logger.warning(f"Signposted request to {signpost_url} failed: {error!r}")
+            return ""
+        return response
+
+    def export_signposting_state(self) -> dict:
+        """
+        Export learned signposting support of registered repositories, pass it to DOG(signposting_state=...) of
+        another instance to skip relearning
+
+        :return: dict, JSON serialisable state
+        """
+        return self.signposting.export()
+
+    @staticmethod
+    def _parse_signpost_link(response_headers: dict) -> str:
+        """
+        Retrieve target of the Link header from response headers as returned by curl.head(), '' if not present
+        """
         link = ""
         if "link" in response_headers.keys():
             link_regex = "<(?P<link>[^>]+)>"
@@ -362,17 +719,58 @@ class DOG:
             with matching identifier
         :return: Optional[RegRepo, None], returns matching RegRepo if found, None otherwise
         """
-        sniffed_repos: list = []
-        for reg_repo in self.reg_repos:
-            if reg_repo.match_pid(pid):
-                sniffed_repos.append(reg_repo)
+        sniffed_repos: list = self.get_repo_index().match(pid)
         if resolve_identifier_conflicts:
-            ret = self._match_sniffed(sniffed_repos, pid)
+            with phase("sniff"):
+                ret = self._match_sniffed(sniffed_repos, pid)
         else:
             ret = sniffed_repos
         return ret
 
-    def sniff(self, pid_string: Union[str, PID], format='dict', resolve_identifier_conflicts: bool = True) -> Union[dict, str, List[str]]:
+    def _rank_sniffed(self, sniffed_repos: List[RegRepo], pid: PID) -> List[RegRepo]:
+        """
+        Order candidate repositories by match specificity without sending any request: repository the identifier
+        conflict was resolved to before (see ConflictCache), exact HDL/DOI prefix before DOI prefix contained in the
+        configured id, URL matching the "regex" path pattern of the repository, longest matching host. Ties keep
+        registry order
+
+        :param sniffed_repos: List[RegRepo], registered repositories matching the PID
+        :param pid: PID, class instance of PID protocol
+        :return: List[RegRepo], candidates, most specific first
+        """
+        if len(sniffed_repos) <= 1:
+            return sniffed_repos
+        resolved_id: Optional[str] = self.conflicts.get(pid)
+        return sorted(sniffed_repos, key=lambda reg_repo: self._specificity(reg_repo, pid, resolved_id),
+                      reverse=True)
+
+    @staticmethod
+    def _specificity(reg_repo: RegRepo, pid: PID, resolved_id: Optional[str]) -> Tuple[bool, bool, bool, int]:
+        """
+        Sort key of _rank_sniffed(), the greater the more specific
+        """
+        exact_prefix: bool = False
+        path_match: bool = False
+        host_length: int = 0
+        if type(pid) == HDL:
+            exact_prefix = True
+        elif type(pid) == DOI:
+            doi_id = reg_repo.doi.get("id")
+            exact_prefix = pid.get_repo_id() == doi_id or (type(doi_id) != str and pid.get_repo_id() in doi_id)
+        elif type(pid) == URL:
+            plan: Optional[RequestPlan] = reg_repo.get_request_plan(pid)
+            path_match = plan is not None and plan.regex is not None and bool(plan.regex.match(pid.get_resolvable()))
+            host_length = len(reg_repo.host_netloc.replace('https://', '').replace('http://', ''))
+        return reg_repo.id == resolved_id, exact_prefix, path_match, host_length
+
+    def get_repo_index(self) -> RepoIndex:
+        """
+        :return: RepoIndex, index of registered repositories of the current registry
+        """
+        return self._registry.repo_index
+
+    def sniff(self, pid_string: Union[str, PID], format='dict', resolve_identifier_conflicts: bool = True,
+              timeout: Optional[float] = None, offline: bool = False) -> Union[dict, str, List[str]]:
         """
         Method for sniff call, tries to match pid with registered repositories and returns dict with information
         about repository, if pid is not matched returns empty dict. If there are multiple repositories using the same
@@ -383,6 +781,10 @@ class DOG:
         :param resolve_identifier_conflicts: bool, in case of repository identifier clash (e.g. German repositories),
             if True resolve headers and return repo matching, otherwise return list of registered repositories
             with matching identifier
+        :param timeout: Optional[float], total time budget in seconds of resolving identifier conflicts, see fetch()
+        :param offline: bool, if True never send any request (e.g. to validate input on every keystroke) and return
+            all matching registered repositories ranked by match specificity, see _rank_sniffed(),
+            resolve_identifier_conflicts and timeout are ignored
         :return: str, repository description of matching registered repository, '' if pid not matched
         """
         accepted_formats: set = {'dict', 'jsons', 'str'}
@@ -395,8 +797,19 @@ class DOG:
                 return {}
             elif format == 'jsons' or format == 'str':
                 return ""
-        sniff_result: Union[RegRepo, List[RegRepo]] = self._sniff(
-            pid, resolve_identifier_conflicts=resolve_identifier_conflicts)
+        if offline:
+            return self._format_sniff_result(self._rank_sniffed(self.get_repo_index().match(pid), pid), format)
+        with deadline(timeout):
+            sniff_result: Union[RegRepo, List[RegRepo]] = self._sniff(
+                pid, resolve_identifier_conflicts=resolve_identifier_conflicts)
+        return self._format_sniff_result(sniff_result, format)
+
+    @staticmethod
+    def _format_sniff_result(sniff_result: Union[Optional[RegRepo], List[RegRepo]],
+                             format: str) -> Union[dict, str, List[str]]:
+        """
+        Serialise result of _sniff() into output format of sniff()
+        """
         if not sniff_result:
             if format == 'dict':
                 return {}
@@ -411,6 +824,142 @@ class DOG:
                 return [json.dumps(sniff_r.__dict__()) for sniff_r in sniff_result]
             return json.dumps(sniff_result.__dict__())
 
+    @staticmethod
+    def _batch_key(pid_string: Union[str, PID]) -> Hashable:
+        """
+        Key under which equivalent PIDs are deduplicated within a batch
+        """
+        pid: PID = pid_factory(pid_string)
+        if pid is None:
+            return None, str(pid_string)
+        return canonical_key(pid)
+
+    def _run_many(self, func: Callable[[Union[str, PID], Optional[float]], Any],
+                  pid_strings: Iterable[Union[str, PID]], ordered: bool, max_workers: int, max_pending: Optional[int],
+                  dedup_cache_size: int, stats: Optional[BatchStats], timeout: Optional[float] = None) \
+            -> Generator[Tuple[Union[str, PID], Any], None, BatchStats]:
+        """
+        Run func over PIDs concurrently in a thread pool. At most max_pending PIDs are pulled from the input
+        iterable ahead of the consumer, so arbitrarily long generators are processed in bounded memory.
+        Equivalent PIDs share a single call: duplicates of PIDs in flight wait for the same future, duplicates of
+        recently completed PIDs are answered from a bounded LRU of results. timeout is handed to func with every
+        submitted PID, so each call has its own budget from the moment a worker runs it, and a slow PID does not
+        eat into the budget of the others
+
+        :return: Generator yielding (pid_string, result_or_exception) pairs, returns BatchStats when exhausted
+        """
+        if stats is None:
+            stats = BatchStats()
+        if max_pending is None:
+            max_pending = 2 * max_workers
+        start: float = time.monotonic()
+
+        pid_iterator = iter(pid_strings)
+        exhausted: bool = False
+        window: Deque[Tuple[Union[str, PID], Hashable, Future]] = deque()
+        in_flight: Dict[Hashable, Future] = {}
+        recent: OrderedDict = OrderedDict()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                while not exhausted and len(window) < max_pending:
+                    try:
+                        pid_string = next(pid_iterator)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    stats.submitted += 1
+                    key: Hashable = self._batch_key(pid_string)
+                    if key in recent:
+                        recent.move_to_end(key)
+                        future: Future = Future()
+                        future.set_result(recent[key])
+                        stats.duplicates += 1
+                    elif key in in_flight:
+                        future = in_flight[key]
+                        stats.duplicates += 1
+                    else:
+                        future = executor.submit(func, pid_string, timeout)
+                        in_flight[key] = future
+                        stats.unique += 1
+                    window.append((pid_string, key, future))
+
+                if not window:
+                    break
+
+                if ordered:
+                    pid_string, key, future = window.popleft()
+                    wait([future])
+                else:
+                    wait([entry[2] for entry in window], return_when=FIRST_COMPLETED)
+                    entry = next(entry for entry in window if entry[2].done())
+                    window.remove(entry)
+                    pid_string, key, future = entry
+
+                error: Optional[BaseException] = future.exception()
+                result = error if error is not None else future.result()
+                if in_flight.get(key) is future:
+                    del in_flight[key]
+                    recent[key] = result
+                    if len(recent) > dedup_cache_size:
+                        recent.popitem(last=False)
+                if error is not None:
+                    stats.failed += 1
+                else:
+                    stats.succeeded += 1
+                stats.elapsed = time.monotonic() - start
+                yield pid_string, result
+        return stats
+
+    def fetch_many(self, pid_strings: Iterable[Union[str, PID]], format: str = 'dict', dtr: bool = False,
+                   ordered: bool = False, max_workers: int = 16, max_pending: Optional[int] = None,
+                   dedup_cache_size: int = 1024, stats: Optional[BatchStats] = None,
+                   timeout: Optional[float] = None) \
+            -> Generator[Tuple[Union[str, PID], Union[dict, str, Exception]], None, BatchStats]:
+        """
+        Bulk fetch(), resolves PIDs concurrently and streams results as they complete
+
+        :param pid_strings: Iterable[Union[str, PID]], PIDs to fetch, may be a generator
+        :param format: str={'dict', 'jsons'}, format of output, see fetch()
+        :param dtr: bool, see fetch()
+        :param ordered: bool, yield results in input order instead of order of completion, False by default
+        :param max_workers: int, number of PIDs processed concurrently
+        :param max_pending: Optional[int], maximum number of PIDs pulled from the input ahead of the consumer,
+            2 * max_workers by default
+        :param dedup_cache_size: int, number of completed results kept for answering duplicate PIDs
+        :param stats: Optional[BatchStats], object to be populated with batch statistics
+        :param timeout: Optional[float], time budget in seconds of every single PID, see fetch(), counted from the
+            start of its own call, PIDs exceeding it yield DeadlineExceeded
+        :return: Generator yielding (pid_string, result) pairs, result is an exception instance if fetch() failed,
+            generator's return value is BatchStats of the batch
+        """
+        return self._run_many(lambda pid_string, timeout: self.fetch(pid_string, format=format, dtr=dtr,
+                                                                     timeout=timeout),
+                              pid_strings, ordered, max_workers, max_pending, dedup_cache_size, stats, timeout)
+
+    def identify_many(self, pid_strings: Iterable[Union[str, PID]], ordered: bool = False, max_workers: int = 16,
+                      max_pending: Optional[int] = None, dedup_cache_size: int = 1024,
+                      stats: Optional[BatchStats] = None, timeout: Optional[float] = None) \
+            -> Generator[Tuple[Union[str, PID], Union[dict, Exception]], None, BatchStats]:
+        """
+        Bulk identify(), see fetch_many() for parameters
+        """
+        return self._run_many(self.identify, pid_strings, ordered, max_workers, max_pending, dedup_cache_size,
+                              stats, timeout)
+
+    def sniff_many(self, pid_strings: Iterable[Union[str, PID]], format: str = 'dict',
+                   resolve_identifier_conflicts: bool = True, ordered: bool = False, max_workers: int = 16,
+                   max_pending: Optional[int] = None, dedup_cache_size: int = 1024,
+                   stats: Optional[BatchStats] = None, timeout: Optional[float] = None) \
+            -> Generator[Tuple[Union[str, PID], Union[dict, str, List[str], Exception]], None, BatchStats]:
+        """
+        Bulk sniff(), see sniff() for format and resolve_identifier_conflicts and fetch_many() for other parameters
+        """
+        return self._run_many(lambda pid_string, timeout: self.sniff(
+                                  pid_string, format=format, resolve_identifier_conflicts=resolve_identifier_conflicts,
+                                  timeout=timeout),
+                              pid_strings, ordered, max_workers, max_pending, dedup_cache_size, stats, timeout)
+
     def is_pid(self, pid_string: Union[str, PID]) -> bool:
         """
         Checks whether provided string is PID acceptable by DOG. For PID instance always returns True.
@@ -461,6 +1010,27 @@ class DOG:
                 csv_writer.writerow([repo_key, repo_status["doi"], repo_status["hdl"],
                 repo_status["url"]])
 
+    def get_transfer_stats(self) -> Dict[str, curl.TransferStats]:
+        """
+        Aggregate curl.get_transfer_stats() per registered repository, requests to hosts other than
+            the repository's host_netloc (e.g. PID resolvers) are omitted
+
+        :return: Dict[str, curl.TransferStats], wire and decoded GET body bytes keyed by repository id
+        """
+        repo_hosts: Dict[str, str] = {}
+        for reg_repo in self.reg_repos:
+            if reg_repo.get_hostname():
+                repo_hosts.setdefault(reg_repo.get_hostname(), reg_repo.id)
+        repo_stats: Dict[str, curl.TransferStats] = {}
+        for host, host_stats in curl.get_transfer_stats().items():
+            if host not in repo_hosts:
+                continue
+            stats: curl.TransferStats = repo_stats.setdefault(repo_hosts[host], curl.TransferStats())
+            stats.requests += host_stats.requests
+            stats.wire_bytes += host_stats.wire_bytes
+            stats.decoded_bytes += host_stats.decoded_bytes
+        return repo_stats
+
     def get_repository_by_name(self, repo_name="") -> Union[RegRepo, None]:
         for reg_repo in self.reg_repos:
             if reg_repo.name == repo_name:
@@ -0,0 +1,292 @@
+from dataclasses import asdict, dataclass
+from email.utils import parsedate_to_datetime
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+# entry files start with their expiration time, e.g. {"expires_at": 1700000000.0, "url": ...
+EXPIRES_AT_PATTERN: re.Pattern = re.compile(rb'\{"expires_at": (-?[0-9.eE+-]+|Infinity)[,}]')
+EXPIRES_AT_PREFIX_SIZE: int = 64
+
+
+def parse_response_headers(raw_headers: str) -> Dict[str, str]:
+    """
+    Parse raw response headers, as returned by curl.get(), into a dict with lowercase keys. If redirects were
+    followed only the headers of the final response are parsed
+
+    :param raw_headers: str, raw response headers
+    :return: Dict[str, str], headers of the last response
+    """
+    blocks: List[str] = [block for block in re.split(r"\r?\n\r?\n", raw_headers) if block.strip()]
+    if not blocks:
+        return {}
+    headers: Dict[str, str] = {}
+    for line in blocks[-1].splitlines()[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+    return headers
+
+
+def _parse_http_date(http_date: str) -> Optional[float]:
+    try:
+        return parsedate_to_datetime(http_date).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+@dataclass
+class CacheStats:
+    """
+    Counters of HTTPCache usage
+    """
+    hits: int = 0
+    misses: int = 0
+    revalidations: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+
+@dataclass
+class CacheEntry:
+    """
+    Cached response with its validators
+    """
+    url: str
+    effective_url: str
+    body: str
+    headers: str
+    stored_at: float
+    expires_at: float
+    etag: str = ""
+    last_modified: str = ""
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (time.time() if now is None else now) < self.expires_at
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """
+        Request headers revalidating this entry
+        """
+        conditional_headers: Dict[str, str] = {}
+        if self.etag:
+            conditional_headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            conditional_headers["If-Modified-Since"] = self.last_modified
+        return conditional_headers
+
+
+class HTTPCache:
+    """
+    On-disk cache of GET responses keyed by request URL and request headers (e.g. Accept: application/x-cmdi+xml).
+    Freshness follows Cache-Control max-age/no-store/no-cache and Expires response headers, stale entries carrying
+    ETag/Last-Modified are revalidated with If-None-Match/If-Modified-Since, so a 304 response is served from the
+    cache. Total size of stored entries is kept under max_size bytes, expired entries are evicted first, then least
+    recently used ones. Size, last use and expiration of every entry are kept in memory, so eviction reads no entry
+    file; the expiration time leads each entry file and the startup scan reads only that prefix
+    """
+    def __init__(self, directory: str, max_size: int = 256 * 1024 * 1024, default_ttl: float = 0):
+        """
+        :param directory: str, cache directory, created if it does not exist
+        :param max_size: int, size budget of the cache in bytes
+        :param default_ttl: float, freshness lifetime in seconds of responses without Cache-Control/Expires
+        """
+        self.directory: str = directory
+        self.max_size: int = max_size
+        self.default_ttl: float = default_ttl
+        self.stats: CacheStats = CacheStats()
+        self._lock: threading.Lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # {key: (size, used_at, expires_at)} of stored entries
+        self._entries: Dict[str, Tuple[int, float, float]] = {}
+        self._size: int = 0
+        for entry_file in os.listdir(directory):
+            if entry_file.endswith(".json"):
+                entry_path: str = os.path.join(directory, entry_file)
+                entry_stat: os.stat_result = os.stat(entry_path)
+                self._entries[entry_file[:-5]] = (entry_stat.st_size, entry_stat.st_mtime,
+                                                  self._read_expires_at(entry_path))
+                self._size += entry_stat.st_size
+
+    @staticmethod
+    def _read_expires_at(entry_path: str) -> float:
+        """
+        Expiration time of the entry file from its leading "expires_at" member, see _write(). Entries without it,
+        e.g. written by an earlier version, count as expired
+        """
+        try:
+            with open(entry_path, "rb") as entry_file:
+                prefix: bytes = entry_file.read(EXPIRES_AT_PREFIX_SIZE)
+        except OSError:
+            return 0.0
+        match: Optional[re.Match] = EXPIRES_AT_PATTERN.match(prefix)
+        return float(match.group(1)) if match else 0.0
+
+    @staticmethod
+    def key(url: str, headers: Optional[dict] = None) -> str:
+        """
+        Cache key of the request
+        """
+        normalised_headers: List[Tuple[str, str]] = sorted((k.lower(), v) for k, v in (headers or {}).items())
+        return hashlib.sha256(json.dumps([str(url), normalised_headers]).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def lookup(self, url: str, headers: Optional[dict] = None) -> Optional[CacheEntry]:
+        """
+        Retrieve cached entry of the request, fresh or stale, None if not cached
+        """
+        key: str = self.key(url, headers)
+        try:
+            with open(self._path(key), "r") as entry_file:
+                entry: CacheEntry = CacheEntry(**json.load(entry_file))
+        except (FileNotFoundError, json.JSONDecodeError, TypeError):
+            return None
+        self._touch(key)
+        return entry
+
+    def _touch(self, key: str) -> None:
+        """
+        Mark entry as used now, in memory and as modification time of its file, which the startup scan reads
+        """
+        now: float = time.time()
+        with self._lock:
+            record: Optional[Tuple[int, float, float]] = self._entries.get(key)
+            if record is None:
+                return
+            self._entries[key] = (record[0], now, record[2])
+        try:
+            os.utime(self._path(key), (now, now))
+        except FileNotFoundError:
+            pass
+
+    def get(self, url: str, headers: Optional[dict] = None) -> Tuple[Optional[CacheEntry], Dict[str, str]]:
+        """
+        Look request up in the cache and count hit/miss
+
+        :return: Tuple[Optional[CacheEntry], Dict[str, str]], fresh or revalidatable entry (None on miss) and
+            conditional request headers, fresh entries come with no conditional headers and need no request
+        """
+        entry: Optional[CacheEntry] = self.lookup(url, headers)
+        if entry is not None and entry.is_fresh():
+            self._count("hits")
+            return entry, {}
+        self._count("misses")
+        if entry is not None and (entry.etag or entry.last_modified):
+            return entry, entry.conditional_headers()
+        return None, {}
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self.stats, counter, getattr(self.stats, counter) + 1)
+
+    def _expires_at(self, response_headers: Dict[str, str], now: float) -> Optional[float]:
+        """
+        Compute expiration time from response headers, None if response must not be stored
+        """
+        cache_control: List[str] = [directive.strip().lower()
+                                    for directive in response_headers.get("cache-control", "").split(',')]
+        if "no-store" in cache_control or "private" in cache_control:
+            return None
+        if "no-cache" in cache_control:
+            return now
+        for directive in cache_control:
+            if directive.startswith("max-age="):
+                try:
+                    return now + int(directive.split('=', 1)[1])
+                except ValueError:
+                    return now
+        if "expires" in response_headers:
+            expires: Optional[float] = _parse_http_date(response_headers["expires"])
+            return expires if expires is not None else now
+        return now + self.default_ttl
+
+    def store(self, url: str, headers: Optional[dict], effective_url: str, body: str, raw_headers: str) -> None:
+        """
+        Store 200 response, responses that are neither fresh nor revalidatable are not stored
+        """
+        now: float = time.time()
+        response_headers: Dict[str, str] = parse_response_headers(raw_headers)
+        expires_at: Optional[float] = self._expires_at(response_headers, now)
+        if expires_at is None:
+            return
+        entry: CacheEntry = CacheEntry(url=str(url), effective_url=effective_url, body=body, headers=raw_headers,
+                                       stored_at=now, expires_at=expires_at,
+                                       etag=response_headers.get("etag", ""),
+                                       last_modified=response_headers.get("last-modified", ""))
+        if not entry.is_fresh(now) and not (entry.etag or entry.last_modified):
+            return
+        self._write(self.key(url, headers), entry)
+        self._count("stores")
+
+    def revalidated(self, url: str, headers: Optional[dict], entry: CacheEntry, raw_headers: str) -> CacheEntry:
+        """
+        Refresh entry after 304 Not Modified response
+        """
+        now: float = time.time()
+        response_headers: Dict[str, str] = parse_response_headers(raw_headers)
+        expires_at: Optional[float] = self._expires_at(response_headers, now)
+        entry.stored_at = now
+        entry.expires_at = expires_at if expires_at is not None else now
+        entry.etag = response_headers.get("etag", entry.etag)
+        entry.last_modified = response_headers.get("last-modified", entry.last_modified)
+        self._write(self.key(url, headers), entry)
+        self._count("revalidations")
+        return entry
+
+    def _write(self, key: str, entry: CacheEntry) -> None:
+        # expires_at leads the file, so the startup scan does not parse bodies, see _read_expires_at()
+        fields: dict = {"expires_at": entry.expires_at}
+        fields.update(asdict(entry))
+        serialised: bytes = json.dumps(fields).encode("utf-8")
+        entry_path: str = self._path(key)
+        tmp_path: str = f"{entry_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as entry_file:
+            entry_file.write(serialised)
+        os.replace(tmp_path, entry_path)
+        with self._lock:
+            previous: Optional[Tuple[int, float, float]] = self._entries.get(key)
+            self._size += len(serialised) - (previous[0] if previous else 0)
+            self._entries[key] = (len(serialised), time.time(), entry.expires_at)
+        self._evict()
+
+    def _evict(self) -> None:
+        """
+        Delete entries until the cache fits into max_size, expired entries first, then least recently used. Decided
+        from the in-memory records alone, no entry file is read
+        """
+        with self._lock:
+            if self._size <= self.max_size:
+                return
+            now: float = time.time()
+            candidates: List[Tuple[bool, float, str]] = sorted(
+                (expires_at > now, used_at, key) for key, (_, used_at, expires_at) in self._entries.items())
+            for _, _, key in candidates:
+                if self._size <= self.max_size:
+                    break
+                self._size -= self._entries.pop(key)[0]
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries.keys()):
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self._size = 0
@@ -1,15 +1,30 @@
 from abc import ABC, abstractmethod
 import json
 from jsonpath_rw import jsonpath, parse
-from lxml.etree import fromstring, tostring, ElementTree
+from lxml.etree import fromstring, tostring, ElementTree, QName, XMLPullParser, XPath
 from lxml.etree import HTMLParser as _HTMLParser
 from re import compile, match, findall, Match, Pattern
-from typing import Any, AnyStr, Generator, List, Type, Union
+import threading
+from typing import Any, AnyStr, Dict, FrozenSet, Generator, Iterable, List, Tuple, Type, Union
 
 from .pid import PID, pid_factory
 from .dogdataclasses import IdentifyResult, FetchResult, ReferencedResource, ReferencedResources
 
 
+# compiled XPath objects kept per parser and thread, the cache is cleared once it grows larger
+MAX_COMPILED_XPATHS: int = 256
+# ref_file.resource_root_path of standard CMDI, the only one CMDIParser.iter_resources() parses incrementally
+CMDI_RESOURCE_ROOT_PATH: str = ".//cmd:ResourceProxy[cmd:ResourceType='$resource_type']"
+
+
+def xpath_variables(path: str) -> str:
+    """
+    :return: str, XPath of the repository config with the quoted '$resource_type' placeholder turned into the XPath
+        variable $resource_type, bound on evaluation instead of substituted into the expression
+    """
+    return path.replace("'$resource_type'", "$resource_type").replace('"$resource_type"', "$resource_type")
+
+
 class Parser(ABC):
     def __init__(self, parser_config: dict):
         pass
@@ -141,6 +156,8 @@ class XMLParser(Parser):
             self.namespaces: dict = parser_config['nsmap']
         else:
             self.namespaces: dict = {}
+        # compiled XPath objects, one cache per thread as evaluation of an XPath object is serialised by lxml
+        self._xpath_local: threading.local = threading.local()
 
         # In case no accepted resource type is provided make sure to not leave the list empty, so the body of main
         # for loop in self._fetch_resources can be executed anyway
@@ -242,9 +259,9 @@ class XMLParser(Parser):
         :return: list, list of dictionaries [{"filename": str, "pid": str}]
         """
         fetched_resources: dict = {}
+        resource_xpath: XPath = self._xpath(self.resource_path, nsmap)
         for resource_type in self.accept_resource_type:
-            fetched_resources[resource_type] = xml_tree.xpath(
-                self.resource_path.replace("$resource_type", resource_type), namespaces=nsmap)
+            fetched_resources[resource_type] = resource_xpath(xml_tree, resource_type=resource_type)
             if self.resource_format:
                 fetched_resources[resource_type] = [self.resource_format.replace('$resource', resource)
                                                     for resource in fetched_resources[resource_type]]
@@ -284,11 +301,30 @@ class XMLParser(Parser):
 
     def _parse_field(self, xml_tree: ElementTree, field_path: str, nsmap: dict, join_by: str = ', ') -> str:
         if field_path != '':
-            found_element_values = xml_tree.xpath(field_path, namespaces=nsmap)
+            found_element_values = self._xpath(field_path, nsmap)(xml_tree)
             return join_by.join([str(found_element_value) if isinstance(found_element_value, str) else
                                  str(found_element_value.text)
                                  for found_element_value in found_element_values if found_element_value is not None])
 
+    def _xpath(self, path: str, nsmap: dict) -> XPath:
+        """
+        Compile XPath of the repository config once per namespace map, responses of a repository declare the same
+        namespaces, see xpath_variables()
+
+        :param path: str, XPath of the repository config
+        :param nsmap: dict, map of namespace tags to namespace URIs bound to the compiled XPath
+        :return: XPath, compiled XPath, evaluate it with resource_type=... if path refers to '$resource_type'
+        """
+        xpaths: Union[Dict[Tuple[str, FrozenSet[Tuple[str, str]]], XPath], None] = getattr(self._xpath_local,
+                                                                                            "xpaths", None)
+        if xpaths is None or len(xpaths) >= MAX_COMPILED_XPATHS:
+            xpaths = self._xpath_local.xpaths = {}
+        key: Tuple[str, FrozenSet[Tuple[str, str]]] = (path, frozenset(nsmap.items()))
+        xpath: Union[XPath, None] = xpaths.get(key)
+        if xpath is None:
+            xpath = xpaths[key] = XPath(xpath_variables(path), namespaces=nsmap)
+        return xpath
+
     def _parse_nested_namespaces(self, response_text: str) -> dict:
         """
         Utility method for finding not-default
@@ -333,7 +369,7 @@ class CMDIParser(XMLParser):
         if 'resource_type' in parser_config.keys():
             self.accept_resource_type: set = parser_config["accept_resource_type"]
 
-        self.resource_root_path: str = ".//cmd:ResourceProxy[cmd:ResourceType='$resource_type']"
+        self.resource_root_path: str = CMDI_RESOURCE_ROOT_PATH
         self.resource_path: str = "./cmd:ResourceRef/text()"
         self.resource_type_path: str = "./cmd:ResourceType/text()"
         self.data_type_path: str = "./cmd:ResourceType/@mimetype"
@@ -357,18 +393,19 @@ class CMDIParser(XMLParser):
         :return: list, list of dictionaries [{"resource_type": str, "ref_resources": [{"pid": str, "data_type": str}]}]
         """
         fetched_resources: dict = {}
+        resource_root_xpath: XPath = self._xpath(self.resource_root_path, nsmap)
+        resource_xpath: XPath = self._xpath(self.resource_path, nsmap)
+        data_type_xpath: XPath = self._xpath(self.data_type_path, nsmap)
 
         for resource_type in self.accept_resource_type:
             fetched_resources[resource_type] = []
             # Standard CMDI
-            resource_nodes = xml_tree.xpath(
-                self.resource_root_path.replace("$resource_type", resource_type),
-                namespaces=nsmap)
+            resource_nodes = resource_root_xpath(xml_tree, resource_type=resource_type)
 
             for resource_node in resource_nodes:
-                resource = resource_node.xpath(self.resource_path, namespaces=nsmap)[0]
+                resource = resource_xpath(resource_node)[0]
 
-                data_type = resource_node.xpath(self.data_type_path, namespaces=nsmap)
+                data_type = data_type_xpath(resource_node)
                 # datatype may be empty, xpath returns a list, get string or cast to empty string
                 if not data_type:
                     data_type = ""
@@ -389,14 +426,100 @@ class CMDIParser(XMLParser):
                 for resource_type, ref_resources in fetched_resources.items()]
 
 
+    def iter_resources(self, chunks: Iterable[bytes]) -> Generator[Tuple[str, ReferencedResource], None, None]:
+        """
+        Streaming counterpart of _parse_resources() for very large collections. Response is consumed incrementally,
+        e.g. straight from curl.iter_get(), and every cmd:ResourceProxy of an accepted resource type is yielded as
+        soon as it is parsed. Processed elements are cleared, so peak memory does not grow with collection size.
+        Configs overriding ref_file.resource_root_path select resources the stream cannot tell apart, their response
+        is parsed as a whole with _parse_resources()
+
+        :param chunks: Iterable[bytes], response body in chunks
+        :return: Generator yielding (resource_type, ReferencedResource) pairs, in document order if streamed, else
+            grouped by resource type
+        """
+        if self.resource_root_path != CMDI_RESOURCE_ROOT_PATH:
+            response: bytes = b"".join(chunks)
+            xml_tree: ElementTree = fromstring(response)
+            nsmap: dict = self._prepare_namespaces(response.decode("utf-8"), xml_tree)
+            for referenced_resources in self._parse_resources(xml_tree, nsmap):
+                for referenced_resource in referenced_resources.ref_resources:
+                    yield referenced_resources.resource_type, referenced_resource
+            return
+        pull_parser: XMLPullParser = XMLPullParser(events=("start", "end", "start-ns"), huge_tree=True)
+        namespaces: dict = dict(self.namespaces)
+        state: dict = {"in_proxy": 0}
+        for chunk in chunks:
+            pull_parser.feed(chunk)
+            yield from self._read_resource_events(pull_parser, namespaces, state)
+        pull_parser.close()
+        yield from self._read_resource_events(pull_parser, namespaces, state)
+
+    def _read_resource_events(self, pull_parser: XMLPullParser, namespaces: dict,
+                              state: dict) -> Generator[Tuple[str, ReferencedResource], None, None]:
+        for event, element in pull_parser.read_events():
+            if event == "start-ns":
+                prefix, uri = element
+                if prefix:
+                    namespaces[prefix] = uri
+                continue
+            is_proxy: bool = QName(element).localname == "ResourceProxy"
+            if event == "start":
+                if is_proxy:
+                    state["in_proxy"] += 1
+                continue
+            if is_proxy:
+                state["in_proxy"] -= 1
+                resource: Union[Tuple[str, ReferencedResource], None] = self._parse_resource_proxy(element,
+                                                                                                    namespaces)
+                if resource is not None:
+                    yield resource
+            elif state["in_proxy"]:
+                # children of cmd:ResourceProxy are needed until the proxy itself is parsed
+                continue
+            element.clear(keep_tail=False)
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+
+    def _parse_resource_proxy(self, resource_node, namespaces: dict) -> Union[Tuple[str, ReferencedResource], None]:
+        nsmap: dict = dict(namespaces)
+        proxy_namespace: str = QName(resource_node).namespace
+        if proxy_namespace:
+            nsmap.setdefault("cmd", proxy_namespace)
+
+        resource_types: list = self._xpath(self.resource_type_path, nsmap)(resource_node)
+        if not resource_types or str(resource_types[0]) not in self.accept_resource_type:
+            return None
+        resources: list = self._xpath(self.resource_path, nsmap)(resource_node)
+        if not resources:
+            return None
+        resource = resources[0]
+        # str() drops lxml smart string reference to the element, so cleared elements can be freed
+        resource: str = str(resource) if isinstance(resource, str) else str(resource.text)
+        if self.resource_format:
+            resource = self.resource_format.replace('$resource', resource)
+        data_type: list = self._xpath(self.data_type_path, nsmap)(resource_node)
+        data_type: str = str(data_type[0]) if data_type else ""
+        return str(resource_types[0]), ReferencedResource(pid=resource, data_type=data_type)
+
+
 class HTMLParser(XMLParser):
     def __init__(self, parser_config: dict):
         """
         Experimental HTML parser for Archeology Data Service
         """
         super().__init__(parser_config)
-        # lxml html parser instance from lxml.etree
-        self.parser = _HTMLParser()
+        # lxml html parser instances from lxml.etree, one per thread as lxml parsers must not be used concurrently
+        self._local: threading.local = threading.local()
+
+    @property
+    def parser(self) -> _HTMLParser:
+        parser: Union[_HTMLParser, None] = getattr(self._local, "parser", None)
+        if parser is None:
+            parser = self._local.parser = _HTMLParser()
+        return parser
 
     def fetch(self, response: str) -> FetchResult:
         """
@@ -441,7 +564,7 @@ class HTMLParser(XMLParser):
     def _parse_field(self, html_tree: ElementTree, field_path: str, nsmap: dict = None, join_by: str = '') -> (
             Union)[str, List[str], None]:
         if field_path != '':
-            found_element_values = html_tree.xpath(field_path)
+            found_element_values = self._xpath(field_path, {})(html_tree)
             found_element_values = [str(found_element_value) if isinstance(found_element_value, str) else
                                     str(found_element_value.text)
                                     for found_element_value in found_element_values if found_element_value is not None]
@@ -1,15 +1,26 @@
-from re import compile, match
-from typing import Match, NamedTuple, Pattern, Protocol, Union, runtime_checkable
-from urllib.parse import urlparse, urlsplit, ParseResult
+from re import compile
+import threading
+from typing import Any, Hashable, Iterable, Iterator, Match, Optional, Pattern, Protocol, Tuple, Union, \
+    runtime_checkable
+from urllib.parse import urlparse, ParseResult
+from weakref import WeakValueDictionary
 
 PID_TYPE_KEYS = {"hdl", "doi", "url"}
 
+# compiled once at import, DOI and HDL classes and the classifier share them
+DOI_PATTERN: Pattern = compile(
+    r"(?:https://doi.org/)?.*(?:10\.)(?P<repo_id>[\w\W]+)/(?P<record_id>[\w\W.]+)$")
+HDL_PATTERN: Pattern = compile(
+    r"(?:http://|https://)?(?:hdl.handle.net/)?(?:hdl:)?(?P<repo_id>[\w.]+)/(?P<record_id>[\w\-.]+)(?:@format=cmdi+)?(?:@view+)?(?:\?index=[\d])?$")
+
 
 @runtime_checkable
 class PID(Protocol):
     """
     Abstract interface (a protocol) for PID instances
     """
+    __slots__ = ()
+
     def __str__(self):
         ...
 
@@ -26,35 +37,169 @@ class PID(Protocol):
         ...
 
 
+class _PIDValue(PID):
+    """
+    Immutable PID value object. Equality and hash are those of the canonical key, so equivalent forms of a PID
+    (e.g. hdl:11234/1-3698, http://hdl.handle.net/11234/1-3698@format=cmdi) are equal and usable as dict keys
+    """
+    __slots__ = ("key", "__weakref__")
+    _setters: tuple = ()
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # slot descriptors bypass __setattr__, faster than object.__setattr__ by name
+        cls._setters = tuple(getattr(cls, name).__set__ for name in ("key",) + cls.__slots__)
+
+    def _freeze(self, key: Tuple[str, str], *values: Any) -> None:
+        """
+        Set the canonical key and slot values, in the order of the class' __slots__, of a new instance
+        """
+        for setter, value in zip(self._setters, (key,) + values):
+            setter(self, value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, _PIDValue):
+            return NotImplemented
+        return self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({str(self)!r})"
+
+    def __reduce__(self) -> tuple:
+        return type(self), (str(self),)
+
+
 def pid_factory(pid_string: Union[str, PID]) -> Union[PID, None]:
     """
     Function for constructing relevant instance of PID protocol
     """
-    if isinstance(pid_string, PID):
+    if type(pid_string) is not str and isinstance(pid_string, PID):
         return pid_string
-    elif DOI.is_doi(pid_string):
-        return DOI(pid_string)
-    elif HDL.is_hdl(pid_string):
-        return HDL(pid_string)
-    elif URL.is_url(pid_string):
-        return URL(pid_string)
-    else:
+    return classify(pid_string)
+
+
+def classify(pid_string: str) -> Optional[PID]:
+    """
+    Detect PID type and extract its components in a single pass, DOI takes precedence over HDL and HDL over URL.
+    Cheap substring checks skip patterns that cannot match, every pattern runs at most once and its match is
+    reused by the constructed PID
+
+    :param pid_string: str, persistent identifier, may be in a format of URL, DOI or HDL
+    :return: Optional[PID], instance of the detected PID type, None if the string is not a PID
+    """
+    if "/" in pid_string:
+        if "10." in pid_string:
+            doi_match: Optional[Match] = DOI_PATTERN.match(pid_string)
+            if doi_match:
+                return DOI.from_match(doi_match)
+        hdl_match: Optional[Match] = HDL_PATTERN.fullmatch(pid_string)
+        if hdl_match:
+            return HDL.from_match(hdl_match)
+    return URL.from_string(pid_string)
+
+
+def classify_many(pid_strings: Iterable[str], interned: bool = False) -> Iterator[Optional[PID]]:
+    """
+    Bulk classify(), e.g. of PIDs extracted from log lines
+
+    :param pid_strings: Iterable[str], persistent identifiers, consumed lazily
+    :param interned: bool, whether to return interned instances (see intern_pid()), repeated strings are then
+        classified only once while their PID is alive
+    :return: Iterator[Optional[PID]], PID instance or None for every input string, in input order
+    """
+    return map(intern_pid if interned else classify, pid_strings)
+
+
+def canonical_key(pid: PID) -> Hashable:
+    """
+    :param pid: PID, class instance of PID protocol
+    :return: Hashable, key shared by equivalent forms of the PID, e.g. ("hdl", "11234/1-3698")
+    """
+    if isinstance(pid, _PIDValue):
+        return pid.key
+    return type(pid).__name__.lower(), pid.get_resolvable()
+
+
+# interned PIDs by canonical key and by the strings they were classified from, entries live as long as the PID
+_interned: "WeakValueDictionary[Hashable, PID]" = WeakValueDictionary()
+_interned_strings: "WeakValueDictionary[str, PID]" = WeakValueDictionary()
+_intern_lock: threading.Lock = threading.Lock()
+
+
+def intern_pid(pid_string: Union[str, PID]) -> Optional[PID]:
+    """
+    Canonical instance of the PID: equivalent PIDs map to a single shared instance (the first one interned), so
+    repeated PIDs across batch jobs are classified once and held in memory once, and compare by identity
+
+    :param pid_string: Union[str, PID], persistent identifier
+    :return: Optional[PID], interned instance, None if pid_string is not a PID
+    """
+    if type(pid_string) is str:
+        pid: Optional[PID] = _interned_strings.get(pid_string)
+        if pid is not None:
+            return pid
+    pid = pid_factory(pid_string)
+    if pid is None:
         return None
+    with _intern_lock:
+        pid = _interned.setdefault(canonical_key(pid), pid)
+        if type(pid_string) is str:
+            _interned_strings[pid_string] = pid
+    return pid
+
 
+class URL(_PIDValue):
+    __slots__ = ("url", "host_netloc", "record_id", "collection")
 
-class URL(PID):
     def __init__(self, url_string: str):
-        if not self.is_url(url_string):
+        url: Optional[ParseResult] = self._parse(url_string)
+        if url is None:
             raise ValueError(f"Provided string {url_string} is not an URL")
-        if url_string.split('/')[-1] == '':
-            url_string = '/'.join(url_string.split('/')[:-1])
-        self.url: ParseResult = urlparse(url_string)
-        url_split: NamedTuple = urlsplit(url_string)
-        self.host_netloc: str = getattr(url_split, 'hostname')
-        _path: str = getattr(url_split, 'path')
+        self._set(url)
 
-        self.record_id: str = self.url.geturl().split('/')[-1]
-        self.collection: str = self.url.geturl().split('/')[-2]
+    def _set(self, url: ParseResult) -> None:
+        url_string: str = url.geturl()
+        url_parts: list = url_string.split('/')
+        # host is case-insensitive, scheme is lowercased by urlparse already
+        key: str = url_string.replace(url.netloc, url.netloc.lower(), 1)
+        self._freeze(("url", key), url, url.hostname, url_parts[-1], url_parts[-2])
+
+    @staticmethod
+    def _parse(url_string: str) -> Optional[ParseResult]:
+        """
+        :return: Optional[ParseResult], parsed URL without trailing slash, None if url_string is not an URL
+        """
+        if url_string.endswith('/'):
+            # a trailing slash never belongs to the netloc, the stripped URL has the same one
+            url_string = url_string[:-1]
+        try:
+            url: ParseResult = urlparse(url_string)
+        except (TypeError, ValueError):
+            return None
+        if url.netloc == '':
+            return None
+        return url
+
+    @classmethod
+    def from_string(cls, url_string: str) -> Optional["URL"]:
+        """
+        :return: Optional[URL], instance parsing url_string once, None if url_string is not an URL
+        """
+        url: Optional[ParseResult] = cls._parse(url_string)
+        if url is None:
+            return None
+        instance: URL = cls.__new__(cls)
+        instance._set(url)
+        return instance
 
     def __str__(self):
         return self.url.geturl()
@@ -73,33 +218,34 @@ class URL(PID):
 
     @staticmethod
     def is_url(url_string: str) -> bool:
-        try:
-            url: ParseResult = urlparse(url_string)
-            if url.netloc == '':
-                return False
-        except ValueError:
-            return False
-        except TypeError:
-            return False
-        return True
+        return URL._parse(url_string) is not None
 
 
-class DOI(PID):
+class DOI(_PIDValue):
+    __slots__ = ("repo_id", "repo_record_sep", "record_id")
+
     def __init__(self, doi_string: str):
-        if not self.is_doi(doi_string):
+        doi_match: Optional[Match] = DOI_PATTERN.match(doi_string)
+        if not doi_match:
             raise ValueError(f"Provided string {doi_string} is not a DOI")
-
-        doi_pattern: Pattern = compile(
-            r"(?:https://doi.org/)?.*(?:10\.)(?P<repo_id>[\w\W]+)/(?P<record_id>[\w\W.]+)$")
-        doi_match: Match = doi_pattern.match(doi_string)
+        self._set(doi_match)
+
+    @classmethod
+    def from_match(cls, doi_match: Match) -> "DOI":
+        """
+        :param doi_match: Match, match of DOI_PATTERN
+        """
+        instance: DOI = cls.__new__(cls)
+        instance._set(doi_match)
+        return instance
+
+    def _set(self, doi_match: Match) -> None:
         matched_groups: dict = doi_match.groupdict()
-        self.repo_id: str = "10." + doi_match.group("repo_id")
-        self.repo_record_sep: str = ''
-        self.record_id: str = ''
-        if "repo_record_sep" in matched_groups:
-            self.repo_record_sep: str = doi_match.group("repo_record_sep")
-        if "record_id" in matched_groups:
-            self.record_id: str = doi_match.group("record_id")
+        repo_id: str = "10." + doi_match.group("repo_id")
+        repo_record_sep: str = matched_groups.get("repo_record_sep") or ''
+        record_id: str = matched_groups.get("record_id") or ''
+        # DOIs are case-insensitive
+        self._freeze(("doi", f"{repo_id}/{repo_record_sep}{record_id}".lower()), repo_id, repo_record_sep, record_id)
 
     def __str__(self):
         return f'doi:{self.repo_id}/{self.repo_record_sep}{self.record_id}'
@@ -121,25 +267,32 @@ class DOI(PID):
 
     @staticmethod
     def is_doi(doi_string: str) -> bool:
-        regex: Pattern = compile(r"(?:https://doi.org/)?.*(?:10\.)(?P<repo_id>[\w\W]+)/(?P<record_id>[\w\W.]+)$")
-        if match(regex, doi_string):
-            return True
-        else:
-            return False
+        return DOI_PATTERN.match(doi_string) is not None
+
 
+class HDL(_PIDValue):
+    __slots__ = ("repo_id", "record_id")
 
-class HDL(PID):
     def __init__(self, hdl_string: str):
-        if not self.is_hdl(hdl_string):
-            raise ValueError(f"Provided string {hdl_string} is not a HDL")
-        hdl_pattern: Pattern = compile(
-            r"(?:http://|https://)?(?:hdl.handle.net/)?(?:hdl:)?(?P<repo_id>[\w.]+)/(?P<record_id>[\w\-.]+)(?:@format=cmdi+)?(?:@view+)?(?:\?index=[\d])?$")
-        hdl_match: Match = hdl_pattern.fullmatch(hdl_string)
+        hdl_match: Optional[Match] = HDL_PATTERN.fullmatch(hdl_string)
         if not hdl_match:
-
             raise ValueError(f"Provided string {hdl_string} is not a HDL")
-        self.repo_id: str = hdl_match.group("repo_id")
-        self.record_id: str = hdl_match.group("record_id")
+        self._set(hdl_match)
+
+    @classmethod
+    def from_match(cls, hdl_match: Match) -> "HDL":
+        """
+        :param hdl_match: Match, full match of HDL_PATTERN
+        """
+        instance: HDL = cls.__new__(cls)
+        instance._set(hdl_match)
+        return instance
+
+    def _set(self, hdl_match: Match) -> None:
+        repo_id: str = hdl_match.group("repo_id")
+        record_id: str = hdl_match.group("record_id")
+        # handles are case-insensitive, presentation suffixes (@format=cmdi, @view, ?index=) are not part of the key
+        self._freeze(("hdl", f"{repo_id}/{record_id}".lower()), repo_id, record_id)
 
     def __str__(self):
         return self.get_resolvable()
@@ -158,9 +311,4 @@ class HDL(PID):
 
     @staticmethod
     def is_hdl(hdl_string: str) -> bool:
-        regex: Pattern = compile(
-            r"(?:http://|https://)?(?:hdl.handle.net/)?(?:hdl:)?(?P<repo_id>[\w.]+)/(?P<record_id>[\w\-.]+)(?:@format=cmdi+)?(?:@view+)?(?:\?index=[\d])?$")
-        if match(regex, hdl_string):
-            return True
-        else:
-            return False
+        return HDL_PATTERN.fullmatch(hdl_string) is not None
@@ -0,0 +1,167 @@
+from dataclasses import dataclass
+import threading
+import time
+from typing import Dict, Optional
+
+from .httpcache import _parse_http_date
+
+
+# seconds between retries of a request waiting for a free connection slot in non-blocking transports
+CONNECTION_POLL_INTERVAL: float = 0.05
+
+
+@dataclass
+class HostLimit:
+    """
+    Outbound request limits of a single host, zero disables the respective limit
+    """
+    rate: float = 0.0
+    burst: int = 1
+    max_connections: int = 0
+
+
+class _HostState:
+    """
+    Token bucket, connection count and Retry-After block of a single host
+    """
+    def __init__(self, limit: HostLimit):
+        self.limit: HostLimit = limit
+        self.tokens: float = float(max(limit.burst, 1))
+        self.updated: float = time.monotonic()
+        self.active: int = 0
+        self.blocked_until: float = 0.0
+
+    def refill(self, now: float) -> None:
+        if self.limit.rate > 0:
+            self.tokens = min(float(max(self.limit.burst, 1)), self.tokens + (now - self.updated) * self.limit.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """
+        Seconds until a request to the host may start, 0.0 if it may start now
+        """
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.limit.max_connections and self.active >= self.limit.max_connections:
+            return CONNECTION_POLL_INTERVAL
+        if self.limit.rate > 0 and self.tokens < 1:
+            return (1 - self.tokens) / self.limit.rate
+        return 0.0
+
+
+class HostScheduler:
+    """
+    Per-host token bucket rate limiter and connection cap for outbound requests. Every host has its own bucket,
+    so a throttled host delays only requests to itself. Hosts without explicit limit use default_limit. A host
+    answering 429/503 with Retry-After is blocked until the indicated time
+    """
+    def __init__(self, default_limit: Optional[HostLimit] = None, limits: Optional[Dict[str, HostLimit]] = None):
+        """
+        :param default_limit: Optional[HostLimit], limits of hosts without explicit limit, unlimited by default
+        :param limits: Optional[Dict[str, HostLimit]], limits keyed by hostname, e.g. {"lindat.mff.cuni.cz": ...}
+        """
+        self.default_limit: HostLimit = default_limit if default_limit is not None else HostLimit()
+        self._limits: Dict[str, HostLimit] = dict(limits or {})
+        self._hosts: Dict[str, _HostState] = {}
+        self._condition: threading.Condition = threading.Condition()
+
+    def set_limit(self, host: str, limit: HostLimit) -> None:
+        with self._condition:
+            self._limits[host] = limit
+            if host in self._hosts:
+                self._hosts[host].limit = limit
+
+    def clear_limit(self, host: str) -> None:
+        """
+        Drop the explicit limit of the host, it falls back to default_limit
+        """
+        with self._condition:
+            self._limits.pop(host, None)
+            if host in self._hosts:
+                self._hosts[host].limit = self.default_limit
+            self._condition.notify_all()
+
+    def get_limit(self, host: str) -> HostLimit:
+        return self._limits.get(host, self.default_limit)
+
+    def _state(self, host: str) -> _HostState:
+        state: Optional[_HostState] = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.get_limit(host))
+        return state
+
+    def try_acquire(self, host: str) -> float:
+        """
+        Take a token and a connection slot of the host if available, without blocking
+
+        :param host: str, hostname of the request
+        :return: float, 0.0 if the request may start (release() must follow), otherwise seconds to wait before
+            trying again
+        """
+        with self._condition:
+            state: _HostState = self._state(host)
+            now: float = time.monotonic()
+            state.refill(now)
+            delay: float = state.delay(now)
+            if delay > 0:
+                return delay
+            if state.limit.rate > 0:
+                state.tokens -= 1
+            state.active += 1
+            return 0.0
+
+    def acquire(self, host: str, timeout: Optional[float] = None) -> bool:
+        """
+        Block the calling thread until a request to the host may start, release() must follow a successful call
+
+        :param host: str, hostname of the request
+        :param timeout: Optional[float], maximum seconds to wait, unbounded if None
+        :return: bool, False if the request could not start within timeout
+        """
+        expires_at: Optional[float] = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                delay: float = self.try_acquire(host)
+                if delay == 0:
+                    return True
+                if expires_at is not None:
+                    if time.monotonic() + delay > expires_at:
+                        return False
+                self._condition.wait(delay)
+
+    def release(self, host: str) -> None:
+        with self._condition:
+            state: _HostState = self._state(host)
+            state.active = max(state.active - 1, 0)
+            self._condition.notify_all()
+
+    def retry_after(self, host: str, retry_after: str) -> None:
+        """
+        Block requests to the host as instructed by Retry-After response header
+
+        :param host: str, hostname of the throttled request
+        :param retry_after: str, Retry-After value, delay in seconds or HTTP date
+        """
+        retry_after = retry_after.strip()
+        if retry_after.isdigit():
+            delay: float = float(retry_after)
+        else:
+            retry_at: Optional[float] = _parse_http_date(retry_after)
+            if retry_at is None:
+                return
+            delay = retry_at - time.time()
+        if delay <= 0:
+            return
+        with self._condition:
+            state: _HostState = self._state(host)
+            state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+
+    def delay(self, host: str) -> float:
+        """
+        :return: float, seconds until a request to the host may start, 0.0 if it may start now
+        """
+        with self._condition:
+            state: _HostState = self._state(host)
+            now: float = time.monotonic()
+            state.refill(now)
+            return state.delay(now)
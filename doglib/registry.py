@@ -0,0 +1,290 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from .pid import pid_factory, PID
+from .repoindex import RepoIndex
+from .repos import RegRepo
+
+
+REPO_CONFIG_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static/repo_configs")
+CONFIG_SCHEMA_PATH: str = os.path.join(REPO_CONFIG_DIR, "schema/repo_config_validation_schema.json")
+# bumped whenever the pickled layout of RegistrySnapshot changes, snapshots of other formats are rebuilt
+REGISTRY_FORMAT: int = 3
+
+
+class RegistryError(Exception):
+    """
+    Exception risen if a repository config does not load or does not validate against the config schema
+    """
+    pass
+
+
+def config_files(config_dir: str = REPO_CONFIG_DIR) -> List[str]:
+    """
+    :return: List[str], names of repository config files in config_dir, sorted
+    """
+    if not os.path.exists(config_dir):
+        raise FileNotFoundError(f"Config dir {config_dir} does not exist")
+    return sorted(config_file for config_file in os.listdir(config_dir) if config_file.endswith(".json"))
+
+
+def _read_config(config_dir: str, config_file: str) -> Tuple[Tuple[str, int, int], bytes]:
+    """
+    :return: Tuple[Tuple[str, int, int], bytes], fingerprint entry (name, size, modification time) and contents of a
+        config file, stat is taken before reading, so a config modified while read does not look unchanged later
+    """
+    config_path: str = os.path.join(config_dir, config_file)
+    config_stat: os.stat_result = os.stat(config_path)
+    with open(config_path, "rb") as cfile:
+        config: bytes = cfile.read()
+    return (config_file, config_stat.st_size, config_stat.st_mtime_ns), config
+
+
+def _combined_digest(file_digests: Dict[str, str]) -> str:
+    """
+    :return: str, SHA-256 hash of the names and content hashes of config files
+    """
+    digest = hashlib.sha256()
+    for config_file in sorted(file_digests):
+        digest.update(f"{config_file}\0{file_digests[config_file]}\0".encode())
+    return digest.hexdigest()
+
+
+def config_digest(config_dir: str = REPO_CONFIG_DIR) -> str:
+    """
+    :return: str, SHA-256 content hash of repository config files in config_dir and of their names
+    """
+    return _combined_digest({config_file: hashlib.sha256(_read_config(config_dir, config_file)[1]).hexdigest()
+                             for config_file in config_files(config_dir)})
+
+
+def config_fingerprint(config_dir: str = REPO_CONFIG_DIR) -> Tuple[Tuple[str, int, int], ...]:
+    """
+    :return: Tuple[Tuple[str, int, int], ...], name, size and modification time of repository config files, cheap
+        check whether configs may have changed without reading them
+    """
+    fingerprint: List[Tuple[str, int, int]] = []
+    for config_file in config_files(config_dir):
+        config_stat: os.stat_result = os.stat(os.path.join(config_dir, config_file))
+        fingerprint.append((config_file, config_stat.st_size, config_stat.st_mtime_ns))
+    return tuple(fingerprint)
+
+
+def conflict_examples(reg_repos: Sequence[RegRepo], repo_index: RepoIndex) -> List[Tuple[PID, str]]:
+    """
+    :return: List[Tuple[PID, str]], test example PIDs matching several registered repositories and the id of the
+        repository they are an example of, see DOG.seed_conflicts()
+    """
+    examples: List[Tuple[PID, str]] = []
+    for reg_repo in reg_repos:
+        for test_pid in reg_repo.get_test_examples().values():
+            pid: Optional[PID] = pid_factory(test_pid) if test_pid else None
+            if pid and len(repo_index.match(pid)) > 1:
+                examples.append((pid, reg_repo.id))
+    return examples
+
+
+@dataclass
+class RegistryDiff:
+    """
+    Ids of repositories added, changed and removed by RegistrySnapshot.update(), false if nothing changed
+    """
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+class RegistrySnapshot:
+    """
+    Compiled registry of repository configs: RegRepo objects with their URL templates and parser definitions, the
+    RepoIndex used for sniffing and identifier conflicts of test examples, stored as a single pickle and loaded with
+    a single read. The snapshot records the content hash of the config directory it was built from, see
+    is_current().
+
+    Request plans of RegRepo objects (see RegRepo.compile()) are compiled on build to validate the configs, but not
+    stored: pickled regexes are compiled again on load, whether they are used or not, plans are compiled on first use
+
+    Snapshots are pickles, load only snapshots you built. DOG instances constructed from the same snapshot object
+    share its RegRepo objects
+    """
+    def __init__(self, digest: str, reg_repos: Sequence[RegRepo], repo_index: RepoIndex,
+                 conflict_seeds: List[Tuple[PID, str]], fingerprint: Tuple[Tuple[str, int, int], ...] = (),
+                 file_digests: Optional[Dict[str, str]] = None):
+        """
+        :param digest: str, config_digest() of the config directory the snapshot was built from
+        :param reg_repos: Sequence[RegRepo], registered repositories, sorted by config file name, kept as a tuple: a
+            changed registry is a new snapshot, see update()
+        :param repo_index: RepoIndex, index of reg_repos
+        :param conflict_seeds: List[Tuple[PID, str]], see conflict_examples()
+        :param fingerprint: Tuple[Tuple[str, int, int], ...], config_fingerprint() of the config directory, an entry
+            per repository of reg_repos
+        :param file_digests: Optional[Dict[str, str]], SHA-256 content hash of every config file by name
+        """
+        self.format: int = REGISTRY_FORMAT
+        self.digest: str = digest
+        self.fingerprint: Tuple[Tuple[str, int, int], ...] = fingerprint
+        self.file_digests: Dict[str, str] = file_digests or {}
+        self.reg_repos: Tuple[RegRepo, ...] = tuple(reg_repos)
+        self.repo_index: RepoIndex = repo_index
+        self.conflict_seeds: List[Tuple[PID, str]] = conflict_seeds
+
+    @classmethod
+    def build(cls, config_dir: str = REPO_CONFIG_DIR, schema_path: Optional[str] = CONFIG_SCHEMA_PATH) \
+            -> "RegistrySnapshot":
+        """
+        Load and validate all repository configs of config_dir
+
+        :param config_dir: str, directory with repository configs
+        :param schema_path: Optional[str], JSON schema every config is validated against, no validation if None
+        :return: RegistrySnapshot, raises RegistryError if a config does not load or validate
+        """
+        return cls("", [], RepoIndex([]), []).update(config_dir, schema_path)[0]
+
+    def update(self, config_dir: str = REPO_CONFIG_DIR, schema_path: Optional[str] = CONFIG_SCHEMA_PATH) \
+            -> Tuple["RegistrySnapshot", RegistryDiff]:
+        """
+        Snapshot of the current configs of config_dir built incrementally: only config files whose name, size or
+        modification time differ are read, and only those whose content differs are loaded and validated again.
+        RegRepo objects of other configs (and parsers they built) are reused. The snapshot itself is not modified,
+        so users of it keep a consistent registry
+
+        :param config_dir: str, directory with repository configs
+        :param schema_path: Optional[str], JSON schema loaded configs are validated against, no validation if None
+        :return: Tuple[RegistrySnapshot, RegistryDiff], current snapshot, self if no config file changed, and ids of
+            repositories added, changed and removed, raises RegistryError if a config does not load or validate
+        """
+        previous: Dict[str, Tuple[Tuple[str, int, int], RegRepo]] = {
+            entry[0]: (entry, reg_repo) for entry, reg_repo in zip(self.fingerprint, self.reg_repos)}
+        validate: Optional[Callable[[dict], None]] = None
+        fingerprint: List[Tuple[str, int, int]] = []
+        file_digests: Dict[str, str] = {}
+        reg_repos: List[RegRepo] = []
+        for config_file in config_files(config_dir):
+            entry, reg_repo = previous.get(config_file, (None, None))
+            config_stat: os.stat_result = os.stat(os.path.join(config_dir, config_file))
+            if entry is not None and entry[1:] == (config_stat.st_size, config_stat.st_mtime_ns):
+                fingerprint.append(entry)
+                file_digests[config_file] = self.file_digests[config_file]
+                reg_repos.append(reg_repo)
+                continue
+            entry, config = _read_config(config_dir, config_file)
+            file_digest: str = hashlib.sha256(config).hexdigest()
+            if reg_repo is None or self.file_digests.get(config_file) != file_digest:
+                if validate is None and schema_path is not None:
+                    from .schemas import JSONSchema
+                    validate = JSONSchema(schema_path).validate
+                reg_repo = self._load_config(config_file, config, validate)
+            fingerprint.append(entry)
+            file_digests[config_file] = file_digest
+            reg_repos.append(reg_repo)
+        if self.digest and tuple(fingerprint) == self.fingerprint:
+            return self, RegistryDiff()
+
+        previous_repos: Dict[str, RegRepo] = {reg_repo.id: reg_repo for reg_repo in self.reg_repos}
+        current_repos: Dict[str, RegRepo] = {reg_repo.id: reg_repo for reg_repo in reg_repos}
+        diff: RegistryDiff = RegistryDiff(
+            added=sorted(current_repos.keys() - previous_repos.keys()),
+            changed=sorted(repo_id for repo_id in current_repos.keys() & previous_repos.keys()
+                           if current_repos[repo_id] is not previous_repos[repo_id]),
+            removed=sorted(previous_repos.keys() - current_repos.keys()))
+        # unchanged if only modification times changed, configs were rewritten with the same content
+        repo_index: RepoIndex = self.repo_index
+        conflict_seeds: List[Tuple[PID, str]] = self.conflict_seeds
+        kept: Set[int] = {id(reg_repo) for reg_repo in reg_repos} & {id(reg_repo) for reg_repo in self.reg_repos}
+        removed: List[RegRepo] = [reg_repo for reg_repo in self.reg_repos if id(reg_repo) not in kept]
+        added: List[RegRepo] = [reg_repo for reg_repo in reg_repos if id(reg_repo) not in kept]
+        if not self.reg_repos:
+            repo_index = RepoIndex(reg_repos)
+            conflict_seeds = conflict_examples(reg_repos, repo_index)
+        elif removed or added:
+            repo_index = self.repo_index.updated(reg_repos, removed, added)
+            conflict_seeds = self._updated_seeds(repo_index, removed, added)
+        snapshot: RegistrySnapshot = type(self)(_combined_digest(file_digests), repo_index.reg_repos, repo_index,
+                                                conflict_seeds, tuple(fingerprint), file_digests)
+        return snapshot, diff
+
+    def _updated_seeds(self, repo_index: RepoIndex, removed: List[RegRepo], added: List[RegRepo]) \
+            -> List[Tuple[PID, str]]:
+        """
+        Conflict seeds of the registry indexed by repo_index, derived from the seeds of this snapshot: test examples
+        are checked again only for added repositories and for kept ones overlapping an added or removed repository,
+        see RepoIndex.overlapping()
+
+        :return: List[Tuple[PID, str]], see conflict_examples()
+        """
+        affected: Dict[int, RegRepo] = {id(reg_repo): reg_repo for reg_repo in added}
+        for reg_repo in removed:
+            affected.update((id(other), other) for other in self.repo_index.overlapping(reg_repo))
+        for reg_repo in added:
+            affected.update((id(other), other) for other in repo_index.overlapping(reg_repo))
+        gone: Set[int] = {id(reg_repo) for reg_repo in removed}
+        affected = {key: reg_repo for key, reg_repo in affected.items() if key not in gone}
+        affected_ids: Set[str] = {reg_repo.id for reg_repo in affected.values()} | {reg_repo.id for reg_repo in removed}
+        seeds: List[Tuple[PID, str]] = [seed for seed in self.conflict_seeds if seed[1] not in affected_ids]
+        return seeds + conflict_examples([reg_repo for reg_repo in repo_index.reg_repos if id(reg_repo) in affected],
+                                         repo_index)
+
+    @staticmethod
+    def _load_config(config_file: str, config: bytes, validate: Optional[Callable[[dict], None]]) -> RegRepo:
+        """
+        :return: RegRepo, repository of the config, raises RegistryError if the config does not load or validate
+        """
+        try:
+            repo_config: dict = json.loads(config)
+            if validate is not None:
+                validate(repo_config)
+            # compiles request plans, see RegRepo.compile()
+            return RegRepo(repo_config["repository"])
+        except Exception as error:
+            raise RegistryError(f"{error}\nConfig failing to load: {config_file}") from error
+
+    def is_current(self, config_dir: str = REPO_CONFIG_DIR) -> bool:
+        """
+        :return: bool, whether the snapshot is of the current format and configs of config_dir did not change since
+            it was built, config files are hashed only if their names, sizes or modification times differ
+        """
+        if self.format != REGISTRY_FORMAT:
+            return False
+        return self.fingerprint == config_fingerprint(config_dir) or self.digest == config_digest(config_dir)
+
+    def save(self, path: Union[str, os.PathLike]) -> None:
+        tmp_path: str = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as snapshot_file:
+            snapshot_file.write(pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Union[str, os.PathLike]) -> "RegistrySnapshot":
+        """
+        Load snapshot saved by save() with a single read, without checking it is current
+        """
+        with open(path, "rb") as snapshot_file:
+            snapshot = pickle.loads(snapshot_file.read())
+        if not isinstance(snapshot, cls):
+            raise RegistryError(f"{path} is not a registry snapshot")
+        return snapshot
+
+    @classmethod
+    def open(cls, path: Union[str, os.PathLike], config_dir: str = REPO_CONFIG_DIR,
+             schema_path: Optional[str] = CONFIG_SCHEMA_PATH) -> "RegistrySnapshot":
+        """
+        Load snapshot from path, or build it from config_dir and save it to path if it is missing, unreadable or
+        stale
+        """
+        try:
+            snapshot: RegistrySnapshot = cls.load(path)
+            if snapshot.is_current(config_dir):
+                return snapshot
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, RegistryError):
+            pass
+        snapshot = cls.build(config_dir, schema_path)
+        snapshot.save(path)
+        return snapshot
@@ -0,0 +1,232 @@
+from collections import defaultdict, deque
+import copy
+from typing import Callable, Deque, Dict, Iterable, List, Sequence, Set, Tuple
+
+from .pid import DOI, HDL, PID, URL
+from .repos import RegRepo
+
+
+def _strip_schemes(url: str) -> str:
+    return url.replace('https://', '').replace('http://', '')
+
+
+class SubstringIndex:
+    """
+    Aho-Corasick automaton over a set of needles: search() finds every needle occurring in a text in a single pass
+    over the text, however many needles are indexed
+    """
+    def __init__(self, needles: Iterable[Tuple[str, int]]):
+        """
+        :param needles: Iterable[Tuple[str, int]], needle and value reported when the needle occurs
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        # empty needles occur in every text
+        self._always: Set[int] = set()
+        outputs: List[List[int]] = [[]]
+        for needle, value in needles:
+            if not needle:
+                self._always.add(value)
+                continue
+            state: int = 0
+            for char in needle:
+                next_state: int = self._goto[state].get(char, -1)
+                if next_state < 0:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(value)
+
+        queue: Deque[int] = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail_state: int = self._fail[state]
+                while fail_state and char not in self._goto[fail_state]:
+                    fail_state = self._fail[fail_state]
+                self._fail[next_state] = self._goto[fail_state].get(char, 0)
+                # BFS order: output of the (shallower) fail state is complete already
+                outputs[next_state].extend(outputs[self._fail[next_state]])
+        self._out = [tuple(output) for output in outputs]
+
+    def search(self, text: str) -> Set[int]:
+        """
+        :return: Set[int], values of all needles occurring in text
+        """
+        found: Set[int] = set(self._always)
+        goto: List[Dict[str, int]] = self._goto
+        fail: List[int] = self._fail
+        out: List[Tuple[int, ...]] = self._out
+        state: int = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class RepoIndex:
+    """
+    Index of registered repositories answering RegRepo.match_pid() for all of them at once: HDL prefix and DOI
+    prefix map to repositories in a dict, URLs are matched against all host_netlocs with a SubstringIndex. Lookups
+    do not depend on the number of repositories, results are identical to a linear scan with match_pid(), in
+    registry order. updated() derives the index of a changed registry from this one, rebuilding only entries of
+    repositories that were added or removed.
+
+    The indexed repositories are kept as a tuple, RegRepo objects must not be modified once indexed: a changed
+    registry gets a new (or updated()) index
+    """
+    def __init__(self, reg_repos: Sequence[RegRepo]):
+        """
+        :param reg_repos: Sequence[RegRepo], registered repositories, in registry order
+        """
+        self.reg_repos: Tuple[RegRepo, ...] = tuple(reg_repos)
+        self._positions: Dict[int, int] = {id(reg_repo): position for position, reg_repo in enumerate(self.reg_repos)}
+        self._hdl: Dict[str, Tuple[RegRepo, ...]] = self._group(self.reg_repos, self._hdl_prefixes)
+        self._doi: Dict[str, Tuple[RegRepo, ...]] = self._group(self.reg_repos, self._doi_prefixes)
+        self._url: Dict[str, Tuple[RegRepo, ...]] = self._group(self.reg_repos, self._url_needles)
+        self._needles: Tuple[str, ...] = tuple(self._url)
+        self._url_search: SubstringIndex = SubstringIndex(
+            (needle, number) for number, needle in enumerate(self._needles))
+
+    def __getstate__(self) -> dict:
+        # positions are keyed by object ids, which differ after unpickling
+        state: dict = dict(self.__dict__)
+        state.pop("_positions", None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._positions = {id(reg_repo): position for position, reg_repo in enumerate(self.reg_repos)}
+
+    @staticmethod
+    def _group(reg_repos: Iterable[RegRepo], keys_of: Callable[[RegRepo], Set[str]]) \
+            -> Dict[str, Tuple[RegRepo, ...]]:
+        """
+        :return: Dict[str, Tuple[RegRepo, ...]], repositories by index key, in registry order
+        """
+        groups: Dict[str, List[RegRepo]] = defaultdict(list)
+        for reg_repo in reg_repos:
+            for key in keys_of(reg_repo):
+                groups[key].append(reg_repo)
+        return {key: tuple(group) for key, group in groups.items()}
+
+    def updated(self, reg_repos: Sequence[RegRepo], removed: Iterable[RegRepo], added: Iterable[RegRepo]) \
+            -> "RepoIndex":
+        """
+        Index of reg_repos derived from this one: entries of keys no removed or added repository has are reused, the
+        URL automaton is reused unless the set of host_netlocs changed. This index is not modified
+
+        :param reg_repos: Sequence[RegRepo], registered repositories, in registry order, repositories kept from this
+            index keep their relative order
+        :param removed: Iterable[RegRepo], repositories of this index missing in reg_repos
+        :param added: Iterable[RegRepo], repositories of reg_repos missing in this index
+        :return: RepoIndex, index of reg_repos
+        """
+        removed = list(removed)
+        added = list(added)
+        index: RepoIndex = copy.copy(self)
+        index.reg_repos = tuple(reg_repos)
+        index._positions = {id(reg_repo): position for position, reg_repo in enumerate(index.reg_repos)}
+        index._hdl = index._regroup(self._hdl, removed, added, self._hdl_prefixes)
+        index._doi = index._regroup(self._doi, removed, added, self._doi_prefixes)
+        index._url = index._regroup(self._url, removed, added, self._url_needles)
+        if index._url.keys() != self._url.keys():
+            index._needles = tuple(index._url)
+            index._url_search = SubstringIndex((needle, number) for number, needle in enumerate(index._needles))
+        return index
+
+    def _regroup(self, groups: Dict[str, Tuple[RegRepo, ...]], removed: List[RegRepo], added: List[RegRepo],
+                 keys_of: Callable[[RegRepo], Set[str]]) -> Dict[str, Tuple[RegRepo, ...]]:
+        """
+        :return: Dict[str, Tuple[RegRepo, ...]], copy of groups without removed and with added repositories, groups
+            of other keys are the same objects
+        """
+        groups = dict(groups)
+        gone: Set[int] = {id(reg_repo) for reg_repo in removed}
+        touched: Set[str] = set()
+        for reg_repo in removed:
+            touched.update(keys_of(reg_repo))
+        additions: Dict[str, Tuple[RegRepo, ...]] = self._group(added, keys_of)
+        touched.update(additions)
+        for key in touched:
+            group: List[RegRepo] = [reg_repo for reg_repo in groups.get(key, ()) if id(reg_repo) not in gone]
+            group.extend(additions.get(key, ()))
+            group.sort(key=lambda reg_repo: self._positions[id(reg_repo)])
+            if group:
+                groups[key] = tuple(group)
+            else:
+                groups.pop(key, None)
+        return groups
+
+    def overlapping(self, reg_repo: RegRepo) -> List[RegRepo]:
+        """
+        Repositories of the index whose PIDs the repository may compete for: sharing an HDL or DOI prefix, or whose
+        host_netloc contains or is contained in the host_netloc of the repository
+
+        :param reg_repo: RegRepo, repository, indexed or not
+        :return: List[RegRepo], indexed repositories other than reg_repo, in registry order
+        """
+        found: Dict[int, RegRepo] = {}
+        for groups, keys in ((self._hdl, self._hdl_prefixes(reg_repo)), (self._doi, self._doi_prefixes(reg_repo))):
+            for key in keys:
+                found.update((id(other), other) for other in groups.get(key, ()))
+        for needle in self._url_needles(reg_repo):
+            for other_needle, group in self._url.items():
+                if needle in other_needle or other_needle in needle:
+                    found.update((id(other), other) for other in group)
+        found.pop(id(reg_repo), None)
+        return sorted(found.values(), key=lambda other: self._positions[id(other)])
+
+    @staticmethod
+    def _hdl_prefixes(reg_repo: RegRepo) -> Set[str]:
+        if "id" not in reg_repo.hdl.keys():
+            return set()
+        if type(reg_repo.hdl["id"]) == str:
+            return {reg_repo.hdl["id"]}
+        return set(reg_repo.hdl["id"])
+
+    @staticmethod
+    def _url_needles(reg_repo: RegRepo) -> Set[str]:
+        return {_strip_schemes(reg_repo.host_netloc)}
+
+    @staticmethod
+    def _doi_prefixes(reg_repo: RegRepo) -> Set[str]:
+        """
+        DOI prefixes matching the repository, as match_pid() tests "in" the configured id, a string id matches any
+        of its substrings (DOI repo ids start with "10.")
+        """
+        doi_id = reg_repo.doi.get("id")
+        if doi_id is None:
+            return set()
+        if type(doi_id) != str:
+            return set(doi_id)
+        prefixes: Set[str] = set()
+        start: int = doi_id.find("10.")
+        while start >= 0:
+            prefixes.update(doi_id[start:end] for end in range(start + 3, len(doi_id) + 1))
+            start = doi_id.find("10.", start + 1)
+        return prefixes
+
+    def match(self, pid: PID) -> List[RegRepo]:
+        """
+        :param pid: PID, class instance of PID protocol
+        :return: List[RegRepo], repositories whose match_pid() accepts the PID, in registry order
+        """
+        if type(pid) == HDL:
+            return list(self._hdl.get(pid.get_repo_id(), ()))
+        if type(pid) == DOI:
+            return list(self._doi.get(pid.get_repo_id(), ()))
+        if type(pid) == URL:
+            found: Dict[int, RegRepo] = {}
+            for number in self._url_search.search(_strip_schemes(pid.get_resolvable())):
+                found.update((id(reg_repo), reg_repo) for reg_repo in self._url[self._needles[number]])
+            return sorted(found.values(), key=lambda reg_repo: self._positions[id(reg_repo)])
+        return []
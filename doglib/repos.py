@@ -1,10 +1,18 @@
-from re import match, Match
-from typing import AnyStr, Union, Optional
+from dataclasses import dataclass, field
+from re import compile, error as RegexError, Match, Pattern
+import threading
+from types import MappingProxyType
+from typing import AnyStr, Dict, Mapping, Optional, Tuple, Type, TYPE_CHECKING, Union
+from urllib.parse import urlsplit
 import warnings
 
 from . import curl
-from .parsers import CMDIParser, HTMLParser, JSONParser, SignpostParser, XMLParser, FetchResult, IdentifyResult, Parser
+from .dogdataclasses import FetchResult, IdentifyResult
 from .pid import pid_factory, DOI, HDL, PID, URL
+from .resolver import get_default_resolver
+
+if TYPE_CHECKING:
+    from .parsers import JSONParser, Parser, SignpostParser, XMLParser
 
 
 def warn_europeana() -> None:
@@ -15,6 +23,96 @@ def warn_europeana() -> None:
                   NoSecretWarning)
 
 
+@dataclass
+class ParserStats:
+    """
+    Counters of parsers constructed and of cached parsers reused by RegRepo.get_parser()
+    """
+    constructed: int = 0
+    reused: int = 0
+
+
+_parser_stats: ParserStats = ParserStats()
+_parser_stats_lock: threading.Lock = threading.Lock()
+
+
+def get_parser_stats() -> ParserStats:
+    """
+    :return: ParserStats, parser construction and reuse counters of all registered repositories
+    """
+    return _parser_stats
+
+
+def reset_parser_stats() -> None:
+    global _parser_stats
+    with _parser_stats_lock:
+        _parser_stats = ParserStats()
+
+
+def _count_parser(constructed: bool) -> None:
+    with _parser_stats_lock:
+        if constructed:
+            _parser_stats.constructed += 1
+        else:
+            _parser_stats.reused += 1
+
+
+class RepoConfigError(Exception):
+    """
+    Exception risen if request configs of a repository config do not compile, see RegRepo.compile()
+    """
+    pass
+
+
+class URLTemplate:
+    """
+    URL format of a request config split once at its placeholder: the PID variable ($hdl, $doi, $url or $record_id)
+    and secrets (e.g. $EUROPEANA_WSKEY) are substituted by render() without scanning the format again
+    """
+    _SECRET_PATTERN: Pattern = compile(r"\$([A-Za-z_]\w*)")
+
+    def __init__(self, url_format: str, variable: str):
+        """
+        :param url_format: str, URL format with "$" placeholders, $api already substituted
+        :param variable: str, name of the placeholder substituted by the PID or its record id
+        """
+        self.url_format: str = url_format
+        self.variable: str = variable
+        self._literals: Tuple[str, ...] = tuple(url_format.split(f"${variable}"))
+        # literals split at secret placeholders (text, name, text, ..., text), None if the format has none
+        self._secret_parts: Optional[Tuple[Tuple[str, ...], ...]] = None
+        if any(self._SECRET_PATTERN.search(literal) for literal in self._literals):
+            self._secret_parts = tuple(tuple(self._SECRET_PATTERN.split(literal)) for literal in self._literals)
+
+    def render(self, value: str, secrets: Optional[dict] = None) -> str:
+        """
+        :param value: str, substituted for the variable placeholder
+        :param secrets: Optional[dict], substituted for placeholders of their names, others are kept
+        :return: str, URL
+        """
+        if self._secret_parts is None or not secrets:
+            return value.join(self._literals)
+        return value.join("".join(secrets.get(part, f"${part}") if position % 2 else part
+                                  for position, part in enumerate(parts))
+                          for parts in self._secret_parts)
+
+
+@dataclass(frozen=True)
+class RequestPlan:
+    """
+    Request config of a PID type compiled by RegRepo.compile(): PID redirects are followed if template is None,
+    otherwise the template is rendered with the PID, or with its record id if regex is set. Headers are a read-only
+    view, plans are shared by all requests of the repository
+    """
+    template: Optional[URLTemplate]
+    regex: Optional[Pattern] = None
+    headers: Mapping[str, str] = field(default_factory=lambda: MappingProxyType({}))
+
+
+# accepted response format of repositories providing CMDI metadata, unless configured otherwise
+CMDI_HEADERS: Mapping[str, str] = MappingProxyType({"Accept": "application/x-cmdi+xml"})
+
+
 class NoSecretWarning(Warning):
     def __init__(self, message):
         self.message: AnyStr = message
@@ -34,6 +132,8 @@ class RegRepo(object):
         """
         self.id: str = ''
         self.api: dict = {}
+        # whether GET requests to the repository may ask for compressed (gzip/deflate/br) responses
+        self.compression: bool = True
         self.doi: dict = {}
         self.dtr: bool = dtr
         self.hdl: dict = {}
@@ -42,9 +142,99 @@ class RegRepo(object):
         self.host_netloc: str = ''
         self.name: str = ''
         self.parser: dict = {}
+        # outbound request limits of the repository host {"rate": float, "burst": int, "max_connections": int}
+        self.rate_limit: dict = {}
+        # FAIR signposting support, None if not declared in the config and learned by DOG at runtime
+        self.signposting: Optional[bool] = None
         self.test_examples: dict = {}
+        # parsers by type, built on first use, see get_parser()
+        self._parsers: Dict[str, Parser] = {}
+        self._parsers_lock: threading.Lock = threading.Lock()
+        # request plans by PID type, see compile()
+        self._plans: Optional[Dict[Type[PID], RequestPlan]] = None
         for key in config_dict:
             setattr(self, key, config_dict[key])
+        self.compile()
+
+    def __getstate__(self) -> dict:
+        # parsers are built again on first use after unpickling
+        state: dict = dict(object.__getstate__(self))
+        state.pop("_parsers", None)
+        state.pop("_parsers_lock", None)
+        # request plans are compiled again on first use, configs were validated when pickled
+        state.pop("_plans", None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        # __dict__ is overridden by the repository description, unpickle attributes as the constructor sets them
+        self._parsers = {}
+        self._parsers_lock = threading.Lock()
+        self._plans = None
+        for key in state:
+            setattr(self, key, state[key])
+
+    def compile(self) -> None:
+        """
+        Compile request configs of HDL, DOI and URL PIDs into a RequestPlan per PID type: regexes are compiled, URL
+        formats are split at their placeholders with $api substituted, and request headers are resolved, so
+        get_request_url() and get_headers() do not interpret the config on every call. Called on init
+
+        :return: None, raises RepoConfigError if a request config has no format, its regex does not compile or has no
+            record_id group, or its format refers to $api but the repository has no "api" base
+        """
+        plans: Dict[Type[PID], RequestPlan] = {}
+        for pid_type, request_config, variable in ((HDL, self.hdl, "hdl"), (DOI, self.doi, "doi"),
+                                                   (URL, self.url, "url")):
+            if request_config:
+                plans[pid_type] = self._compile_plan(pid_type, request_config, variable)
+        self._plans = plans
+
+    def _compile_plan(self, pid_type: Type[PID], request_config: dict, variable: str) -> RequestPlan:
+        if "format" not in request_config:
+            raise RepoConfigError(f"Request config {variable} of repository {self.id} has no format")
+        url_format: str = request_config["format"]
+        headers: Mapping[str, str] = MappingProxyType(self._default_headers())
+        if "headers" in request_config:
+            headers = MappingProxyType(dict(request_config["headers"]))
+        # repositories providing CMDI metadata are requested by the PID itself, URLs may map to a record id
+        if self.parser.get("type") == "cmdi" and (pid_type != URL or "regex" not in request_config):
+            return RequestPlan(URLTemplate(url_format, variable), headers=headers)
+        if "regex" not in request_config:
+            return RequestPlan(None if url_format == "redirect" else URLTemplate(url_format, variable),
+                               headers=headers)
+        try:
+            regex: Pattern = compile(request_config["regex"])
+        except RegexError as error:
+            raise RepoConfigError(f"Request config {variable} of repository {self.id}: {error}") from error
+        # the regex of redirect configs only ranks sniffed repositories, see DOG._rank_sniffed()
+        if url_format == "redirect":
+            return RequestPlan(None, regex, headers)
+        if "record_id" not in regex.groupindex:
+            raise RepoConfigError(f"Regex of request config {variable} of repository {self.id} has no record_id "
+                                  f"group")
+        if "$api" in url_format:
+            if "base" not in self.api:
+                raise RepoConfigError(f"Request config {variable} of repository {self.id} refers to $api, but "
+                                      f"the repository has no api base")
+            url_format = url_format.replace("$api", self.api["base"])
+        return RequestPlan(URLTemplate(url_format, "record_id"), regex, headers)
+
+    def _default_headers(self) -> dict:
+        """
+        :return: dict, copy of the default request headers of the repository
+        """
+        if self.parser.get("type") == "cmdi":
+            return dict(CMDI_HEADERS)
+        return dict(self.api.get("headers", {}))
+
+    def get_request_plan(self, pid: PID) -> Optional[RequestPlan]:
+        """
+        :param pid: PID, class instance of PID protocol
+        :return: Optional[RequestPlan], compiled request config of the PID type, None if the repository has none
+        """
+        if self._plans is None:
+            self.compile()
+        return self._plans.get(type(pid))
 
     def get_request_url(self, pid: PID, secrets: Optional[dict] = None) -> str:
         """
@@ -57,57 +247,32 @@ class RegRepo(object):
 
         if pid is None:
             return ""
-
-        # Request to repository providing CMDI metadata
-        if self.parser["type"] == 'cmdi':
-            if type(pid) == HDL:
-                return self._set_secrets(self.hdl["format"].replace("$hdl",
-                                                                    pid.get_resolvable()),
-                                         secrets)
-            if type(pid) == DOI:
-                return self._set_secrets(self.doi["format"].replace("$doi",
-                                                                    pid.get_resolvable()),
-                                         secrets)
-            if type(pid) == URL and "regex" not in self.url.keys():
-                return self._set_secrets(self.url["format"].replace("$url",
-                                                                    pid.get_resolvable()),
-                                         secrets)
-
-        # Generic cases
-        request_config: dict = {}
-        if type(pid) == HDL:
-            request_config = self.hdl
-        elif type(pid) == DOI:
-            request_config = self.doi
-        elif type(pid) == URL:
-            request_config = self.url
-            # if html scrapping return deposit URL
-
+        plan: Optional[RequestPlan] = self.get_request_plan(pid)
+        if plan is None:
+            raise RepoConfigError(f"Repository {self.id} has no request config for {type(pid).__name__} PIDs")
         # follow redirects
-        if request_config["format"] == "redirect":
-            target_url: PID = pid_factory(curl.get(pid.get_resolvable(),
-                                                   self.get_headers(pid),
-                                                   follow_redirects=True)[0])
+        if plan.template is None:
+            target_url: PID = pid_factory(get_default_resolver().resolve(pid, dict(plan.headers)))
             return self.get_request_url(target_url, secrets)
+        if plan.regex is None:
+            return plan.template.render(pid.get_resolvable(), secrets)
         # parse id
-        elif "regex" in request_config.keys():
-            regex = request_config["regex"]
-            rmatch: Match = match(regex, pid.get_resolvable())
+        rmatch: Optional[Match] = plan.regex.match(pid.get_resolvable())
+        if rmatch is None:
+            raise ValueError(f"{pid.get_resolvable()} does not match record id regex of repository {self.id}")
+        return plan.template.render(rmatch.group("record_id"), secrets)
 
-            record_id = rmatch.group("record_id")
+    def requires_redirect(self, pid: PID) -> bool:
+        """
+        Check whether get_request_url() needs to follow PID redirects (network I/O) to build the request URL
 
-            # get API call
-            request_url = request_config["format"].replace("$api", self.api["base"])
-            request_url = request_url.replace("$record_id", record_id)
-            request_url = self._set_secrets(request_url, secrets)
-            return request_url
-        else:
-            if type(pid) == HDL:
-                return self.hdl["format"].replace("$hdl", pid.get_resolvable())
-            elif type(pid) == DOI:
-                return self.pid["format"].replace("$doi", pid.get_resolvable())
-            elif type(pid) == URL:
-                return self.url["format"].replace("$url", pid.get_resolvable())
+        :param pid: PID, class instance of PID protocol
+        :return: bool, True if request config of the PID type has "format": "redirect"
+        """
+        if pid is None:
+            return False
+        plan: Optional[RequestPlan] = self.get_request_plan(pid)
+        return plan is not None and plan.template is None
 
     def get_host_netloc(self) -> str:
         """
@@ -117,26 +282,24 @@ class RegRepo(object):
         """
         return self.host_netloc
 
+    def get_hostname(self) -> str:
+        """
+        Return hostname of repository's host netloc, which may be configured with or without scheme
+
+        :return: str, hostname, e.g. "lindat.mff.cuni.cz"
+        """
+        host_netloc: str = self.host_netloc if "//" in self.host_netloc else f"//{self.host_netloc}"
+        return urlsplit(host_netloc).hostname or ""
+
     def get_headers(self, pid: PID) -> dict:
         """
         Return dict with repo specific headers
-        :return: dict, headers for http request to the repository
+        :return: dict, headers for http request to the repository, a copy the caller may modify
         """
-        if type(pid) == HDL:
-            if "headers" in self.hdl.keys():
-                return self.hdl["headers"]
-        elif type(pid) == DOI:
-            if "headers" in self.doi.keys():
-                return self.doi["headers"]
-        elif type(pid) == URL:
-            if "headers" in self.url.keys():
-                return self.url["headers"]
-        if self.parser['type'] == "cmdi":
-            return {"Accept": "application/x-cmdi+xml"}
-        elif "headers" in self.api.keys():
-            return self.api["headers"]
-        else:
-            return {}
+        plan: Optional[RequestPlan] = self.get_request_plan(pid)
+        if plan is not None:
+            return dict(plan.headers)
+        return self._default_headers()
 
     def get_name(self) -> str:
         """
@@ -164,20 +327,38 @@ class RegRepo(object):
         """
         return self.parser['type']
 
-    def get_parser(self, parser_type: str = None, parser_config: dict = None) -> Union[JSONParser, XMLParser, SignpostParser, None]:
+    def get_parser(self, parser_type: str = None, parser_config: dict = None) -> Union["JSONParser", "XMLParser", "SignpostParser", None]:
         """
-        Method wrapping parser construction
+        Method wrapping parser construction. Parsers of the repository config are built once, on first use, and
+        shared by all threads afterwards (parsers keep no state between calls)
 
         :param parser_type: str, Repository response format (json, cmdi) dependent Parser type
-        :param parser_config: dict, Parser configuration dictionary
+        :param parser_config: dict, Parser configuration dictionary, a parser of explicit configuration is built on
+            every call
         :return: Union[JSONParser, XMLParser], repo specific parser type object
         """
         if parser_type is None:
             parser_type = self.get_parser_type()
 
-        if parser_config is None:
-            parser_config = self.get_parser_config()
-
+        if parser_config is not None:
+            _count_parser(constructed=True)
+            return self._build_parser(parser_type, parser_config)
+
+        parser: Optional[Parser] = self._parsers.get(parser_type)
+        if parser is None:
+            with self._parsers_lock:
+                parser = self._parsers.get(parser_type)
+                if parser is None:
+                    parser = self._parsers[parser_type] = self._build_parser(parser_type, self.get_parser_config())
+                    _count_parser(constructed=True)
+                    return parser
+        _count_parser(constructed=False)
+        return parser
+
+    @staticmethod
+    def _build_parser(parser_type: str, parser_config: dict) -> Optional["Parser"]:
+        # parsers pull in lxml and jsonpath_rw, imported on the first parser built rather than on "import doglib"
+        from .parsers import CMDIParser, HTMLParser, JSONParser, SignpostParser, XMLParser
         if parser_type == "cmdi":
             return CMDIParser(parser_config)
         elif parser_type == "html":
@@ -234,12 +415,6 @@ class RegRepo(object):
                 return pid.get_repo_id() in self.doi["id"]
         return False
 
-    def _set_secrets(self, pid: str, secrets: dict):
-        if secrets is not None:
-            for k, v in secrets.items():
-                pid = pid.replace(f"${k}", v)
-            return pid
-
     def __str__(self):
         return f"Name: {self.name}\n" \
                f"Host name: {self.host_name}\n" \
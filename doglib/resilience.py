@@ -0,0 +1,172 @@
+from dataclasses import dataclass
+import pycurl
+import random
+import threading
+import time
+from typing import Dict, FrozenSet, List, Optional
+
+
+# curl errors of connections dropped by the server, e.g. connection reset by peer
+TRANSIENT_CURL_ERRORS: FrozenSet[int] = frozenset({pycurl.E_GOT_NOTHING, pycurl.E_SEND_ERROR, pycurl.E_RECV_ERROR})
+TRANSIENT_STATUS_CODES: FrozenSet[int] = frozenset({429, 502, 503, 504})
+
+
+class RetryPolicy:
+    """
+    Bounded retries of transient request failures with full-jitter exponential backoff: the n-th retry waits a
+    random time between 0 and min(max_backoff, backoff * 2 ** n) seconds
+    """
+    def __init__(self, max_attempts: int = 3, backoff: float = 0.5, max_backoff: float = 10.0,
+                 status_codes: FrozenSet[int] = TRANSIENT_STATUS_CODES,
+                 curl_errors: FrozenSet[int] = TRANSIENT_CURL_ERRORS):
+        """
+        :param max_attempts: int, total number of attempts including the first one, 1 disables retries
+        :param backoff: float, base delay in seconds
+        :param max_backoff: float, cap of a single delay in seconds
+        :param status_codes: FrozenSet[int], response codes worth retrying
+        :param curl_errors: FrozenSet[int], pycurl error numbers worth retrying
+        """
+        self.max_attempts: int = max_attempts
+        self.backoff: float = backoff
+        self.max_backoff: float = max_backoff
+        self.status_codes: FrozenSet[int] = status_codes
+        self.curl_errors: FrozenSet[int] = curl_errors
+
+    def is_transient(self, status: int = 0, curl_errno: int = 0) -> bool:
+        """
+        :param status: int, HTTP response code of the failed request, 0 if no response
+        :param curl_errno: int, pycurl error number of the failed request, 0 if none
+        :return: bool, whether the failure is worth retrying
+        """
+        return status in self.status_codes or curl_errno in self.curl_errors
+
+    def should_retry(self, attempt: int, status: int = 0, curl_errno: int = 0) -> bool:
+        """
+        :param attempt: int, number of attempts made so far
+        """
+        return attempt < self.max_attempts and self.is_transient(status, curl_errno)
+
+    def delay(self, attempt: int) -> float:
+        """
+        :param attempt: int, number of attempts made so far
+        :return: float, seconds to wait before the next attempt
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+
+CLOSED: str = "closed"
+OPEN: str = "open"
+HALF_OPEN: str = "half_open"
+
+
+@dataclass
+class BreakerState:
+    """
+    Snapshot of a CircuitBreaker
+    """
+    state: str
+    failures: int
+    opened_at: Optional[float] = None
+    retry_at: Optional[float] = None
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of a single repository. After failure_threshold consecutive transient failures the circuit
+    opens and requests fail fast for recovery_timeout seconds, then it half-opens and lets a single probe request
+    through: success closes the circuit, failure opens it again
+    """
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        """
+        :param failure_threshold: int, consecutive failures opening the circuit
+        :param recovery_timeout: float, seconds the circuit stays open before a probe is allowed
+        """
+        self.failure_threshold: int = failure_threshold
+        self.recovery_timeout: float = recovery_timeout
+        self._lock: threading.Lock = threading.Lock()
+        self._failures: int = 0
+        self._opened_at: Optional[float] = None
+        self._probing: bool = False
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if now - self._opened_at >= self.recovery_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.time())
+
+    def allow(self) -> bool:
+        """
+        :return: bool, whether a request may be sent, in half-open state only the first caller is allowed to probe
+        """
+        with self._lock:
+            state: str = self._state(time.time())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.time()
+            self._probing = False
+
+    def release(self) -> None:
+        """
+        End a half-open probe whose outcome is unknown (e.g. cancelled request) without changing the state
+        """
+        with self._lock:
+            self._probing = False
+
+    def reset(self) -> None:
+        self.record_success()
+
+    def snapshot(self) -> BreakerState:
+        with self._lock:
+            state: str = self._state(time.time())
+            retry_at: Optional[float] = None
+            if self._opened_at is not None:
+                retry_at = self._opened_at + self.recovery_timeout
+            return BreakerState(state=state, failures=self._failures, opened_at=self._opened_at, retry_at=retry_at)
+
+
+class BreakerRegistry:
+    """
+    Circuit breakers keyed by repository id, created on first use
+    """
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        """
+        :param failure_threshold: int, see CircuitBreaker
+        :param recovery_timeout: float, see CircuitBreaker
+        """
+        self.failure_threshold: int = failure_threshold
+        self.recovery_timeout: float = recovery_timeout
+        self._lock: threading.Lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, repo_id: str) -> CircuitBreaker:
+        with self._lock:
+            breaker: Optional[CircuitBreaker] = self._breakers.get(repo_id)
+            if breaker is None:
+                breaker = self._breakers[repo_id] = CircuitBreaker(self.failure_threshold, self.recovery_timeout)
+            return breaker
+
+    def states(self) -> Dict[str, BreakerState]:
+        with self._lock:
+            breakers: List[tuple] = list(self._breakers.items())
+        return {repo_id: breaker.snapshot() for repo_id, breaker in breakers}
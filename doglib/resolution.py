@@ -0,0 +1,117 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import json
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from .httpcache import HTTPCache
+
+
+@dataclass
+class ResolutionStats:
+    """
+    Counters of ResolutionCache usage
+    """
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+
+class ResolutionCache:
+    """
+    Cache of redirect resolution results, mapping resolvable URL of a PID (e.g. https://hdl.handle.net/11234/1-2682)
+    and request headers to the effective URL its redirects land on. Entries expire after ttl seconds, the least
+    recently used entry is evicted once max_size entries are stored. If path is given the cache is loaded from it
+    and save() persists it there as JSON
+    """
+    def __init__(self, max_size: int = 4096, ttl: float = 24 * 60 * 60, path: Optional[str] = None):
+        """
+        :param max_size: int, maximum number of entries
+        :param ttl: float, seconds after which an entry expires
+        :param path: Optional[str], JSON file the cache is loaded from and saved to, in-memory only if None
+        """
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+        self.path: Optional[str] = path
+        self.stats: ResolutionStats = ResolutionStats()
+        self._lock: threading.Lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(url: str, headers: Optional[dict] = None) -> str:
+        return HTTPCache.key(url, headers)
+
+    def get(self, url: str, headers: Optional[dict] = None) -> Optional[str]:
+        """
+        :return: Optional[str], cached effective URL, None if not cached or expired
+        """
+        key: str = self.key(url, headers)
+        with self._lock:
+            entry: Optional[Tuple[str, float]] = self._entries.get(key)
+            if entry is None or time.time() - entry[1] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[0]
+
+    def set(self, url: str, headers: Optional[dict], effective_url: str) -> None:
+        key: str = self.key(url, headers)
+        with self._lock:
+            self._entries[key] = (effective_url, time.time())
+            self._entries.move_to_end(key)
+            self.stats.stores += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def save(self, path: Optional[str] = None) -> None:
+        """
+        Persist unexpired entries as JSON, least recently used first
+
+        :param path: Optional[str], target file, self.path if not provided
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError("No path to save ResolutionCache to")
+        now: float = time.time()
+        with self._lock:
+            entries: List[list] = [[key, effective_url, stored_at]
+                                   for key, (effective_url, stored_at) in self._entries.items()
+                                   if now - stored_at <= self.ttl]
+        tmp_path: str = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as cache_file:
+            json.dump(entries, cache_file)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> None:
+        """
+        Merge entries saved by save(), unreadable files are ignored
+        """
+        try:
+            with open(path, "r") as cache_file:
+                entries: List[list] = json.load(cache_file)
+        except (OSError, json.JSONDecodeError):
+            return
+        now: float = time.time()
+        with self._lock:
+            for key, effective_url, stored_at in entries:
+                if now - stored_at <= self.ttl:
+                    self._entries[key] = (effective_url, stored_at)
+                    self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
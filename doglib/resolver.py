@@ -0,0 +1,194 @@
+import json
+import pycurl
+from typing import Dict, Iterable, List, Optional, Union
+from urllib.parse import quote
+
+from . import curl
+from .pid import pid_factory, DOI, HDL, PID
+from .resolution import ResolutionCache
+
+
+HANDLE_API: str = "https://hdl.handle.net/api/handles/"
+# doi.org proxies the Handle REST API for DOIs
+DOI_API: str = "https://doi.org/api/handles/"
+API_HEADERS: dict = {"Accept": "application/json"}
+
+
+class PIDResolver:
+    """
+    Resolver of HDL and DOI targets via the Handle REST API: instead of following redirects of the proxy (and
+    downloading the landing page), the handle record is requested as a small JSON document and the target is read
+    from its URL value. PIDs without URL value in their record, or with unreachable API, fall back to header-only
+    redirect resolution with curl.resolve(). Targets read from handle records are kept in the resolution cache
+    shared with curl.resolve() under the key of the API request, so they never replace (or are replaced by) the
+    effective URL curl.resolve() caches for the resolvable PID after following all redirects.
+
+    API base URLs are configurable, e.g. for a local stand-in proxy
+    """
+    def __init__(self, handle_api: str = HANDLE_API, doi_api: str = DOI_API,
+                 cache: Optional[ResolutionCache] = None, max_in_flight: int = 100, max_per_host: int = 6):
+        """
+        :param handle_api: str, base URL of the Handle REST API, the handle is appended
+        :param doi_api: str, base URL of the Handle REST API of the DOI proxy
+        :param cache: Optional[ResolutionCache], resolution cache, curl.get_default_resolution_cache() if not
+            provided
+        :param max_in_flight: int, global cap on concurrent API requests of resolve_many()
+        :param max_per_host: int, cap on concurrent API requests to a single proxy of resolve_many()
+        """
+        self.handle_api: str = handle_api
+        self.doi_api: str = doi_api
+        self.cache: Optional[ResolutionCache] = cache
+        self.max_in_flight: int = max_in_flight
+        self.max_per_host: int = max_per_host
+
+    def _cache(self) -> Optional[ResolutionCache]:
+        return self.cache if self.cache is not None else curl.get_default_resolution_cache()
+
+    def api_url(self, pid: PID) -> Optional[str]:
+        """
+        :param pid: PID, class instance of PID protocol
+        :return: Optional[str], URL of the handle record of HDL or DOI, None for other PIDs
+        """
+        if type(pid) == HDL:
+            return f"{self.handle_api}{quote(f'{pid.get_repo_id()}/{pid.get_record_id()}')}?type=URL"
+        if type(pid) == DOI:
+            return f"{self.doi_api}{quote(str(pid)[len('doi:'):])}?type=URL"
+        return None
+
+    @staticmethod
+    def parse_target(response: str) -> Optional[str]:
+        """
+        Read the target from Handle REST API response, e.g.
+        {"responseCode": 1, "handle": "11234/1-2682", "values": [{"index": 1, "type": "URL",
+        "data": {"format": "string", "value": "https://lindat.mff.cuni.cz/repository/xmlui/handle/11234/1-2682"}}]}
+
+        :param response: str, JSON handle record
+        :return: Optional[str], value of the URL entry with the lowest index, None if there is none
+        """
+        try:
+            record: dict = json.loads(response)
+        except ValueError:
+            return None
+        if not isinstance(record, dict) or record.get("responseCode") != 1:
+            return None
+        url_values: List[dict] = [value for value in record.get("values", [])
+                                  if isinstance(value, dict) and value.get("type") == "URL"]
+        for value in sorted(url_values, key=lambda url_value: url_value.get("index", 0)):
+            data = value.get("data")
+            target = data.get("value") if isinstance(data, dict) else data
+            if isinstance(target, str) and target:
+                return target
+        return None
+
+    def _cached(self, api_url: str) -> Optional[str]:
+        cache: Optional[ResolutionCache] = self._cache()
+        return cache.get(api_url, API_HEADERS) if cache is not None else None
+
+    def _store(self, api_url: str, target: str) -> str:
+        cache: Optional[ResolutionCache] = self._cache()
+        if cache is not None:
+            cache.set(api_url, API_HEADERS, target)
+        return target
+
+    def resolve(self, pid_string: Union[str, PID], headers: dict = None) -> str:
+        """
+        Resolve PID to its target URL
+
+        :param pid_string: Union[str, PID], persistent identifier, URLs are resolved by following redirects
+        :param headers: dict, request headers of redirect resolution fallback
+        :return: str, target URL, raises curl.RequestError if the PID does not exist or does not resolve, falls back
+            to curl.resolve() if the API is unreachable or fails otherwise
+        """
+        pid: PID = pid_factory(pid_string)
+        api_url: Optional[str] = self.api_url(pid)
+        target: Optional[str] = self._cached(api_url) if api_url is not None else None
+        if target is not None:
+            return target
+        if api_url is not None:
+            try:
+                _, response, _ = curl.get(api_url, API_HEADERS)
+                target = self.parse_target(response)
+            except (curl.RequestError, pycurl.error) as error:
+                if isinstance(error, curl.RequestError) and error.status == 404:
+                    raise
+        if target is None:
+            return curl.resolve(pid.get_resolvable(), headers, cache=self.cache)
+        return self._store(api_url, target)
+
+    async def resolve_async(self, pid_string: Union[str, PID], transport: curl.AsyncTransport,
+                            headers: dict = None) -> str:
+        """
+        Awaitable resolve() on AsyncTransport
+        """
+        pid: PID = pid_factory(pid_string)
+        api_url: Optional[str] = self.api_url(pid)
+        target: Optional[str] = self._cached(api_url) if api_url is not None else None
+        if target is not None:
+            return target
+        if api_url is not None:
+            try:
+                _, response, _ = await transport.get(api_url, API_HEADERS)
+                target = self.parse_target(response)
+            except (curl.RequestError, pycurl.error) as error:
+                if isinstance(error, curl.RequestError) and error.status == 404:
+                    raise
+        if target is None:
+            return await transport.resolve(pid.get_resolvable(), headers, cache=self.cache)
+        return self._store(api_url, target)
+
+    def resolve_many(self, pid_strings: Iterable[Union[str, PID]], headers: dict = None) -> Dict[str, str]:
+        """
+        Resolve many PIDs with concurrent API requests, see resolve()
+
+        :param pid_strings: Iterable[Union[str, PID]], persistent identifiers
+        :param headers: dict, request headers of redirect resolution fallback
+        :return: Dict[str, str], target URLs keyed by the PID strings as passed, PIDs that do not resolve are omitted
+        """
+        targets: Dict[str, str] = {}
+        pending: Dict[str, PID] = {}
+        requests: Dict[str, tuple] = {}
+        for pid_string in pid_strings:
+            pid: Optional[PID] = pid_factory(pid_string)
+            if not pid:
+                continue
+            api_url: Optional[str] = self.api_url(pid)
+            target: Optional[str] = self._cached(api_url) if api_url is not None else None
+            if target is not None:
+                targets[str(pid_string)] = target
+                continue
+            pending[str(pid_string)] = pid
+            if api_url is not None:
+                requests[str(pid_string)] = (api_url, API_HEADERS)
+
+        results: Dict[str, curl.MultiResult] = curl.multi_get(requests, max_in_flight=self.max_in_flight,
+                                                              max_per_host=self.max_per_host) if requests else {}
+        for key, pid in pending.items():
+            result: Optional[curl.MultiResult] = results.get(key)
+            if result is not None and result.status == 404:
+                continue
+            target = self.parse_target(result.body) if result is not None and result.ok else None
+            if target is not None:
+                targets[key] = self._store(requests[key][0], target)
+                continue
+            try:
+                targets[key] = curl.resolve(pid.get_resolvable(), headers, cache=self.cache)
+            except (curl.RequestError, pycurl.error):
+                continue
+        return targets
+
+
+_default_resolver: PIDResolver = PIDResolver()
+
+
+def set_default_resolver(resolver: PIDResolver) -> None:
+    """
+    Set resolver of HDL and DOI targets used by RegRepo and DOG, initially PIDResolver() of the public proxies
+
+    :param resolver: PIDResolver, e.g. PIDResolver(handle_api="http://127.0.0.1:8000/api/handles/")
+    """
+    global _default_resolver
+    _default_resolver = resolver
+
+
+def get_default_resolver() -> PIDResolver:
+    return _default_resolver
@@ -0,0 +1,60 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+class SignpostingCache:
+    """
+    Learned FAIR signposting support of registered repositories. DOG records for every RegRepo whether its HEAD
+    response carried a usable Link header, repositories learned not to signpost skip the HEAD request until the
+    record expires. State can be exported and loaded, so worker processes start warm
+    """
+    def __init__(self, ttl: float = 24 * 60 * 60, state: Optional[dict] = None):
+        """
+        :param ttl: float, seconds after which learned support is forgotten and probed again
+        :param state: Optional[dict], state previously returned by export()
+        """
+        self.ttl: float = ttl
+        self._lock: threading.Lock = threading.Lock()
+        self._supported: Dict[str, Tuple[bool, float]] = {}
+        if state:
+            self.load(state)
+
+    def get(self, repo_id: str) -> Optional[bool]:
+        """
+        :return: Optional[bool], learned signposting support of the repository, None if unknown or expired
+        """
+        with self._lock:
+            record: Optional[Tuple[bool, float]] = self._supported.get(repo_id)
+        if record is None:
+            return None
+        supported, checked_at = record
+        if time.time() - checked_at > self.ttl:
+            return None
+        return supported
+
+    def set(self, repo_id: str, supported: bool) -> None:
+        with self._lock:
+            self._supported[repo_id] = (supported, time.time())
+
+    def export(self) -> dict:
+        """
+        :return: dict, JSON serialisable state {repo_id: {"supported": bool, "checked_at": float}}
+        """
+        with self._lock:
+            return {repo_id: {"supported": supported, "checked_at": checked_at}
+                    for repo_id, (supported, checked_at) in self._supported.items()}
+
+    def load(self, state: dict) -> None:
+        """
+        Merge state exported by export(), records newer than the loaded ones are kept
+        """
+        with self._lock:
+            for repo_id, record in state.items():
+                current: Optional[Tuple[bool, float]] = self._supported.get(repo_id)
+                if current is None or current[1] < record["checked_at"]:
+                    self._supported[repo_id] = (bool(record["supported"]), float(record["checked_at"]))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._supported.clear()
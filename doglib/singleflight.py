@@ -0,0 +1,158 @@
+import asyncio
+from dataclasses import dataclass
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from .deadline import current_deadline, Deadline, DeadlineExceeded
+
+
+@dataclass
+class FlightStats:
+    """
+    Counters of SingleFlight/AsyncSingleFlight usage
+    """
+    calls: int = 0
+    shared: int = 0
+
+
+class _Call:
+    """
+    Call in flight, waiters block on done until the leader stores result or error
+    """
+    def __init__(self):
+        self.done: threading.Event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    In-flight call coalescing for threads: while a call with a key is running, concurrent calls with the same key
+    wait for it and share its result or exception instead of running again. Nothing is cached once the call
+    completes.
+
+    A waiter whose leader ran out of its own deadline (DeadlineExceeded) runs the call itself, its budget may be
+    larger. A waiter waits no longer than its own deadline
+    """
+    def __init__(self, share: Optional[Callable[[Any], Any]] = None):
+        """
+        :param share: Optional[Callable[[Any], Any]], applied to the result handed to every caller (the leader
+            included, so no caller sees another's mutations), e.g. copy.deepcopy for mutable results, results are
+            shared as they are if None
+        """
+        self.share: Optional[Callable[[Any], Any]] = share
+        self.stats: FlightStats = FlightStats()
+        self._lock: threading.Lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        Run func, or wait for the call with the same key already in flight
+
+        :param key: Hashable, key of equivalent calls
+        :param func: Callable[[], Any], the call
+        :return: Any, result of func, raises its exception
+        """
+        with self._lock:
+            self.stats.calls += 1
+            call: Optional[_Call] = self._calls.get(key)
+            leader: bool = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.stats.shared += 1
+        if leader:
+            self._lead(key, call, func)
+        else:
+            self._wait(call)
+        if isinstance(call.error, DeadlineExceeded) and not leader:
+            return func()
+        if call.error is not None:
+            raise call.error
+        return self.share(call.result) if self.share is not None else call.result
+
+    def _lead(self, key: Hashable, call: _Call, func: Callable[[], Any]) -> None:
+        try:
+            call.result = func()
+        except BaseException as error:
+            call.error = error
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    @staticmethod
+    def _wait(call: _Call) -> None:
+        call_deadline: Optional[Deadline] = current_deadline()
+        if not call.done.wait(None if call_deadline is None else max(call_deadline.remaining(), 0)):
+            raise call_deadline.exceeded()
+
+
+class AsyncSingleFlight:
+    """
+    In-flight call coalescing for asyncio, see SingleFlight. The call runs as a task shared by all callers with the
+    same key; a cancelled caller leaves the task to the others, the task is cancelled with its last caller
+    """
+    def __init__(self, share: Optional[Callable[[Any], Any]] = None):
+        """
+        :param share: Optional[Callable[[Any], Any]], see SingleFlight
+        """
+        self.share: Optional[Callable[[Any], Any]] = share
+        self.stats: FlightStats = FlightStats()
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable]) -> Any:
+        """
+        Await factory(), or the call with the same key already in flight
+
+        :param key: Hashable, key of equivalent calls
+        :param factory: Callable[[], Awaitable], creates the awaitable of the call
+        :return: Any, result of the call, raises its exception
+        """
+        self.stats.calls += 1
+        task: Optional[asyncio.Task] = self._tasks.get(key)
+        leader: bool = task is None or task.get_loop() is not asyncio.get_running_loop()
+        if leader:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done_task: self._forget(key, done_task))
+        else:
+            self.stats.shared += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            result: Any = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._leave(task) == 0 and not task.done():
+                task.cancel()
+                await asyncio.wait([task])
+            raise
+        except DeadlineExceeded:
+            self._leave(task)
+            if leader:
+                raise
+            return await factory()
+        self._leave(task)
+        return self.share(result) if self.share is not None else result
+
+    def _leave(self, task: asyncio.Task) -> int:
+        waiters: int = self._waiters.get(task, 1) - 1
+        if waiters:
+            self._waiters[task] = waiters
+        else:
+            self._waiters.pop(task, None)
+        return waiters
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # retrieve the exception, so a task awaited by no-one does not log it as never retrieved
+            task.exception()
+
@@ -9,7 +9,7 @@ from doglib.repos import RegRepo
 class TestDOG(unittest.TestCase):
     def setUp(self) -> None:
         self.dog: DOG = DOG()
-        self.repos: list[RegRepo] = DOG.load_repos()
+        self.repos: tuple[RegRepo, ...] = self.dog.reg_repos
 
     def _find_failures(self, test_results, conditions: [Callable[[dict], bool]]) -> dict:
         """
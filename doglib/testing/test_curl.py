@@ -0,0 +1,788 @@
+import asyncio
+import gzip
+import json
+import pycurl
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+import unittest
+from unittest import mock
+
+from doglib import AsyncDOG, curl, DOG
+from doglib.deadline import deadline, DeadlineExceeded, phase
+from doglib.httpcache import HTTPCache
+from doglib.ratelimit import HostLimit, HostScheduler
+from doglib.resilience import CircuitBreaker, RetryPolicy, CLOSED, HALF_OPEN, OPEN
+from doglib.resolution import ResolutionCache
+from doglib.pid import pid_factory
+from doglib.repos import RegRepo
+from doglib.resolver import get_default_resolver, set_default_resolver, PIDResolver
+from doglib.singleflight import SingleFlight
+
+
+class _StaticHandler(BaseHTTPRequestHandler):
+    """
+    Minimal HTTP/1.1 handler serving a fixed body on every path, used instead of live repositories
+    """
+    protocol_version = "HTTP/1.1"
+    body: bytes = b'{"status": "ok"}'
+    # requests received per /flaky/<failures>/... path, the first <failures> of them get 503
+    flaky_requests: dict = {}
+    # requests received per /slow... path
+    slow_requests: dict = {}
+    xml_body: bytes = b"<Resources>" + b"<ResourceProxy><ResourceRef>hdl:1/1</ResourceRef></ResourceProxy>" * 100 + \
+        b"</Resources>"
+
+    def do_GET(self):
+        if self.path.startswith("/missing"):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path.startswith("/slow"):
+            self.slow_requests[self.path] = self.slow_requests.get(self.path, 0) + 1
+            time.sleep(1)
+        if self.path.startswith("/api/handles/"):
+            # Handle REST API stand-in, handles with suffix "missing" do not exist
+            handle: str = self.path[len("/api/handles/"):].split("?")[0]
+            if handle.endswith("/missing"):
+                self.send_response(404)
+                record: dict = {"responseCode": 100, "handle": handle}
+            else:
+                self.send_response(200)
+                record = {"responseCode": 1, "handle": handle, "values": [
+                    {"index": 100, "type": "HS_ADMIN", "data": {"format": "admin", "value": {}}},
+                    {"index": 1, "type": "URL", "data": {"format": "string", "value": f"http://repo.test/{handle}"}}]}
+            record_body: bytes = json.dumps(record).encode()
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(record_body)))
+            self.end_headers()
+            self.wfile.write(record_body)
+            return
+        if self.path.startswith("/redirect/"):
+            # /redirect/<path> redirects to /<path>
+            self.send_response(302)
+            self.send_header("Location", self.path[len("/redirect"):])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path.startswith("/flaky/"):
+            self.flaky_requests[self.path] = self.flaky_requests.get(self.path, 0) + 1
+            if self.flaky_requests[self.path] <= int(self.path.split("/")[2]):
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        if self.path.startswith("/throttled"):
+            self.send_response(429)
+            self.send_header("Retry-After", "2")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path.startswith("/xml"):
+            xml_body: bytes = self.xml_body
+            self.send_response(200)
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                xml_body = gzip.compress(xml_body)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(xml_body)))
+            self.end_headers()
+            self.wfile.write(xml_body)
+            return
+        if self.path.startswith("/etag"):
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.send_header("ETag", '"v1"')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Cache-Control", "no-cache" if self.path == "/etag" else "max-age=3600")
+            self.send_header("Content-Length", str(len(self.body)))
+            self.end_headers()
+            self.wfile.write(self.body)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestCurlLocal(unittest.TestCase):
+    handler = _StaticHandler
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.server: ThreadingHTTPServer = ThreadingHTTPServer(("127.0.0.1", 0), cls.handler)
+        cls.server_thread: threading.Thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.base_url: str = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+
+
+class TestCurlPool(TestCurlLocal):
+    def test_handles_and_connections_reused(self):
+        """
+        Test consecutive requests reuse a pooled handle and its keep-alive connection
+        """
+        pool: curl.CurlPool = curl.CurlPool()
+        for _ in range(3):
+            _, body, _ = curl.get(f"{self.base_url}/record", pool=pool)
+            self.assertEqual(body, _StaticHandler.body.decode())
+        curl.head(f"{self.base_url}/record", pool=pool)
+
+        self.assertEqual(pool.stats.handles_created, 1)
+        self.assertEqual(pool.stats.handles_reused, 3)
+        self.assertEqual(pool.stats.connections_created, 1)
+        self.assertEqual(pool.stats.connections_reused, 3)
+
+    def test_failed_transfers(self):
+        """
+        Test transfers failing without a response are not counted as reused connections
+        """
+        pool: curl.CurlPool = curl.CurlPool()
+        with self.assertRaises(pycurl.error):
+            curl.get("http://127.0.0.1:1/record", pool=pool, retry=curl.RetryPolicy(max_attempts=1))
+        self.assertEqual((pool.stats.connections_reused, pool.stats.transfers_failed), (0, 1))
+
+    def test_idle_eviction(self):
+        """
+        Test handles idle for longer than idle_timeout are closed instead of reused
+        """
+        pool: curl.CurlPool = curl.CurlPool(idle_timeout=0)
+        curl.get(f"{self.base_url}/record", pool=pool)
+        curl.get(f"{self.base_url}/record", pool=pool)
+        self.assertEqual(pool.stats.handles_created, 2)
+        self.assertEqual(pool.stats.handles_evicted, 1)
+
+    def test_iter_get(self):
+        """
+        Test streamed GET yields the whole body and raises on error response
+        """
+        self.assertEqual(b"".join(curl.iter_get(f"{self.base_url}/record")), _StaticHandler.body)
+        with self.assertRaises(curl.RequestError):
+            list(curl.iter_get(f"{self.base_url}/missing"))
+
+    def test_iter_get_setopt_error(self):
+        """
+        Test a request failing before its transfer starts raises its own error and frees handle and host slot
+        """
+        pool: curl.CurlPool = curl.CurlPool()
+        scheduler: mock.Mock = mock.Mock()
+        scheduler.acquire.return_value = True
+        with mock.patch.object(curl, "_setopt_get", side_effect=DeadlineExceeded(1, "fetch", {})):
+            with self.assertRaises(DeadlineExceeded):
+                list(curl.iter_get(f"{self.base_url}/record", pool=pool, scheduler=scheduler))
+        scheduler.release.assert_called_once_with("127.0.0.1")
+        curl.get(f"{self.base_url}/record", pool=pool)
+        self.assertEqual((pool.stats.handles_created, pool.stats.handles_reused), (1, 1))
+
+    def test_unpooled(self):
+        """
+        Test get() with pool=None still works with a one-off handle
+        """
+        _, body, _ = curl.get(f"{self.base_url}/record", pool=None)
+        self.assertEqual(body, _StaticHandler.body.decode())
+
+
+class TestCompression(TestCurlLocal):
+    def setUp(self) -> None:
+        curl.reset_transfer_stats()
+
+    def test_compressed_get(self):
+        """
+        Test compressed response is decoded and its wire size accounted separately
+        """
+        _, body, _ = curl.get(f"{self.base_url}/xml")
+        self.assertEqual(body, _StaticHandler.xml_body.decode())
+        self.assertEqual(b"".join(curl.iter_get(f"{self.base_url}/xml")), _StaticHandler.xml_body)
+        stats: curl.TransferStats = curl.get_transfer_stats()["127.0.0.1"]
+        self.assertEqual(stats.requests, 2)
+        self.assertEqual(stats.decoded_bytes, 2 * len(_StaticHandler.xml_body))
+        self.assertGreater(stats.saved_bytes, 0)
+
+    def test_uncompressed_get(self):
+        """
+        Test compressed=False does not advertise Accept-Encoding
+        """
+        _, body, _ = curl.get(f"{self.base_url}/xml", compressed=False)
+        self.assertEqual(body, _StaticHandler.xml_body.decode())
+        stats: curl.TransferStats = curl.get_transfer_stats()["127.0.0.1"]
+        self.assertEqual(stats.wire_bytes, stats.decoded_bytes)
+
+    def test_multi_get_sizes(self):
+        """
+        Test MultiResult reports wire and decoded body sizes
+        """
+        result: curl.MultiResult = curl.multi_get([f"{self.base_url}/xml"])[f"{self.base_url}/xml"]
+        self.assertEqual(result.decoded_bytes, len(_StaticHandler.xml_body))
+        self.assertLess(result.wire_bytes, result.decoded_bytes)
+
+
+class TestHostScheduler(TestCurlLocal):
+    def test_token_bucket(self):
+        """
+        Test burst is admitted at once and further requests are delayed by the rate, other hosts are not delayed
+        """
+        scheduler: HostScheduler = HostScheduler(limits={"slow.example": HostLimit(rate=10, burst=2)})
+        for _ in range(2):
+            self.assertEqual(scheduler.try_acquire("slow.example"), 0)
+            scheduler.release("slow.example")
+        self.assertGreater(scheduler.try_acquire("slow.example"), 0)
+        self.assertEqual(scheduler.try_acquire("fast.example"), 0)
+
+    def test_max_connections(self):
+        """
+        Test connection cap is freed on release
+        """
+        scheduler: HostScheduler = HostScheduler(default_limit=HostLimit(max_connections=1))
+        self.assertEqual(scheduler.try_acquire("example.org"), 0)
+        self.assertGreater(scheduler.try_acquire("example.org"), 0)
+        scheduler.release("example.org")
+        self.assertEqual(scheduler.try_acquire("example.org"), 0)
+
+    def test_retry_after(self):
+        """
+        Test 429 response with Retry-After blocks its host
+        """
+        scheduler: HostScheduler = HostScheduler()
+        with self.assertRaises(curl.RequestError):
+            curl.get(f"{self.base_url}/throttled", scheduler=scheduler, retry=RetryPolicy(max_attempts=1))
+        self.assertGreater(scheduler.delay("127.0.0.1"), 1)
+        self.assertEqual(scheduler.delay("localhost"), 0)
+
+    def test_multi_get_rate(self):
+        """
+        Test MultiTransport spaces requests to a rate limited host
+        """
+        scheduler: HostScheduler = HostScheduler(default_limit=HostLimit(rate=20, burst=1))
+        transport: curl.MultiTransport = curl.MultiTransport(scheduler=scheduler)
+        for idx in range(5):
+            transport.submit(idx, f"{self.base_url}/record/{idx}")
+        start: float = time.monotonic()
+        results: dict = dict(transport.perform())
+        transport.close()
+        self.assertTrue(all(result.ok for result in results.values()))
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+
+class TestRetry(TestCurlLocal):
+    retry: RetryPolicy = RetryPolicy(max_attempts=3, backoff=0.01)
+
+    def test_get_retried(self):
+        """
+        Test transient 503 responses are retried until success, but not beyond max_attempts
+        """
+        _, body, _ = curl.get(f"{self.base_url}/flaky/2/get", retry=self.retry)
+        self.assertEqual(body, _StaticHandler.body.decode())
+        with self.assertRaises(curl.RequestError) as error:
+            curl.get(f"{self.base_url}/flaky/3/get", retry=self.retry)
+        self.assertEqual(error.exception.status, 503)
+        self.assertEqual(_StaticHandler.flaky_requests["/flaky/3/get"], 3)
+
+    def test_not_transient(self):
+        """
+        Test 404 response is not retried
+        """
+        with self.assertRaises(curl.RequestError):
+            curl.get(f"{self.base_url}/missing", retry=self.retry)
+
+    def test_multi_get_retried(self):
+        """
+        Test MultiTransport requeues transient failures and yields only the final attempt
+        """
+        transport: curl.MultiTransport = curl.MultiTransport(retry=self.retry)
+        transport.submit("flaky", f"{self.base_url}/flaky/1/multi")
+        transport.submit("record", f"{self.base_url}/record")
+        results: dict = dict(transport.perform())
+        transport.close()
+        self.assertTrue(results["flaky"].ok)
+        self.assertTrue(results["record"].ok)
+
+    def test_async_get_retried(self):
+        """
+        Test AsyncTransport retries transient failures
+        """
+        async def run():
+            transport: curl.AsyncTransport = curl.AsyncTransport(retry=self.retry)
+            _, body, _ = await transport.get(f"{self.base_url}/flaky/2/async")
+            transport.close()
+            return body
+
+        self.assertEqual(asyncio.run(run()), _StaticHandler.body.decode())
+
+
+class TestDeadline(TestCurlLocal):
+    def test_deadline_exceeded(self):
+        """
+        Test request outliving the deadline is cut short and reported with its phase
+        """
+        start: float = time.monotonic()
+        with self.assertRaises(DeadlineExceeded) as error:
+            with deadline(0.3), phase("fetch"):
+                curl.get(f"{self.base_url}/slow")
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertEqual(error.exception.phase, "fetch")
+
+    def test_budget_shared(self):
+        """
+        Test requests share the budget and no request is sent once it is spent
+        """
+        with deadline(1.5):
+            with phase("redirect"):
+                curl.get(f"{self.base_url}/slow")
+            with self.assertRaises(DeadlineExceeded) as error:
+                with phase("fetch"):
+                    curl.get(f"{self.base_url}/slow")
+        self.assertEqual(error.exception.phase, "fetch")
+        self.assertGreaterEqual(error.exception.phases["redirect"], 1)
+
+    def test_async_deadline(self):
+        """
+        Test AsyncTransport requests honour the deadline of the calling task
+        """
+        async def run():
+            transport: curl.AsyncTransport = curl.AsyncTransport()
+            try:
+                with deadline(0.3):
+                    await transport.get(f"{self.base_url}/slow")
+            finally:
+                transport.close()
+
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(run())
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_open_and_recover(self):
+        """
+        Test breaker opens after threshold failures, half-opens for a single probe and closes on its success
+        """
+        breaker: CircuitBreaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.1)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+        time.sleep(0.1)
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_failed_probe(self):
+        """
+        Test failed half-open probe opens the circuit again
+        """
+        breaker: CircuitBreaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.1)
+        breaker.record_failure()
+        time.sleep(0.1)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.snapshot().state, OPEN)
+
+
+class TestMultiTransport(TestCurlLocal):
+    def test_multi_get(self):
+        """
+        Test concurrent GETs return results keyed by request and a failing request does not abort the batch
+        """
+        requests: dict = {idx: f"{self.base_url}/record/{idx}" for idx in range(20)}
+        requests["missing"] = f"{self.base_url}/missing"
+        requests["with_headers"] = (f"{self.base_url}/record", {"Accept": "application/json"})
+        results: dict = curl.multi_get(requests, max_in_flight=5, max_per_host=2)
+
+        self.assertEqual(set(results.keys()), set(requests.keys()))
+        self.assertIsInstance(results["missing"].error, curl.RequestError)
+        self.assertEqual(results["missing"].status, 404)
+        for key, result in results.items():
+            if key != "missing":
+                self.assertTrue(result.ok)
+                self.assertEqual(result.body, _StaticHandler.body.decode())
+                self.assertGreaterEqual(result.timing.total, result.timing.connect)
+
+    def test_multi_get_request_keys(self):
+        """
+        Test requests of the same url with different headers are performed and keyed separately
+        """
+        url: str = f"{self.base_url}/record"
+        requests: list = [(url, {"Accept": "application/x-cmdi+xml"}), (url, {"Accept": "application/json"}),
+                          (url, {"Accept": "application/json"}), url]
+        results: dict = curl.multi_get(requests)
+        self.assertEqual(set(results.keys()), {(url, frozenset({("Accept", "application/x-cmdi+xml")})),
+                                               (url, frozenset({("Accept", "application/json")})), url})
+        self.assertTrue(all(result.ok for result in results.values()))
+
+    def test_multi_head(self):
+        """
+        Test concurrent HEADs return parsed header dicts keyed by url
+        """
+        urls: list = [f"{self.base_url}/record/{idx}" for idx in range(5)]
+        results: dict = curl.multi_head(urls)
+        self.assertEqual(set(results.keys()), set(urls))
+        self.assertTrue(all(result.headers["content-type"] == "application/json" for result in results.values()))
+
+    def test_header_only(self):
+        """
+        Test header-only requests follow redirects without downloading the body
+        """
+        transport: curl.MultiTransport = curl.MultiTransport()
+        transport.submit("xml", f"{self.base_url}/redirect/xml", header_only=True)
+        transport.submit("missing", f"{self.base_url}/redirect/missing", header_only=True)
+        results: dict = dict(transport.perform())
+        transport.close()
+        self.assertTrue(results["xml"].ok)
+        self.assertEqual((results["xml"].effective_url, results["xml"].body), (f"{self.base_url}/xml", ""))
+        self.assertEqual(results["missing"].status, 404)
+
+
+class TestAsyncTransport(TestCurlLocal):
+    def test_concurrent_get(self):
+        """
+        Test awaiting many GETs on a single event loop
+        """
+        async def run():
+            transport: curl.AsyncTransport = curl.AsyncTransport()
+            responses = await asyncio.gather(*[transport.get(f"{self.base_url}/record/{idx}") for idx in range(10)])
+            _, headers = await transport.head(f"{self.base_url}/record")
+            transport.close()
+            return responses, headers
+
+        responses, headers = asyncio.run(run())
+        self.assertTrue(all(body == _StaticHandler.body.decode() for _, body, _ in responses))
+        self.assertEqual(headers["content-type"], "application/json")
+
+    def test_cancellation(self):
+        """
+        Test timed out request is removed from the transport
+        """
+        async def run():
+            transport: curl.AsyncTransport = curl.AsyncTransport()
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(transport.get(f"{self.base_url}/slow"), 0.1)
+            self.assertFalse(transport._futures)
+            _, body, _ = await transport.get(f"{self.base_url}/record")
+            transport.close()
+            return body
+
+        self.assertEqual(asyncio.run(run()), _StaticHandler.body.decode())
+
+
+class TestResolution(TestCurlLocal):
+    def setUp(self) -> None:
+        self.cache: ResolutionCache = ResolutionCache()
+        curl.reset_transfer_stats()
+
+    def test_resolve(self):
+        """
+        Test redirects are resolved without downloading the landing page body
+        """
+        effective_url: str = curl.resolve(f"{self.base_url}/redirect/xml", cache=self.cache)
+        self.assertEqual(effective_url, f"{self.base_url}/xml")
+        stats: curl.TransferStats = curl.get_transfer_stats()["127.0.0.1"]
+        self.assertEqual(stats.decoded_bytes, 0)
+        self.assertLess(stats.wire_bytes, len(gzip.compress(_StaticHandler.xml_body)))
+        with self.assertRaises(curl.RequestError):
+            curl.resolve(f"{self.base_url}/redirect/missing", cache=self.cache)
+
+    def test_cache_hit(self):
+        """
+        Test repeated resolution is served from the cache without request
+        """
+        url: str = f"{self.base_url}/redirect/record"
+        self.assertEqual(curl.resolve(url, cache=self.cache), curl.resolve(url, cache=self.cache))
+        self.assertEqual((self.cache.stats.misses, self.cache.stats.hits), (1, 1))
+        self.assertEqual(curl.get_transfer_stats()["127.0.0.1"].requests, 1)
+
+    def test_async_resolve(self):
+        """
+        Test awaitable resolution shares the cache
+        """
+        async def run():
+            transport: curl.AsyncTransport = curl.AsyncTransport()
+            effective_url: str = await transport.resolve(f"{self.base_url}/redirect/record", cache=self.cache)
+            transport.close()
+            return effective_url
+
+        self.assertEqual(asyncio.run(run()), f"{self.base_url}/record")
+        self.assertEqual(self.cache.get(f"{self.base_url}/redirect/record"), f"{self.base_url}/record")
+
+    def test_lru_and_ttl(self):
+        """
+        Test least recently used entry is evicted and expired entries are not served
+        """
+        cache: ResolutionCache = ResolutionCache(max_size=2)
+        cache.set("a", None, "A")
+        cache.set("b", None, "B")
+        cache.get("a")
+        cache.set("c", None, "C")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), ("A", "C"))
+        self.assertEqual(cache.stats.evictions, 1)
+
+        expired_cache: ResolutionCache = ResolutionCache(ttl=0)
+        expired_cache.set("a", None, "A")
+        time.sleep(0.01)
+        self.assertIsNone(expired_cache.get("a"))
+
+    def test_persistence(self):
+        """
+        Test saved cache is loaded by a new instance
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            path: str = f"{cache_dir}/resolutions.json"
+            cache: ResolutionCache = ResolutionCache(path=path)
+            cache.set("a", {"Accept": "application/json"}, "A")
+            cache.save()
+            loaded_cache: ResolutionCache = ResolutionCache(path=path)
+            self.assertEqual(loaded_cache.get("a", {"Accept": "application/json"}), "A")
+            self.assertIsNone(loaded_cache.get("a"))
+
+
+class TestPIDResolver(TestCurlLocal):
+    def setUp(self) -> None:
+        self.resolver: PIDResolver = PIDResolver(handle_api=f"{self.base_url}/api/handles/",
+                                                 doi_api=f"{self.base_url}/api/handles/", cache=ResolutionCache())
+
+    def test_resolve(self):
+        """
+        Test HDL and DOI targets are read from the handle record, repeated resolution is cached
+        """
+        self.assertEqual(self.resolver.resolve("hdl:11234/1-2682"), "http://repo.test/11234/1-2682")
+        self.assertEqual(self.resolver.resolve("https://doi.org/10.1234/abc.5"), "http://repo.test/10.1234/abc.5")
+        self.resolver.resolve("https://hdl.handle.net/11234/1-2682")
+        self.assertEqual((self.resolver.cache.stats.misses, self.resolver.cache.stats.hits), (2, 1))
+        with self.assertRaises(curl.RequestError):
+            self.resolver.resolve("hdl:11234/missing")
+
+    def test_resolve_fallback(self):
+        """
+        Test unreachable API falls back to redirect resolution, handle record targets do not share cache keys with
+        redirect resolution
+        """
+        self.resolver.resolve("hdl:11234/1-2682")
+        self.assertIsNone(self.resolver.cache.get("https://hdl.handle.net/11234/1-2682"))
+        with mock.patch.object(curl, "get", side_effect=pycurl.error(7, "Failed to connect")), \
+                mock.patch.object(curl, "resolve", return_value="http://fallback.test/1") as resolve:
+            self.assertEqual(self.resolver.resolve("hdl:11234/1"), "http://fallback.test/1")
+        resolve.assert_called_once()
+
+    def test_resolve_many(self):
+        """
+        Test concurrent resolution omits PIDs that do not exist
+        """
+        targets: dict = self.resolver.resolve_many([f"hdl:11234/{idx}" for idx in range(10)] + ["hdl:11234/missing"])
+        self.assertEqual(targets, {f"hdl:11234/{idx}": f"http://repo.test/11234/{idx}" for idx in range(10)})
+
+    def test_resolve_async(self):
+        """
+        Test awaitable resolution on AsyncTransport
+        """
+        async def run():
+            transport: curl.AsyncTransport = curl.AsyncTransport()
+            target: str = await self.resolver.resolve_async("hdl:11234/1-2682", transport)
+            transport.close()
+            return target
+
+        self.assertEqual(asyncio.run(run()), "http://repo.test/11234/1-2682")
+
+    def test_parse_target(self):
+        """
+        Test records without URL value yield no target
+        """
+        self.assertIsNone(PIDResolver.parse_target('{"responseCode": 1, "values": []}'))
+        self.assertIsNone(PIDResolver.parse_target("<html></html>"))
+
+
+class TestSingleFlight(TestCurlLocal):
+    def test_single_flight(self):
+        """
+        Test concurrent calls with the same key share a single run, its result and its exception
+        """
+        flights: SingleFlight = SingleFlight(share=list)
+        runs: list = []
+
+        def call(result: list) -> list:
+            runs.append(1)
+            time.sleep(0.2)
+            return result
+
+        results: list = []
+        threads: list = [threading.Thread(target=lambda: results.append(flights.do("key", lambda: call([1]))))
+                         for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((len(runs), results), (1, [[1]] * 5))
+        self.assertEqual(len({id(result) for result in results}), 5)
+        self.assertEqual(flights.stats.shared, 4)
+        self.assertEqual(len(flights), 0)
+
+        with self.assertRaises(ZeroDivisionError):
+            flights.do("key", lambda: 1 / 0)
+
+    def test_coalesced_get(self):
+        """
+        Test concurrent identical GETs send a single request
+        """
+        url: str = f"{self.base_url}/slow/coalesced"
+        results: list = []
+        threads: list = [threading.Thread(target=lambda: results.append(curl.get(url))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 5)
+        self.assertEqual(_StaticHandler.slow_requests[url[len(self.base_url):]], 1)
+
+    def test_coalesced_async_get(self):
+        """
+        Test concurrent identical awaitable GETs send a single request, distinct headers are not coalesced
+        """
+        url: str = f"{self.base_url}/slow/coalesced_async"
+
+        async def run():
+            transport: curl.AsyncTransport = curl.AsyncTransport()
+            responses = await asyncio.gather(*[transport.get(url) for _ in range(5)],
+                                             transport.get(url, {"Accept": "application/json"}))
+            transport.close()
+            return responses
+
+        self.assertEqual(len(asyncio.run(run())), 6)
+        self.assertEqual(_StaticHandler.slow_requests[url[len(self.base_url):]], 2)
+
+
+class TestConflictResolution(TestCurlLocal):
+    def setUp(self) -> None:
+        resolver: PIDResolver = get_default_resolver()
+        self.addCleanup(set_default_resolver, resolver)
+        # handle records point to neither candidate, conflicts are resolved by probing
+        set_default_resolver(PIDResolver(handle_api=f"{self.base_url}/api/handles/",
+                                         doi_api=f"{self.base_url}/api/handles/", cache=ResolutionCache()))
+        self.dog: DOG = DOG()
+        self.fast_repo: RegRepo = RegRepo({"id": "FAST", "host_netloc": f"{self.base_url}/fast",
+                                           "hdl": {"id": "99999", "format": f"{self.base_url}/redirect/fast/record"},
+                                           "parser": {"type": "json"}})
+        self.slow_repo: RegRepo = RegRepo({"id": "SLOW", "host_netloc": f"{self.base_url}/slow",
+                                           "hdl": {"id": "99999", "format": f"{self.base_url}/redirect/slow/record"},
+                                           "parser": {"type": "json"}})
+
+    def test_probed_and_cached(self):
+        """
+        Test candidates are probed concurrently, the first match cancels the slow probe and is cached
+        """
+        pid = pid_factory("hdl:99999/1-2-3")
+        started_at: float = time.monotonic()
+        self.assertIs(self.dog._match_sniffed([self.slow_repo, self.fast_repo], pid), self.fast_repo)
+        self.assertLess(time.monotonic() - started_at, 1)
+        self.assertEqual(self.dog.conflicts.get(pid), "FAST")
+
+        state: dict = json.loads(json.dumps(self.dog.export_conflict_state()))
+        self.assertEqual(list(state.keys()), ["hdl:99999/1-2-3"])
+        dog: DOG = DOG(conflict_state=state)
+        self.assertIs(dog._match_cached([self.slow_repo, self.fast_repo], pid), self.fast_repo)
+        self.assertIsNone(DOG(conflict_ttl=0, conflict_state=state).conflicts.get(pid))
+
+    def test_async_probed(self):
+        """
+        Test awaitable conflict resolution cancels the slow probe and shares the cache
+        """
+        pid = pid_factory("hdl:99999/async")
+        async_dog: AsyncDOG = AsyncDOG(self.dog)
+
+        async def run():
+            return await async_dog._match_sniffed([self.slow_repo, self.fast_repo], pid)
+
+        started_at: float = time.monotonic()
+        self.assertIs(asyncio.run(run()), self.fast_repo)
+        self.assertLess(time.monotonic() - started_at, 1)
+        self.assertEqual(self.dog.conflicts.get(pid), "FAST")
+
+
+class TestHTTPCache(TestCurlLocal):
+    def setUp(self) -> None:
+        self.cache_dir: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.cache: HTTPCache = HTTPCache(self.cache_dir.name)
+
+    def tearDown(self) -> None:
+        self.cache_dir.cleanup()
+
+    def test_fresh_hit(self):
+        """
+        Test fresh response is served from the cache without request
+        """
+        url: str = f"{self.base_url}/etag/fresh"
+        first = curl.get(url, cache=self.cache)
+        second = curl.get(url, cache=self.cache)
+        self.assertEqual(first, second)
+        self.assertEqual((self.cache.stats.misses, self.cache.stats.hits), (1, 1))
+
+    def test_revalidation(self):
+        """
+        Test stale response with ETag is revalidated and 304 is served from the cache
+        """
+        url: str = f"{self.base_url}/etag"
+        _, first_body, _ = curl.get(url, cache=self.cache)
+        _, second_body, _ = curl.get(url, cache=self.cache)
+        self.assertEqual(first_body, second_body)
+        self.assertEqual(self.cache.stats.revalidations, 1)
+
+    def test_headers_in_key(self):
+        """
+        Test requests differing in headers are cached separately
+        """
+        url: str = f"{self.base_url}/etag/fresh"
+        curl.get(url, cache=self.cache)
+        curl.get(url, headers={"Accept": "application/x-cmdi+xml"}, cache=self.cache)
+        self.assertEqual(self.cache.stats.misses, 2)
+
+    def test_size_budget(self):
+        """
+        Test cache is kept under its size budget
+        """
+        cache: HTTPCache = HTTPCache(self.cache_dir.name, max_size=1)
+        curl.get(f"{self.base_url}/etag/fresh", cache=cache)
+        self.assertLessEqual(cache.size, 1)
+        self.assertEqual(cache.stats.evictions, 1)
+
+    def test_lru_eviction(self):
+        """
+        Test eviction drops expired entries first, then the least recently used one, without reading entry files,
+        and that a restarted cache recovers expiration and size of stored entries
+        """
+        fresh_headers: str = "HTTP/1.1 200 OK\r\nCache-Control: max-age=60\r\n\r\n"
+        self.cache.store("https://a.test", None, "https://a.test", "a" * 100, fresh_headers)
+        self.cache.store("https://b.test", None, "https://b.test", "b" * 100, fresh_headers)
+        self.cache.store("https://c.test", None, "https://c.test", "c" * 100,
+                         "HTTP/1.1 200 OK\r\nCache-Control: no-cache\r\nETag: \"c\"\r\n\r\n")
+        restarted: HTTPCache = HTTPCache(self.cache_dir.name, max_size=self.cache.size)
+        self.assertEqual(restarted.size, self.cache.size)
+        self.assertIsNotNone(restarted.lookup("https://a.test"))
+        with mock.patch("doglib.httpcache.json.load", side_effect=AssertionError("entry file read")):
+            restarted.store("https://d.test", None, "https://d.test", "d" * 100, fresh_headers)
+            self.assertIsNone(restarted.lookup("https://c.test"))
+            restarted.store("https://e.test", None, "https://e.test", "e" * 100, fresh_headers)
+        self.assertEqual(restarted.stats.evictions, 2)
+        self.assertIsNone(restarted.lookup("https://b.test"))
+        self.assertIsNotNone(restarted.lookup("https://a.test"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,28 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
 import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
 from typing import List
 import unittest
+from unittest import mock
 
 from doglib.testing import TestDOG
-from doglib import STATIC_TEST_FILES_DIR, REPO_CONFIG_DIR
-from doglib.pid import PID
+from doglib import AsyncDOG, BatchStats, curl, DOG, STATIC_TEST_FILES_DIR, REPO_CONFIG_DIR
+from doglib.conflicts import ConflictCache
+from doglib.curl import CircuitOpenError
+from doglib.deadline import deadline, DeadlineExceeded
+from doglib.parsers import CMDIParser, xpath_variables
+from doglib.registry import RegistryDiff, RegistryError, RegistrySnapshot
+from doglib.ratelimit import HostLimit, HostScheduler
+from doglib.pid import classify_many, intern_pid, pid_factory, PID
+from doglib.repoindex import RepoIndex
+from doglib.repos import get_parser_stats, reset_parser_stats, ParserStats, RegRepo, RepoConfigError
 
 
 class TestDOGStatic(TestDOG):
@@ -107,6 +125,494 @@ class TestFunctionalities(TestDOGStatic):
         incorrect_pid: List[bool] = [not self.dog.is_pid(incorrect_pid_string) for incorrect_pid_string in incorrect_pid_strings]
         self.assertTrue(all(accepted_pid + incorrect_pid))
 
+    def test_sniff_many(self):
+        """
+        Test sniff_many() keeps input order, deduplicates equivalent PIDs and reports batch statistics
+        """
+        pid_strings: List[str] = ["https://lindat.mff.cuni.cz/repository/xmlui/handle/11234/1-3698",
+                                  "https://lindat.mff.cuni.cz/repository/xmlui/handle/11234/1-3698/",
+                                  "abc",
+                                  "https://b2share.eudat.eu/records/5399170dc1b8415a90af3f52a6362227"]
+        stats: BatchStats = BatchStats()
+        results = list(self.dog.sniff_many(iter(pid_strings), ordered=True, max_workers=2, stats=stats))
+
+        self.assertEqual([pid_string for pid_string, _ in results], pid_strings)
+        self.assertEqual([result for _, result in results], [self.dog.sniff(pid_string) for pid_string in pid_strings])
+        self.assertEqual(stats.submitted, 4)
+        self.assertEqual(stats.duplicates, 1)
+        self.assertEqual(stats.succeeded, 4)
+
+    def test_many_timeout(self):
+        """
+        Test the timeout of bulk calls applies to every PID on its own, a slow PID does not fail the PIDs queued
+        behind it
+        """
+        def identify(pid_string: str, timeout: float) -> dict:
+            with deadline(timeout) as call_deadline:
+                time.sleep(0.15 if pid_string == "slow" else 0.05)
+                call_deadline.check()
+            return {"pid": pid_string}
+
+        stats: BatchStats = BatchStats()
+        with mock.patch.object(self.dog, "identify", identify):
+            results = list(self.dog.identify_many(["slow", "a", "b", "c"], ordered=True, max_workers=1,
+                                                  stats=stats, timeout=0.1))
+
+        self.assertIsInstance(results[0][1], DeadlineExceeded)
+        self.assertEqual([result for _, result in results[1:]], [{"pid": "a"}, {"pid": "b"}, {"pid": "c"}])
+        self.assertEqual(stats.failed, 1)
+        self.assertEqual(stats.succeeded, 3)
+
+    def test_async_sniff(self):
+        """
+        Test AsyncDOG.sniff() matches DOG.sniff() for PIDs not requiring identifier conflict resolution
+        """
+        async_dog: AsyncDOG = AsyncDOG(self.dog)
+        pid_strings: List[str] = ["https://lindat.mff.cuni.cz/repository/xmlui/handle/11234/1-3698", "abc"]
+
+        async def sniff_all():
+            return await asyncio.gather(*[async_dog.sniff(pid_string, timeout=5) for pid_string in pid_strings])
+
+        self.assertEqual(asyncio.run(sniff_all()), [self.dog.sniff(pid_string) for pid_string in pid_strings])
+
+    def test_signposting_learning(self):
+        """
+        Test repositories declared or learned not to signpost skip the signposting HEAD request, and learned state
+        survives export to another DOG instance
+        """
+        repo: RegRepo = self.repos_map["LINDAT"]
+        repo.signposting = False
+        self.assertEqual(self.dog._get_signposted(repo, "http://127.0.0.1:9/unreachable"), "")
+
+        repo.signposting = None
+        self.dog._record_signposting(repo, False)
+        self.assertFalse(self.dog._should_signpost(repo))
+        warm_dog: DOG = DOG(signposting_state=self.dog.export_signposting_state())
+        self.assertFalse(warm_dog._should_signpost(repo))
+        expired_dog: DOG = DOG(signposting_state=self.dog.export_signposting_state(), signposting_ttl=-1)
+        self.assertTrue(expired_dog._should_signpost(repo))
+
+    def test_circuit_breaker(self):
+        """
+        Test repository with open circuit breaker is reported degraded and fails fast without request
+        """
+        repo: RegRepo = self.repos_map["LINDAT"]
+        for _ in range(self.dog.breakers.failure_threshold):
+            self.dog.breakers.get(repo.id).record_failure()
+        self.assertEqual(self.dog.get_degraded_repositories(), [repo.id])
+        self.assertEqual(self.dog.get_breaker_states()[repo.id].state, "open")
+        with self.assertRaises(CircuitOpenError):
+            self.dog.fetch("https://lindat.mff.cuni.cz/repository/xmlui/handle/11234/1-2682")
+        self.dog.breakers.get(repo.id).reset()
+
+    def test_deadline(self):
+        """
+        Test spent budget fails the call with DeadlineExceeded naming the phase
+        """
+        with self.assertRaises(DeadlineExceeded) as error:
+            self.dog.fetch("https://lindat.mff.cuni.cz/repository/xmlui/handle/11234/1-2682", timeout=1e-9)
+        self.assertEqual(error.exception.phase, "sniff")
+        self.assertIsInstance(error.exception, TimeoutError)
+
+    def test_classify_many(self):
+        """
+        Test bulk classification detects the PID type of every test example and rejects non-PIDs
+        """
+        test_cases: List[tuple] = [(pid_type, test_pid) for repo in self.repos
+                                   for pid_type, test_pid in repo.get_test_examples().items() if test_pid]
+        pids: List[PID] = list(classify_many(test_pid for _, test_pid in test_cases + [("", "not a pid")]))
+        self.assertIsNone(pids.pop())
+        for (pid_type, test_pid), pid in zip(test_cases, pids):
+            self.assertEqual(type(pid).__name__.lower(), pid_type, test_pid)
+            self.assertEqual(str(pid), str(pid_factory(test_pid)))
+
+    def test_pid_value(self):
+        """
+        Test equivalent PID forms are equal, hashable and interned to a single immutable instance
+        """
+        pid_forms: List[str] = ["hdl:11234/1-3698", "http://hdl.handle.net/11234/1-3698",
+                                "https://hdl.handle.net/11234/1-3698@format=cmdi", "11234/1-3698"]
+        pids: List[PID] = [pid_factory(pid_form) for pid_form in pid_forms]
+        self.assertEqual(len(set(pids)), 1)
+        self.assertEqual(pid_factory("doi:10.1234/ABC"), pid_factory("https://doi.org/10.1234/abc"))
+        self.assertNotEqual(pids[0], pid_factory("hdl:11234/1-3699"))
+        with self.assertRaises(AttributeError):
+            pids[0].record_id = "1-3699"
+        self.assertFalse(hasattr(pids[0], "__dict__"))
+        interned: List[PID] = [intern_pid(pid_form) for pid_form in pid_forms]
+        self.assertTrue(all(pid is interned[0] for pid in interned))
+
+    def test_repo_index(self):
+        """
+        Test indexed sniffing matches the same repositories as a linear scan with RegRepo.match_pid()
+        """
+        pid_strings: List[str] = [test_pid for repo in self.repos for test_pid in repo.get_test_examples().values()
+                                  if test_pid]
+        pid_strings.extend(["https://example.com/?next=https://zenodo.org/records/1", "doi:10.528/1", "hdl:11372/1",
+                            "https://unregistered.example.com/records/1"])
+        for pid_string in pid_strings:
+            pid: PID = pid_factory(pid_string)
+            self.assertEqual(self.dog.get_repo_index().match(pid),
+                             [repo for repo in self.dog.reg_repos if repo.match_pid(pid)], pid_string)
+
+    def test_repo_index_current(self):
+        """
+        Test the registry cannot be edited in place, a replaced registry is indexed again
+        """
+        dog: DOG = DOG()
+        with self.assertRaises(TypeError):
+            dog.reg_repos[0] = dog.reg_repos[1]
+        pid: PID = pid_factory("hdl:11234/1-5263")
+        lindat: RegRepo = dog.get_repo_index().match(pid)[0]
+        dog.reg_repos = [repo for repo in dog.reg_repos if repo is not lindat]
+        self.assertNotIn(lindat, dog.get_repo_index().match(pid))
+        self.assertEqual(dog.get_repo_index().reg_repos, dog.reg_repos)
+
+    def test_seeded_conflicts(self):
+        """
+        Test identifier conflicts of test examples resolve without requests, other PIDs of their suffix patterns are
+        still probed
+        """
+        self.assertEqual(self.dog._sniff(pid_factory("http://hdl.handle.net/11022/1007-0000-0000-8DEE-6")).id, "IMS")
+        self.assertEqual(self.dog.export_conflict_state(), {})
+        for pid_string in ["hdl:11022/0000-0000-1234-5", "hdl:11022/1007-0000-0000-0000-1",
+                           "hdl:11858/00-246C-0000-0000-0000-1"]:
+            pid: PID = pid_factory(pid_string)
+            self.assertIsNone(self.dog.conflicts.get(pid), pid_string)
+            # no candidate is preferred without evidence, registry order is kept
+            self.assertEqual(self.dog.sniff(pid_string, offline=True),
+                             self.dog.sniff(pid_string, resolve_identifier_conflicts=False), pid_string)
+
+        # EKUT shares HDL prefix 11022 and the suffix pattern of the ASV test example
+        ekut_pid: PID = pid_factory("hdl:11022/0000-0000-1234-5")
+        with mock.patch.object(self.dog, "_match_resolved", return_value=None), \
+                mock.patch.object(self.dog, "_match_probed", return_value=self.repos_map["EKUT"]) as probed:
+            self.assertEqual(self.dog._sniff(ekut_pid).id, "EKUT")
+        probed.assert_called_once()
+        self.assertEqual(self.dog.conflicts.get(ekut_pid), "EKUT")
+
+    def test_conflict_patterns(self):
+        """
+        Test suffix patterns are learned from several agreeing probes only and forgotten once a probe disagrees
+        """
+        conflicts: ConflictCache = ConflictCache(pattern_votes=3)
+        conflicts.seed(pid_factory("hdl:11022/0000-0000-0000-1"), "ASV")
+        unseen: PID = pid_factory("hdl:11022/0000-0000-9999-9")
+        self.assertIsNone(conflicts.get(unseen))
+        for record in ["1111-1", "2222-2"]:
+            conflicts.set(pid_factory(f"hdl:11022/0000-0000-{record}"), "EKUT")
+        conflicts.set(pid_factory("hdl:11022/0000-0000-2222-2"), "EKUT")
+        self.assertIsNone(conflicts.get(unseen))
+        conflicts.set(pid_factory("hdl:11022/0000-0000-3333-3"), "EKUT")
+        self.assertEqual(conflicts.get(unseen), "EKUT")
+        self.assertEqual(conflicts.get(pid_factory("hdl:11022/0000-0000-0000-1")), "ASV")
+        self.assertIn("hdl:11022/0000-0000-*", conflicts.export())
+
+        conflicts.set(pid_factory("hdl:11022/0000-0000-4444-4"), "ASV")
+        self.assertIsNone(conflicts.get(unseen))
+        expired: ConflictCache = ConflictCache(ttl=-1, state=conflicts.export())
+        self.assertIsNone(expired.get(pid_factory("hdl:11022/0000-0000-3333-3")))
+
+    def test_offline_sniff(self):
+        """
+        Test offline sniffing ranks all candidates without any request in well under a millisecond per PID
+        """
+        pid_strings: List[str] = [test_pid for repo in self.repos for test_pid in repo.get_test_examples().values()
+                                  if test_pid]
+        with mock.patch("doglib.curl._acquire", side_effect=AssertionError("request sent")):
+            started_at: float = time.perf_counter()
+            results: list = [self.dog.sniff(pid_string, offline=True) for pid_string in pid_strings]
+            elapsed: float = time.perf_counter() - started_at
+            self.assertTrue(self.dog.is_host_registered("hdl:11022/9999-0000-0000-0000-1", offline=True))
+            self.assertFalse(self.dog.is_host_registered("https://unregistered.example.com/1", offline=True))
+        self.assertLess(elapsed / len(pid_strings), 0.001)
+        self.assertTrue(all(results))
+
+        ranked: List[dict] = self.dog.sniff("http://hdl.handle.net/11022/1007-0000-0000-8DEE-6", offline=True)
+        self.assertEqual(ranked[0], self.repos_map["IMS"].__dict__())
+        self.assertEqual(len(ranked), 4)
+        # unresolved conflicts keep registry order
+        self.assertEqual(self.dog.sniff("hdl:11022/9999-0000-0000-0000-1", offline=True),
+                         self.dog.sniff("hdl:11022/9999-0000-0000-0000-1", resolve_identifier_conflicts=False))
+
+        host_repo: RegRepo = RegRepo({"id": "HOST", "host_netloc": "https://shared.example.org",
+                                      "parser": {"type": "json"}, "url": {"format": "redirect"}})
+        path_repo: RegRepo = RegRepo({"id": "PATH", "host_netloc": "https://shared.example.org",
+                                      "parser": {"type": "json"},
+                                      "url": {"format": "https://shared.example.org/api/$record_id",
+                                              "regex": "^.*/records/(?P<record_id>\\w+)$"}})
+        # ranking uses the regex compiled into the request plan
+        with mock.patch("doglib.doglib.re.match", side_effect=AssertionError("regex compiled on ranking")):
+            self.assertEqual(self.dog._rank_sniffed([host_repo, path_repo],
+                                                    pid_factory("https://shared.example.org/records/42")),
+                             [path_repo, host_repo])
+            self.assertEqual(self.dog._rank_sniffed([host_repo, path_repo],
+                                                    pid_factory("https://shared.example.org/about/")),
+                             [host_repo, path_repo])
+
+    def test_registry_snapshot(self):
+        """
+        Test DOG loaded from a compiled registry snapshot matches DOG loaded from configs, and the snapshot is
+        rebuilt once a config changes
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_dir: str = shutil.copytree(REPO_CONFIG_DIR, os.path.join(tmp_dir, "repo_configs"))
+            snapshot_path: str = os.path.join(tmp_dir, "registry.pickle")
+            snapshot: RegistrySnapshot = RegistrySnapshot.open(snapshot_path, config_dir=config_dir)
+            dog: DOG = DOG(registry=RegistrySnapshot.load(snapshot_path))
+            self.assertEqual([repo.id for repo in dog.reg_repos], [repo.id for repo in self.dog.reg_repos])
+            self.assertEqual([repo.__dict__() for repo in dog.reg_repos],
+                             [repo.__dict__() for repo in self.dog.reg_repos])
+            for pid_string in [test_pid for repo in self.repos for test_pid in repo.get_test_examples().values()
+                               if test_pid]:
+                self.assertEqual(dog.sniff(pid_string, offline=True), self.dog.sniff(pid_string, offline=True))
+            self.assertTrue(snapshot.is_current(config_dir))
+
+            with open(os.path.join(config_dir, "LINDAT.json"), "a") as config_file:
+                config_file.write("\n")
+            self.assertFalse(snapshot.is_current(config_dir))
+            self.assertNotEqual(RegistrySnapshot.open(snapshot_path, config_dir=config_dir).digest, snapshot.digest)
+            self.assertTrue(RegistrySnapshot.load(snapshot_path).is_current(config_dir))
+
+    def test_reload(self):
+        """
+        Test reload() loads only changed configs, updates only their index entries and conflict seeds and reports
+        added, changed and removed repositories
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_dir: str = shutil.copytree(REPO_CONFIG_DIR, os.path.join(tmp_dir, "repo_configs"))
+            dog: DOG = DOG(config_dir=config_dir)
+            repos: dict = {repo.id: repo for repo in dog.reg_repos}
+            parser = repos["LINDAT"].get_parser()
+            index: RepoIndex = dog.get_repo_index()
+            seeds: list = list(dog._registry.conflict_seeds)
+            self.assertFalse(dog.reload())
+
+            with open(os.path.join(config_dir, "LINDAT.json")) as config_file:
+                config: dict = json.load(config_file)
+            config["repository"]["name"] = "LINDAT reloaded"
+            with open(os.path.join(config_dir, "LINDAT.json"), "w") as config_file:
+                json.dump(config, config_file)
+            config["repository"]["id"] = "LINDAT_COPY"
+            with open(os.path.join(config_dir, "LINDAT_COPY.json"), "w") as config_file:
+                json.dump(config, config_file)
+            os.remove(os.path.join(config_dir, "ADS.json"))
+            os.utime(os.path.join(config_dir, "BAS.json"), ns=(0, 0))
+
+            diff: RegistryDiff = dog.reload()
+            self.assertEqual((diff.added, diff.changed, diff.removed), (["LINDAT_COPY"], ["LINDAT"], ["ADS"]))
+            reloaded: dict = {repo.id: repo for repo in dog.reg_repos}
+            self.assertEqual(reloaded["LINDAT"].get_name(), "LINDAT reloaded")
+            self.assertIsNot(reloaded["LINDAT"].get_parser(), parser)
+            self.assertTrue(all(reloaded[repo_id] is repo for repo_id, repo in repos.items()
+                                if repo_id not in ("LINDAT", "ADS")))
+            self.assertEqual([repo.id for repo in dog.get_repo_index().match(pid_factory("hdl:11234/1-5263"))],
+                             ["LINDAT", "LINDAT_COPY"])
+            # index entries and conflict seeds of repositories unrelated to the changed configs are reused
+            reloaded_index: RepoIndex = dog.get_repo_index()
+            self.assertIsNot(reloaded_index, index)
+            for prefix, group in index._hdl.items():
+                if not {repo.id for repo in group} & {"LINDAT", "ADS"}:
+                    self.assertIs(reloaded_index._hdl[prefix], group)
+            reused_seeds: list = [seed for seed in dog._registry.conflict_seeds if any(seed is old for old in seeds)]
+            self.assertIn("IMS", [repo_id for _, repo_id in reused_seeds])
+            self.assertFalse(dog.reload())
+
+            with open(os.path.join(config_dir, "LINDAT.json"), "w") as config_file:
+                config_file.write("{")
+            with self.assertRaises(RegistryError):
+                dog.reload()
+            self.assertIs(dog.reg_repos[0], reloaded[dog.reg_repos[0].id])
+
+    def test_reload_rate_limits(self):
+        """
+        Test reload() resets rate limits of removed repositories and of repositories whose limit was dropped
+        """
+        self.addCleanup(curl.set_default_scheduler, curl.get_default_scheduler())
+        scheduler: HostScheduler = HostScheduler()
+        curl.set_default_scheduler(scheduler)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_dir: str = shutil.copytree(REPO_CONFIG_DIR, os.path.join(tmp_dir, "repo_configs"))
+            for repo_id in ("ADS", "LINDAT"):
+                with open(os.path.join(config_dir, f"{repo_id}.json")) as config_file:
+                    config: dict = json.load(config_file)
+                config["repository"]["rate_limit"] = {"rate": 2, "burst": 2}
+                with open(os.path.join(config_dir, f"{repo_id}.json"), "w") as config_file:
+                    json.dump(config, config_file)
+            dog: DOG = DOG(config_dir=config_dir)
+            hosts: List[str] = ["archaeologydataservice.ac.uk", "lindat.mff.cuni.cz"]
+            self.assertEqual([scheduler.get_limit(host) for host in hosts], [HostLimit(rate=2, burst=2)] * 2)
+
+            os.remove(os.path.join(config_dir, "ADS.json"))
+            del config["repository"]["rate_limit"]
+            with open(os.path.join(config_dir, "LINDAT.json"), "w") as config_file:
+                json.dump(config, config_file)
+            dog.reload()
+            self.assertEqual([scheduler.get_limit(host) for host in hosts], [scheduler.default_limit] * 2)
+
+    def test_watch(self):
+        """
+        Test a watching DOG picks up changed configs
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_dir: str = shutil.copytree(REPO_CONFIG_DIR, os.path.join(tmp_dir, "repo_configs"))
+            dog: DOG = DOG(config_dir=config_dir, watch_interval=0.05)
+            self.addCleanup(dog.unwatch)
+            os.remove(os.path.join(config_dir, "ADS.json"))
+            waited: float = 0
+            while "ADS" in [repo.id for repo in dog.reg_repos] and waited < 5:
+                time.sleep(0.05)
+                waited += 0.05
+            self.assertNotIn("ADS", [repo.id for repo in dog.reg_repos])
+
+    def test_parser_reuse(self):
+        """
+        Test parsers are built once per repository and parser type and shared between threads
+        """
+        reset_parser_stats()
+        repo: RegRepo = self.repos_map["LINDAT"]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            parsers: list = list(executor.map(lambda _: repo.get_parser(), range(32)))
+        self.assertTrue(all(parser is parsers[0] for parser in parsers))
+        self.assertIsNot(repo.get_parser("signpost"), parsers[0])
+        self.assertIsNot(repo.get_parser(parser_config=repo.get_parser_config()), parsers[0])
+        stats: ParserStats = get_parser_stats()
+        self.assertEqual((stats.constructed, stats.reused), (3, 31))
+
+        for _ in range(3):
+            for registered_repo in self.repos:
+                registered_repo.get_parser()
+        self.assertEqual(get_parser_stats().constructed, 2 + len(self.repos))
+
+    def test_request_plans(self):
+        """
+        Test request configs compile into request plans on load, invalid configs fail on load instead of on request
+        """
+        config: dict = {"id": "PLAN", "host_netloc": "https://plan.example.org", "parser": {"type": "json"},
+                        "api": {"base": "https://plan.example.org/api/$record_id?key=$PLAN_KEY"},
+                        "doi": {"id": "10.12345", "format": "https://plan.example.org/doi/$doi"},
+                        "url": {"format": "$api", "regex": "^.*/records/(?P<record_id>\\w+)$"}}
+        repo: RegRepo = RegRepo(config)
+        doi: PID = pid_factory("doi:10.12345/abc")
+        self.assertEqual(repo.get_request_url(doi), f"https://plan.example.org/doi/{doi.get_resolvable()}")
+        record: PID = pid_factory("https://plan.example.org/records/42")
+        self.assertEqual(repo.get_request_url(record, {"PLAN_KEY": "secret"}),
+                         "https://plan.example.org/api/42?key=secret")
+        self.assertEqual(repo.get_request_url(record), "https://plan.example.org/api/42?key=$PLAN_KEY")
+        self.assertEqual(pickle.loads(pickle.dumps(repo)).get_request_url(record, {"PLAN_KEY": "secret"}),
+                         "https://plan.example.org/api/42?key=secret")
+        with self.assertRaises(ValueError):
+            repo.get_request_url(pid_factory("https://plan.example.org/about/"))
+
+        cmdi_repo: RegRepo = RegRepo(dict(config, parser={"type": "cmdi"}))
+        headers: dict = cmdi_repo.get_headers(doi)
+        headers["Authorization"] = "Bearer token"
+        self.assertEqual(cmdi_repo.get_headers(doi), {"Accept": "application/x-cmdi+xml"})
+        with self.assertRaises(TypeError):
+            cmdi_repo.get_request_plan(doi).headers["Authorization"] = "Bearer token"
+
+        for invalid_url_config in [{"regex": "^.*/(?P<record_id>\\w+)$"},
+                                   {"format": "$api", "regex": "^.*/(?P<record_id>\\w+$"},
+                                   {"format": "$api", "regex": "^.*/(?P<id>\\w+)$"}]:
+            with self.assertRaises(RepoConfigError):
+                RegRepo(dict(config, url=invalid_url_config))
+        with self.assertRaises(RepoConfigError):
+            RegRepo(dict(config, api={}))
+
+    def test_lazy_imports(self):
+        """
+        Test "import doglib" does not load parsers, config schema validation and the DTR client
+        """
+        lazy_modules: List[str] = ["doglib.parsers", "doglib.schemas", "doglib.dtr", "lxml", "jsonpath_rw",
+                                   "jsonschema", "xmlschema"]
+        script: str = f"import sys, doglib; print([module for module in {lazy_modules!r} if module in sys.modules])"
+        output: str = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True,
+                                     text=True).stdout
+        self.assertEqual(output.strip(), "[]")
+        script = "import sys, doglib; doglib.expand_datatype; print('doglib.dtr' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+        self.assertEqual(output.strip(), "True")
+
+    def test_single_flight(self):
+        """
+        Test concurrent fetches of equivalent PIDs share a single pipeline run and get independent results
+        """
+        runs: List[PID] = []
+
+        def fetch(pid: PID) -> dict:
+            runs.append(pid)
+            time.sleep(0.2)
+            return {"ref_files": []}
+
+        self.dog._fetch = fetch
+        pids: List[str] = ["hdl:11234/1-2682", "https://hdl.handle.net/11234/1-2682", "11234/1-2682"]
+        with ThreadPoolExecutor() as executor:
+            results: List[dict] = list(executor.map(self.dog.fetch, pids))
+        del self.dog._fetch
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(results, [{"ref_files": []}] * 3)
+        results[0]["ref_files"].append("mutated")
+        self.assertEqual(results[1], {"ref_files": []})
+
+    def test_static_iter_resources(self):
+        """
+        Test streaming CMDI parsing yields the same resources as parsing the whole document
+        """
+        for repo_id, test_cases in self.static_responses.items():
+            parser = self.repos_map[repo_id].get_parser()
+            if not isinstance(parser, CMDIParser):
+                continue
+            for pid_type, test_case in test_cases:
+                ref_files = parser.fetch(test_case).ref_files
+                expected: list = sorted((referenced_resources.resource_type, resource.pid, resource.data_type)
+                                        for referenced_resources in ref_files
+                                        for resource in referenced_resources.ref_resources)
+                response: bytes = test_case.encode("utf-8")
+                chunks = (response[idx:idx + 512] for idx in range(0, len(response), 512))
+                streamed: list = sorted((resource_type, resource.pid, resource.data_type)
+                                        for resource_type, resource in parser.iter_resources(chunks))
+                self.assertEqual(expected, streamed, f"{repo_id}/{pid_type}")
+
+    def test_iter_resources_root_path(self):
+        """
+        Test streaming CMDI parsing honours a resource_root_path overridden by the repository config
+        """
+        config: dict = {"reverse_pid": "", "description": "", "license": "", "ref_file": {}}
+        first_proxies: CMDIParser = CMDIParser({**config, "ref_file": {
+            "resource_root_path": "(.//cmd:ResourceProxy[cmd:ResourceType='$resource_type'])[1]"}})
+        with open(os.path.join(STATIC_TEST_FILES_DIR, "LINDAT", "hdl.json")) as static_response:
+            response: str = static_response.read()
+        expected: list = sorted((referenced_resources.resource_type, resource.pid)
+                                for referenced_resources in first_proxies.fetch(response).ref_files
+                                for resource in referenced_resources.ref_resources)
+        encoded: bytes = response.encode("utf-8")
+        streamed: List[list] = []
+        for parser in (CMDIParser(config), first_proxies):
+            chunks = (encoded[idx:idx + 512] for idx in range(0, len(encoded), 512))
+            streamed.append(sorted((resource_type, resource.pid)
+                                   for resource_type, resource in parser.iter_resources(chunks)))
+        all_resources, first_resources = streamed
+        self.assertEqual(first_resources, expected)
+        self.assertLess(len(first_resources), len(all_resources))
+
+    def test_compiled_xpaths(self):
+        """
+        Test XPaths of parser configs are compiled once and bind the resource type as XPath variable
+        """
+        root_path: str = "//cmd:ResourceProxy[cmd:ResourceType='$resource_type']"
+        parser = CMDIParser({"reverse_pid": "", "description": "", "license": "",
+                             "ref_file": {"resource_root_path": root_path}})
+        self.assertEqual(xpath_variables(root_path), "//cmd:ResourceProxy[cmd:ResourceType=$resource_type]")
+        with open(os.path.join(STATIC_TEST_FILES_DIR, "LINDAT", "hdl.json")) as static_response:
+            response: str = static_response.read()
+        ref_files = parser.fetch(response).ref_files
+        self.assertTrue(any(referenced_resources.ref_resources for referenced_resources in ref_files))
+        compiled: dict = dict(parser._xpath_local.xpaths)
+        self.assertEqual(parser.fetch(response).ref_files, ref_files)
+        self.assertEqual(parser._xpath_local.xpaths, compiled)
+        self.assertTrue(all(compiled_xpath is parser._xpath_local.xpaths[key]
+                            for key, compiled_xpath in compiled.items()))
+
 
 if __name__ == '__main__':
     unittest.main()